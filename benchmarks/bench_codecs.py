@@ -0,0 +1,29 @@
+"""Decode + encode cost of each installed JSON codec on a tick batch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codecs
+"""
+
+from __future__ import annotations
+import timeit
+
+from benchmarks.bench_patch import make_frame
+from ws_intercept.jsoncodec import available_codecs, get_codec
+
+
+def main() -> None:
+    print(f"{'codec':<10}" + "".join(f"{f'{size // 1000} KB (us)':>14}" for size in (1_000, 100_000)))
+    for name in available_codecs():
+        codec = get_codec(name)
+        row = f"{name:<10}"
+        for size in (1_000, 100_000):
+            text = make_frame(size)
+            n = 20_000 if size < 10_000 else 200
+            t = min(timeit.repeat(lambda: codec.encode(codec.decode(text)), number=n, repeat=5)) / n
+            row += f"{t * 1e6:>14.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Microbenchmark: json.loads/dumps vs. in-place splicing of one field.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_patch
+"""
+
+from __future__ import annotations
+import json
+import timeit
+
+from ws_intercept.patching import patch_number
+
+
+def make_frame(size: int, *, with_key: bool = True, nested: bool = False) -> str:
+    """A tick-batch frame of roughly `size` bytes with `value` as the last key.
+
+    nested=True gives every tick a `value` of its own, which the splice has to
+    step over before it reaches the top-level one.
+    """
+    tick = {"sl": "US100Cash", "ba": [23569.42, 23571.62], "tt": "2025-08-27T18:52:44.152Z"}
+    if nested:
+        tick["value"] = 1
+    ticks = []
+    while len(json.dumps(ticks)) < size:
+        ticks.append(tick)
+    frame = {"ts": 1756320764.152, "messages": ticks}
+    if with_key:
+        frame["value"] = 0.5
+    return json.dumps(frame)
+
+
+def full_roundtrip(text: str) -> str:
+    obj = json.loads(text)
+    if "value" in obj:
+        obj["value"] = 1.25
+    return json.dumps(obj)
+
+
+def splice(text: str) -> str:
+    return patch_number(text, "value", lambda: 1.25)
+
+
+def main() -> None:
+    print(f"{'frame':<18}{'json (us)':>12}{'splice (us)':>14}{'speedup':>10}")
+    for size in (1_000, 100_000):
+        for name, kwargs in (("key", {}), ("no key", {"with_key": False}), ("nested", {"nested": True})):
+            text = make_frame(size, **kwargs)
+            assert json.loads(splice(text)) == json.loads(full_roundtrip(text))
+            n = 20_000 if size < 10_000 else 200
+            t_json = min(timeit.repeat(lambda: full_roundtrip(text), number=n, repeat=5)) / n
+            t_splice = min(timeit.repeat(lambda: splice(text), number=n, repeat=5)) / n
+            label = f"{len(text) // 1000} KB {name}"
+            print(f"{label:<18}{t_json * 1e6:>12.1f}{t_splice * 1e6:>14.1f}{t_json / t_splice:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Cost of each interception strategy under load, headless.
+
+Every strategy is run against the stand-in server (benchmarks.standin) at each
+frame rate and payload size. All of them rewrite the same field, the bid of
+US100Cash ticks:
+
+    baseline          no interception, page-level WebSocket
+    python_proxy      simple_ws route_web_socket proxy, patched in Python
+    python_fast_path  simple_ws route, patched by its in-page runtime
+    baseline_worker   no interception, WebSocket inside a SharedWorker
+    page_patch        shared_worker page-level WebSocket/SharedWorker wrapper
+    worker_patch      pwa MessagePort.prototype.postMessage patch in the worker
+                      (both ws_intercept.runtime)
+
+Each run reports:
+- delivered throughput, dropped/reordered frames, and p50/p99 latency
+  (server send stamp -> page handler)
+- added latency over the baseline with the same page kind
+- CPU used by this Python process
+- CPU of the page main thread (CDP TaskDuration, Chromium)
+- CPU of the whole driver/browser process tree (when psutil is installed)
+
+The ceiling of a strategy is the highest offered rate it sustained: nothing
+dropped, >= 95% of the rate delivered and p99 under the latency budget.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_strategies --out bench.json
+    python -m benchmarks.bench_strategies --compare bench.json   # flag regressions
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from importlib.metadata import version as package_version
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from playwright.sync_api import Page, sync_playwright
+
+from benchmarks.standin import PATCHED_BID
+from ws_intercept.runtime import render
+
+try:
+    import psutil
+except ImportError:  # optional backend
+    psutil = None
+
+SELECTOR = "messages[*].ts.tk.ba[0]"
+
+
+def _python_proxy(page: Page, *, fast_path: bool = False) -> None:
+    from simple_ws.conftest import WSBehavior, attach_ws_router
+
+    behavior = WSBehavior(value_key=SELECTOR, fast_path=fast_path)
+    attach_ws_router(page, behavior)
+    behavior.set_mode("constant", const=PATCHED_BID)
+
+
+def _page_patch(page: Page) -> None:
+    page.add_init_script(render(mode="constant", constant=PATCHED_BID, selector=SELECTOR))
+
+
+def _worker_patch(page: Page) -> None:
+    page.add_init_script(render(page=False, worker={"symbol": "US100Cash", "forcedBa": [PATCHED_BID, 1050]}))
+
+
+@dataclass(frozen=True)
+class Strategy:
+    name: str
+    kind: str                                   # "ws" or "worker" page
+    install: Callable[[Page], None] | None      # None for the baselines
+
+    @property
+    def baseline(self) -> str:
+        return "baseline" if self.kind == "ws" else "baseline_worker"
+
+
+STRATEGIES = [
+    Strategy("baseline", "ws", None),
+    Strategy("python_proxy", "ws", _python_proxy),
+    Strategy("python_fast_path", "ws", lambda page: _python_proxy(page, fast_path=True)),
+    Strategy("baseline_worker", "worker", None),
+    Strategy("page_patch", "worker", _page_patch),
+    Strategy("worker_patch", "worker", _worker_patch),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, timeout: float = 15.0) -> subprocess.Popen:
+    """Run the stand-in in its own process so its CPU is not charged to ours."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.standin:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("stand-in server exited during startup")
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"stand-in server not ready after {timeout} s")
+
+
+def _tree_cpu() -> float | None:
+    """CPU seconds of every child process (Playwright driver and browser)."""
+    if psutil is None:
+        return None
+    total = 0.0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            t = child.cpu_times()
+            total += t.user + t.system
+        except psutil.Error:
+            pass
+    return total
+
+
+def run_one(browser, base_url: str, strategy: Strategy, rate: int, size: int, duration: float) -> dict[str, Any]:
+    context = browser.new_context()
+    page = context.new_page()
+    try:
+        if strategy.install:
+            strategy.install(page)
+        cdp = context.new_cdp_session(page)
+        cdp.send("Performance.enable")
+
+        query = (
+            f"kind={strategy.kind}&shape=ticks&symbols=1&rate={rate}&size={size}"
+            f"&duration={duration}&burst={max(1, rate // 200)}"
+        )
+        tree0, cpu0 = _tree_cpu(), time.process_time()
+        page.goto(f"{base_url}/?{query}")
+        result = page.evaluate("ms => window.__bench_wait(ms)", duration * 1000 + 30_000)
+        cpu_py = time.process_time() - cpu0
+        tree1 = _tree_cpu()
+        metrics = {m["name"]: m["value"] for m in cdp.send("Performance.getMetrics")["metrics"]}
+    finally:
+        context.close()
+
+    expected = result["sent"] or 0
+    return {
+        "strategy": strategy.name,
+        "kind": strategy.kind,
+        "rate": rate,
+        "size": size,
+        "duration": duration,
+        **result,
+        "patched_ok": strategy.install is None or result["patched"] == result["received"],
+        "cpu_s": {
+            "python": round(cpu_py, 4),
+            "page_main_thread": round(metrics.get("TaskDuration", 0.0), 4),
+            "driver_and_browser": None if tree0 is None else round(tree1 - tree0, 4),
+        },
+        "sustained": (
+            not result["timed_out"]
+            and result["dropped"] == 0
+            and result["received"] >= 0.95 * expected
+            and (result["throughput"] or 0) >= 0.95 * rate
+        ),
+    }
+
+
+def summarize(runs: list[dict[str, Any]], budget_ms: float) -> dict[str, Any]:
+    """Ceilings per strategy and size, and latency added over the matching baseline."""
+    by_key = {(r["strategy"], r["size"], r["rate"]): r for r in runs}
+    kinds = {s.name: s for s in STRATEGIES}
+    for r in runs:
+        base = by_key.get((kinds[r["strategy"]].baseline, r["size"], r["rate"]))
+        added = {}
+        for p in ("p50", "p99"):
+            mine, theirs = r["latency_ms"][p], base and base["latency_ms"][p]
+            added[p] = None if mine is None or theirs is None else round(mine - theirs, 3)
+        r["added_latency_ms"] = added
+        r["sustained"] = r["sustained"] and (r["latency_ms"]["p99"] or 0) <= budget_ms
+
+    ceilings: dict[str, dict[str, Any]] = {}
+    for r in runs:
+        c = ceilings.setdefault(r["strategy"], {}).setdefault(str(r["size"]), {"rate": 0, "max_throughput": 0})
+        if r["sustained"]:
+            c["rate"] = max(c["rate"], r["rate"])
+        c["max_throughput"] = round(max(c["max_throughput"], r["throughput"] or 0))
+    return ceilings
+
+
+def compare(old: dict[str, Any], new: dict[str, Any], tolerance: float = 0.1) -> list[str]:
+    """Regressions of `new` against `old`: lower ceilings, p99 worse by > tolerance."""
+    problems = []
+    for name, sizes in new["ceilings"].items():
+        for size, c in sizes.items():
+            before = old.get("ceilings", {}).get(name, {}).get(size)
+            if before and c["rate"] < before["rate"]:
+                problems.append(f"{name} @ {size} B: ceiling {before['rate']} -> {c['rate']} msg/s")
+    old_runs = {(r["strategy"], r["size"], r["rate"]): r for r in old.get("runs", [])}
+    for r in new["runs"]:
+        before = old_runs.get((r["strategy"], r["size"], r["rate"]))
+        p_old, p_new = before and before["latency_ms"]["p99"], r["latency_ms"]["p99"]
+        if p_old and p_new and p_new > p_old * (1 + tolerance) and p_new - p_old > 1.0:
+            problems.append(f"{r['strategy']} @ {r['size']} B, {r['rate']} msg/s: p99 {p_old:.1f} -> {p_new:.1f} ms")
+    return problems
+
+
+def print_table(runs: list[dict[str, Any]], file=None) -> None:
+    print(f"{'strategy':<18}{'size':>6}{'rate':>8}{'thru':>9}{'drop':>6}{'p50':>8}{'p99':>8}"
+          f"{'+p99':>8}{'py cpu':>8}{'page cpu':>9}  ok", file=file)
+    for r in runs:
+        lat, added = r["latency_ms"], r["added_latency_ms"]
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        print(f"{r['strategy']:<18}{r['size']:>6}{r['rate']:>8}{fmt(r['throughput']):>9}{str(r['dropped']):>6}"
+              f"{fmt(lat['p50']):>8}{fmt(lat['p99']):>8}{fmt(added['p99']):>8}"
+              f"{r['cpu_s']['python']:>8.2f}{r['cpu_s']['page_main_thread']:>9.2f}  {'y' if r['sustained'] else 'n'}", file=file)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--strategies", default=",".join(s.name for s in STRATEGIES))
+    ap.add_argument("--rates", default="1000,5000,10000,20000", help="offered msgs/s, comma-separated")
+    ap.add_argument("--sizes", default="256,4096", help="payload bytes, comma-separated")
+    ap.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    ap.add_argument("--budget-ms", type=float, default=100.0, help="p99 latency allowed for a sustained rate")
+    ap.add_argument("--out", help="write the JSON report here ('-' for stdout)")
+    ap.add_argument("--compare", help="earlier JSON report; exit 1 on regressions")
+    args = ap.parse_args(argv)
+
+    wanted = args.strategies.split(",")
+    unknown = set(wanted) - {s.name for s in STRATEGIES}
+    if unknown:
+        ap.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+    # Baselines are needed for the added-latency columns
+    names = set(wanted) | {s.baseline for s in STRATEGIES if s.name in wanted}
+    strategies = [s for s in STRATEGIES if s.name in names]
+    rates = [int(x) for x in args.rates.split(",")]
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    port = free_port()
+    server = start_server(port)
+    runs = []
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            for strategy in strategies:
+                for size in sizes:
+                    for rate in rates:
+                        runs.append(run_one(browser, f"http://127.0.0.1:{port}", strategy, rate, size, args.duration))
+            chromium = browser.version
+            browser.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "playwright": package_version("playwright"),
+            "chromium": chromium,
+            "duration": args.duration,
+            "budget_ms": args.budget_ms,
+        },
+        "ceilings": summarize(runs, args.budget_ms),
+        "runs": runs,
+    }
+    print_table(runs, file=sys.stderr if args.out == "-" else None)
+    if args.out == "-":
+        json.dump(report, sys.stdout, indent=2)
+    elif args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(json.load(f), report)
+        for line in problems:
+            print("REGRESSION", line)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Microbenchmark: schema-aware tick matcher vs. the deep scan, in node.
+
+Both are the worker-side functions of ws_intercept.runtime (TICK_MATCHER_JS):
+mutateTicks() goes straight to messages[*].ts.tk, mutateUS100Deep() walks every
+node. Payloads are tick batches from ws_intercept.loadgen, the shape of
+pwa/tmp.py, posted as objects and as JSON strings (with and without the symbol),
+with 1 and with 500 symbols in the override table.
+
+Run from the repository root (needs node):
+
+    python -m benchmarks.bench_tick_matcher
+"""
+
+from __future__ import annotations
+import json
+import shutil
+import subprocess
+import sys
+
+from ws_intercept.loadgen import LoadProfile, build_messages, symbol_names
+from ws_intercept.overrides import make_rule
+from ws_intercept.runtime import TICK_MATCHER_JS
+
+SYMBOL = "US100Cash"
+
+BENCH_JS = r"""
+const CFG = %(config)s;
+%(matcher)s
+const cases = %(cases)s;
+
+const time = (fn, payload) => {
+  // Enough calls for ~200 ms, best of 5
+  let n = 1;
+  for (;;) {
+    const t0 = process.hrtime.bigint();
+    for (let i = 0; i < n; i++) fn(payload);
+    if (Number(process.hrtime.bigint() - t0) > 2e7) break;
+    n *= 2;
+  }
+  n *= 10;
+  let best = Infinity;
+  for (let r = 0; r < 5; r++) {
+    const t0 = process.hrtime.bigint();
+    for (let i = 0; i < n; i++) fn(payload);
+    best = Math.min(best, Number(process.hrtime.bigint() - t0) / n);
+  }
+  return best / 1000;  // us per call
+};
+
+// What the worker's postMessage patch does with a payload
+const viaString = (mutate) => (data) => {
+  if (!mayMatch(data)) return data;
+  const obj = JSON.parse(data);
+  return mutate(obj) ? JSON.stringify(obj) : data;
+};
+const deepString = (data) => {  // the old path: always parsed
+  const obj = JSON.parse(data);
+  return mutateUS100Deep(obj) ? JSON.stringify(obj) : data;
+};
+
+const rows = [];
+for (const c of cases) {
+  const obj = JSON.parse(c.text);
+  rows.push({
+    name: c.name,
+    bytes: c.text.length,
+    object: [time(mutateUS100Deep, obj), time(mutateTicks, obj)],
+    string: [time(deepString, c.text), time(viaString(mutateTicks), c.text)],
+  });
+}
+console.log(JSON.stringify(rows));
+"""
+
+
+def make_cases() -> list[dict[str, str]]:
+    cases = []
+    for batch, symbols in ((1, 1), (20, 8), (200, 200), (1000, 200)):
+        profile = LoadProfile(shape="ticks", batch=batch, symbols=symbols, frames=1)
+        cases.append({"name": f"{batch} ticks", "text": json.dumps(build_messages(profile)[0])})
+    # Symbol absent: the string pre-check skips the parse altogether
+    profile = LoadProfile(shape="ticks", batch=200, symbols=200, frames=1)
+    msg = build_messages(profile)[0]
+    msg["messages"] = [m for m in msg["messages"] if m["ts"]["tk"]["sl"] != SYMBOL]
+    cases.append({"name": "199 ticks, no sym", "text": json.dumps(msg)})
+    return cases
+
+
+def main() -> int:
+    if shutil.which("node") is None:
+        print("node is not installed", file=sys.stderr)
+        return 1
+    cases = json.dumps(make_cases())
+    for n in (1, 500):
+        # The override table holds n symbols; the payloads only carry the first 200
+        config = {"symbols": {name: make_rule("constant", ba=[950, 1050]) for name in symbol_names(n)}}
+        script = BENCH_JS % {"config": json.dumps(config), "matcher": TICK_MATCHER_JS, "cases": cases}
+        rows = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+        print(f"\n{n} overridden symbol{'s' if n > 1 else ''}")
+        print(f"{'payload':<20}{'KB':>6}{'obj deep':>10}{'obj match':>11}{'speedup':>9}"
+              f"{'str deep':>10}{'str match':>11}{'speedup':>9}   (us per post)")
+        for r in rows:
+            (od, om), (sd, sm) = r["object"], r["string"]
+            print(f"{r['name']:<20}{r['bytes'] / 1000:>6.1f}{od:>10.2f}{om:>11.2f}{od / om:>8.1f}x"
+                  f"{sd:>10.2f}{sm:>11.2f}{sd / sm:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
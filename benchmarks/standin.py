@@ -0,0 +1,136 @@
+"""Stand-in server for the interception benchmarks.
+
+Serves a bare page that consumes the load-generator feed either directly over a
+WebSocket (``/?kind=ws``) or through a SharedWorker that posts decoded frames to
+the page (``/?kind=worker``), like the shared_worker and pwa demos. The page's
+query string is passed on to ``/ws`` (see ws_intercept.loadgen); frames are
+always stamped, and a final ``{"done": N}`` frame tells the page how many were
+sent.
+
+The page measures per-frame latency against the server's send stamp and
+resolves ``window.__bench_wait(ms)`` with a summary once the feed is done.
+
+    python -m uvicorn benchmarks.standin:app --port 8000
+"""
+
+from __future__ import annotations
+import json
+
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import HTMLResponse, Response
+
+from ws_intercept.loadgen import LoadProfile, stream
+
+# Every strategy under test rewrites the bid of US100Cash ticks to this value
+PATCHED_BID = 950
+
+PAGE = r"""<!doctype html>
+<html>
+<head><meta charset="utf-8"><title>ws bench</title></head>
+<body>
+<pre id="status">running</pre>
+<script>
+(() => {
+  const PATCHED_BID = %(patched_bid)s;
+  const params = new URLSearchParams(location.search);
+  const expected = Number(params.get('rate') || 0) * Number(params.get('duration') || 0);
+  const lat = new Float64Array(Math.max(1024, Math.ceil(expected * 1.1)));
+  const st = { received: 0, patched: 0, gaps: 0, reordered: 0, lastSeq: -1, first: 0, last: 0, sent: null };
+  const now = () => performance.timeOrigin + performance.now();
+
+  let resolveDone;
+  const done = new Promise((r) => { resolveDone = r; });
+
+  const summary = (timedOut) => {
+    const n = Math.min(st.received, lat.length);
+    const sorted = lat.slice(0, n).sort();
+    const pct = (p) => (n ? sorted[Math.min(n - 1, Math.floor(p * n))] : null);
+    return {
+      timed_out: timedOut,
+      sent: st.sent,
+      received: st.received,
+      dropped: st.sent === null ? null : st.sent - st.received,
+      gaps: st.gaps,
+      reordered: st.reordered,
+      patched: st.patched,
+      throughput: st.last > st.first ? (st.received - 1) / ((st.last - st.first) / 1000) : null,
+      latency_ms: { p50: pct(0.5), p99: pct(0.99), max: n ? sorted[n - 1] : null },
+    };
+  };
+
+  const onData = (data) => {
+    const t = now();
+    const msg = typeof data === 'string' ? JSON.parse(data) : data;
+    if (msg.done !== undefined) {
+      st.sent = msg.done;
+      document.getElementById('status').textContent = 'done';
+      resolveDone(summary(false));
+      return;
+    }
+    if (st.received < lat.length) lat[st.received] = t - msg.sent * 1000;
+    st.received++;
+    if (!st.first) st.first = t;
+    st.last = t;
+    if (msg.seq < st.lastSeq) st.reordered++;
+    else if (msg.seq > st.lastSeq + 1) st.gaps++;
+    if (msg.seq > st.lastSeq) st.lastSeq = msg.seq;
+    const first = msg.messages && msg.messages[0];
+    if (first && first.ts.tk.ba[0] === PATCHED_BID) st.patched++;
+  };
+
+  window.__bench_wait = (ms) => Promise.race([done, new Promise((r) => setTimeout(() => r(summary(true)), ms))]);
+
+  const wsUrl = location.origin.replace(/^http/, 'ws') + '/ws' + location.search;
+  if (params.get('kind') === 'worker') {
+    const worker = new SharedWorker('/bench-worker.js', { name: 'bench' + Math.random() });
+    worker.port.onmessage = (ev) => onData(ev.data);
+    worker.port.postMessage({ url: wsUrl });
+  } else {
+    const ws = new WebSocket(wsUrl);
+    ws.onmessage = (ev) => onData(ev.data);
+  }
+})();
+</script>
+</body>
+</html>
+""" % {"patched_bid": PATCHED_BID}
+
+# Decodes in the worker and posts objects, like the shared_worker demo's worker
+WORKER_JS = r"""
+onconnect = (e) => {
+  const port = e.ports[0];
+  port.onmessage = (ev) => {
+    const socket = new WebSocket(ev.data.url);
+    socket.onmessage = (m) => port.postMessage(JSON.parse(m.data));
+  };
+};
+"""
+
+app = FastAPI()
+
+
+@app.get("/")
+def index():
+    return HTMLResponse(PAGE)
+
+
+@app.get("/bench-worker.js")
+def bench_worker():
+    return Response(WORKER_JS, media_type="application/javascript")
+
+
+@app.websocket("/ws")
+async def ws_endpoint(ws: WebSocket):
+    await ws.accept()
+    params = {k: v for k, v in ws.query_params.items() if k != "kind"}
+    try:
+        profile = LoadProfile.from_query({**params, "stamp": "1"})
+    except ValueError as e:
+        await ws.close(code=1008, reason=str(e))
+        return
+    try:
+        sent = await stream(ws.send_text, profile)
+        await ws.send_text(json.dumps({"done": sent}))
+        await ws.close()
+    except Exception:
+        pass
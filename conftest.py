@@ -0,0 +1,5 @@
+# conftest.py
+# Shared by every demo: --ws-pool, the pooled context/page fixtures, ws_latency
+# and the session reports are registered here once, so simple_ws, shared_worker
+# and pwa can run together.
+pytest_plugins = ["ws_intercept.pool", "ws_intercept.latency"]
@@ -0,0 +1,165 @@
+# app.py
+# Local stand-in for the staging PWA: a SharedWorker holds one tick-feed socket
+# and posts every envelope to the tabs, which render a bid/ask board. The feed
+# has the production shape (see tmp.py) and is generated by ws_intercept.loadgen:
+#
+#     python -m uvicorn pwa.app:app --port 8000
+#     http://localhost:8000/?symbols=50&rate=200&batch=5
+#
+# Query parameters of the page are passed on to /ws: rate (envelopes/s or
+# "max"), symbols, batch (ticks per envelope), burst, size, frames, duration
+# and stamp. post=text makes the worker forward the raw frame instead of the
+# parsed envelope.
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import HTMLResponse, Response
+
+from ws_intercept.loadgen import LoadProfile, stream
+
+# A few envelopes per second over the named symbols unless the page asks for more
+DEFAULT_FEED = {"rate": "10", "symbols": "8", "batch": "2"}
+
+app = FastAPI()
+
+
+@app.websocket("/ws")
+async def ws_endpoint(ws: WebSocket):
+    await ws.accept()
+    try:
+        profile = LoadProfile.from_query({**DEFAULT_FEED, **ws.query_params, "shape": "ticks"})
+    except ValueError as e:
+        await ws.close(code=1008, reason=str(e))
+        return
+    try:
+        await stream(ws.send_text, profile)
+        await ws.close()  # duration elapsed
+    except Exception:
+        pass
+
+
+@app.get("/")
+def index():
+    html = """
+    <!doctype html>
+    <html>
+      <head>
+        <meta charset="utf-8" />
+        <title>Ticks via SharedWorker</title>
+        <style>
+          body { font-family: ui-sans-serif, system-ui, sans-serif; margin: 2rem; }
+          table { border-collapse: collapse; font-variant-numeric: tabular-nums; }
+          td, th { padding: 0.2rem 0.8rem; text-align: right; }
+          th:first-child, td:first-child { text-align: left; }
+        </style>
+      </head>
+      <body>
+        <h1>Tick feed via SharedWorker</h1>
+        <div>Status: <span id="status">connecting…</span> · envelopes: <span id="envelopes">0</span> · ticks: <span id="ticks">0</span></div>
+        <table id="board">
+          <thead><tr><th>Symbol</th><th>Bid</th><th>Ask</th><th>Time</th></tr></thead>
+          <tbody></tbody>
+        </table>
+        <script>
+          // One row per symbol, updated in place; rows are <tr data-symbol="US100Cash">
+          const body = document.querySelector('#board tbody');
+          const rows = new Map();
+          const counts = { envelopes: 0, ticks: 0 };
+          window.__ticks__ = counts;
+
+          function row(sl) {
+            let r = rows.get(sl);
+            if (!r) {
+              const tr = document.createElement('tr');
+              tr.dataset.symbol = sl;
+              tr.innerHTML = '<td class="sl"></td><td class="bid"></td><td class="ask"></td><td class="tt"></td>';
+              tr.querySelector('.sl').textContent = sl;
+              body.appendChild(tr);
+              r = { bid: tr.querySelector('.bid'), ask: tr.querySelector('.ask'), tt: tr.querySelector('.tt') };
+              rows.set(sl, r);
+            }
+            return r;
+          }
+
+          const worker = new SharedWorker('/shared-worker.js', { name: 'ticks-shared' });
+          const port = worker.port;
+          port.onmessage = (ev) => {
+            const msg = ev.data;
+            if (!msg) return;
+            if (msg.type === 'status') {
+              document.getElementById('status').textContent = msg.status;
+              return;
+            }
+            if (msg.type !== 'ticks') return;
+            const env = typeof msg.payload === 'string' ? JSON.parse(msg.payload) : msg.payload;
+            counts.envelopes++;
+            for (const m of env.messages || []) {
+              const tk = m.ts && m.ts.tk;
+              if (!tk) continue;
+              counts.ticks++;
+              const r = row(tk.sl);
+              r.bid.textContent = tk.ba[0].toFixed(2);
+              r.ask.textContent = tk.ba[1].toFixed(2);
+              r.tt.textContent = tk.tt;
+            }
+            document.getElementById('envelopes').textContent = counts.envelopes;
+            document.getElementById('ticks').textContent = counts.ticks;
+          };
+          port.start();
+          port.postMessage({ type: 'connect', url: location.origin.replace(/^http/, 'ws') + '/ws' + location.search });
+          window.addEventListener('beforeunload', () => {
+            try { port.postMessage({ type: 'disconnect' }); } catch {}
+          });
+        </script>
+      </body>
+    </html>
+    """
+    return HTMLResponse(content=html)
+
+
+@app.get("/shared-worker.js")
+def shared_worker_js():
+    js = r"""
+// One socket for all tabs; every envelope is posted to every port, parsed
+// (like the production worker) unless the page asked for post=text.
+let ports = [];
+let socket = null;
+
+function broadcast(msg) {
+  for (const p of ports) {
+    try { p.postMessage(msg); } catch (e) {}
+  }
+}
+
+function openSocket(url) {
+  const raw = new URL(url).searchParams.get('post') === 'text';
+  socket = new WebSocket(url);
+  socket.onopen = () => broadcast({ type: 'status', status: 'connected' });
+  socket.onmessage = (ev) => broadcast({ type: 'ticks', payload: raw ? ev.data : JSON.parse(ev.data) });
+  socket.onclose = () => {
+    socket = null;
+    broadcast({ type: 'status', status: 'closed' });
+  };
+}
+
+function leave(port) {
+  ports = ports.filter((p) => p !== port);
+  if (!ports.length && socket) {
+    try { socket.close(); } catch {}
+    socket = null;
+  }
+}
+
+onconnect = (e) => {
+  const port = e.ports[0];
+  ports.push(port);
+  port.onmessage = (event) => {
+    const msg = event.data || {};
+    if (msg.type === 'connect') {
+      if (!socket) openSocket(msg.url);
+      else if (socket.readyState === WebSocket.OPEN) port.postMessage({ type: 'status', status: 'connected' });
+    }
+    if (msg.type === 'disconnect') leave(port);
+  };
+  port.start();
+};
+"""
+    return Response(content=js, media_type="application/javascript")
@@ -1,111 +1,46 @@
 import pytest
 
-INIT_JS = r"""
-(() => {
-  if (window.__sharedWorkerProxyInstalled__) return;
-  window.__sharedWorkerProxyInstalled__ = true;
-
-  // Runtime config (you can tweak from DevTools)
-  window.__US100_cfg = Object.assign({
-    symbol: "US100Cash",
-    forcedBa: [950, 1050],
-  }, window.__US100_cfg || {});
-
-  // Replace SharedWorker constructor with a proxy that bootstraps the worker.
-  const OrigSW = window.SharedWorker;
-  if (!OrigSW) {
-    console.log("[us100-proxy] No SharedWorker in this environment");
-    return;
-  }
-  if (OrigSW.__us100Proxy__) return;
-
-  const mkBootstrap = (origUrl, cfg) => `
-    // ---- bootstrap runs INSIDE the SharedWorker global scope ----
-    (function(){
-      var __CFG = { symbol: ${JSON.stringify(cfg.symbol)}, forcedBa: ${JSON.stringify(cfg.forcedBa)} };
-
-      // Deep scan: find any object with { sl: string, ba: [bid, ask] } and rewrite when sl===symbol
-      function mutateUS100Deep(root){
-        var changed = false, stack = [root], seen = typeof WeakSet!=="undefined" ? new WeakSet() : { has(){return false;}, add(){} };
-        while (stack.length){
-          var node = stack.pop();
-          if (!node || typeof node !== "object") continue;
-          try { if (seen.has(node)) continue; seen.add(node); } catch(e) {}
-          if (typeof node.sl === "string" && Array.isArray(node.ba) && node.ba.length >= 2){
-            if (node.sl === __CFG.symbol){
-              node.ba[0] = __CFG.forcedBa[0];
-              node.ba[1] = __CFG.forcedBa[1];
-              changed = true;
-            }
-          }
-          if (Array.isArray(node)){
-            for (var i=0;i<node.length;i++) stack.push(node[i]);
-          } else {
-            for (var k in node) if (Object.prototype.hasOwnProperty.call(node,k)) stack.push(node[k]);
-          }
-        }
-        return changed;
-      }
-
-      // Patch MessagePort.prototype.postMessage BEFORE importing the real worker script,
-      // so even early posts during script evaluation are intercepted.
-      (function(){
-        var MP = self.MessagePort && self.MessagePort.prototype;
-        if (!MP || MP.__us100_mutated__) return;
-        var origPost = MP.postMessage;
-        MP.postMessage = function(data, transfer){
-          try {
-            if (data && typeof data === "object"){
-              mutateUS100Deep(data);
-            } else if (typeof data === "string"){
-              try {
-                var obj = JSON.parse(data);
-                if (mutateUS100Deep(obj)) data = JSON.stringify(obj);
-              } catch(_){}
-            }
-          } catch(_){}
-          return arguments.length > 1 ? origPost.call(this, data, transfer) : origPost.call(this, data);
-        };
-        MP.__us100_mutated__ = true;
-      })();
-
-      // Import the ORIGINAL SharedWorker script (all its code runs after our patch)
-      try {
-        importScripts(${JSON.stringify(origUrl)});
-      } catch (e) {
-        // If import fails, surface an error so you notice in DevTools
-        try { console.log("[us100-proxy][worker] importScripts error:", String(e && e.message || e)); } catch(_){}
-      }
-    })();
-  `;
-
-  const ProxySW = function(url, options){
-    try {
-      // Resolve to absolute URL so importScripts works inside the worker
-      const abs = new URL(url, location.href).toString();
-
-      // Build a bootstrap script that imports the original worker and patches port.postMessage
-      const code = mkBootstrap(abs, window.__US100_cfg);
-      const blob = new Blob([code], { type: "application/javascript" });
-      const proxiedUrl = URL.createObjectURL(blob);
-
-      const w = new OrigSW(proxiedUrl, options);
-      // Expose the underlying port exactly like the original
-      return w;
-    } catch (e) {
-      console.log("[us100-proxy] Proxy construction failed, falling back to original:", e);
-      return new OrigSW(url, options);
-    }
-  };
-  ProxySW.prototype = OrigSW.prototype;
-  Object.defineProperty(window, "SharedWorker", { configurable: true, writable: false, value: ProxySW });
-  ProxySW.__us100Proxy__ = true;
-
-  console.log("[us100-proxy] SharedWorker proxy installed; faking", window.__US100_cfg.symbol, "ba ->", window.__US100_cfg.forcedBa);
-})();
-"""
+from ws_intercept.appserver import app_fixtures
+from ws_intercept.channel import ConfigChannel
+from ws_intercept.overrides import SymbolOverrides
+from ws_intercept.pool import open_pool
+from ws_intercept.runtime import render
+
+# The shared runtime (ws_intercept.runtime) in worker mode: SharedWorkers are
+# bootstrapped with a MessagePort.postMessage patch that fakes the symbol's
+# bid/ask. Request symbol_overrides for other symbols and rules, or tweak it
+# from DevTools via window.__ws_intercept__.worker.
+INIT_JS = render(page=False, worker={"symbol": "US100Cash", "forcedBa": [950, 1050]})
+
+# pwa.app, the local stand-in for the staging PWA. page.goto("/") goes to it unless
+# --base-url points elsewhere; the staging tests navigate to absolute URLs and never start it.
+app_server, base_url = app_fixtures("pwa.app:app")
+
+@pytest.fixture(scope="session")
+def context_pool(request):
+  # --ws-pool N: contexts with INIT_JS installed once each
+  pool = open_pool(request, lambda context: context.add_init_script(INIT_JS))
+  yield pool
+  if pool is not None:
+    pool.close()
 
 @pytest.fixture(autouse=True, scope="function")
-def install_us100_sharedworker_proxy(page):
-  page.add_init_script(INIT_JS)
+def install_us100_sharedworker_proxy(page, pooled_context):
+  if pooled_context is None:
+    page.add_init_script(INIT_JS)
   yield
+
+@pytest.fixture
+def symbol_overrides(page):
+  """Per-symbol bid/ask rules (see ws_intercept.overrides), replacing INIT_JS's table.
+
+  Every change reaches running SharedWorkers as one versioned update (see
+  ws_intercept.channel) and returns once they apply it; later pages and
+  workers start with the latest table.
+  """
+  overrides = SymbolOverrides()
+  channel = ConfigChannel(page)
+  channel.publish(worker=overrides.config())
+  overrides._listeners.append(lambda config: channel.publish(worker=config))
+  yield overrides
+  channel.close()
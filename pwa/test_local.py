@@ -0,0 +1,24 @@
+from playwright.sync_api import Page, expect
+
+
+def bid(page: Page, symbol: str):
+    return page.locator(f'tr[data-symbol="{symbol}"] .bid')
+
+
+def test_us100_forced_offline(page: Page):
+    # INIT_JS pins US100Cash to [950, 1050] inside the SharedWorker
+    page.goto("/?symbols=8&rate=50&batch=4")
+    expect(bid(page, "US100Cash")).to_have_text("950.00")
+    expect(page.locator('tr[data-symbol="US100Cash"] .ask')).to_have_text("1050.00")
+    expect(bid(page, "GOLDm#")).not_to_have_text("950.00")
+
+
+def test_symbol_overrides_at_scale(page: Page, symbol_overrides):
+    # 200 symbols, 10 ticks per envelope, raw frames posted by the worker
+    page.goto("/?symbols=200&rate=200&batch=10&post=text")
+    expect(bid(page, "SYM150")).not_to_be_empty()
+
+    symbol_overrides.set_mode([f"SYM{i}" for i in range(100, 200)], "constant", ba=(1, 2))
+    expect(bid(page, "SYM150")).to_have_text("1.00")
+    expect(bid(page, "SYM199")).to_have_text("1.00")
+    assert page.evaluate("window.__ticks__.ticks") > 200
@@ -1,24 +1,39 @@
 # app.py
-import asyncio
-import math
-import time
+from pathlib import Path
 from fastapi import FastAPI, WebSocket
 from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 
+from ws_intercept.broadcast import BroadcastHub, serve_broadcast
+from ws_intercept.loadgen import LoadProfile, demo_feed, flag, stream
+
 app = FastAPI()
 
 
+# ?broadcast=1 serves the feed from one producer shared by all clients
+hub = BroadcastHub()
+
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
-    t0 = time.time()
+    # /ws?rate=...&shape=ticks&... turns the demo feed into a load generator
     try:
-        while True:
-            t = time.time() - t0
-            value = 1.0 * math.sin(t * 2 * 3.1415 / 5)
-            await ws.send_json({"ts": time.time(), "value": value})
-            await asyncio.sleep(2)
+        profile = LoadProfile.from_query(ws.query_params)
+    except ValueError as e:
+        await ws.close(code=1008, reason=str(e))
+        return
+    stamp = flag(ws.query_params.get("stamp"))  # seq/sent for ws_intercept.latency
+    try:
+        if flag(ws.query_params.get("broadcast")):
+            # One producer per feed for every client asking for it (ws_intercept.broadcast)
+            await serve_broadcast(ws, profile, stamp, hub)
+            return
+        if profile is not None:
+            await stream(ws.send_text, profile)
+            await ws.close()  # duration elapsed
+            return
+        await demo_feed(ws.send_text, stamp)
     except Exception:
         pass
 
@@ -98,7 +113,7 @@ def index():
             if (msg.type === 'ready') {
               statusEl.textContent = 'ready';
               // Provide origin so worker can build ws:// URL
-              port.postMessage({ type: 'init', origin: location.origin });
+              port.postMessage({ type: 'init', origin: location.origin, search: location.search });
               port.postMessage({ type: 'connect' });
               return;
             }
@@ -154,6 +169,7 @@ def shared_worker_js():
 let ports = [];
 let socket = null;
 let originBase = null; // e.g., https://localhost:8000
+let search = ''; // page query string, forwarded to /ws (load-generator params)
 
 function broadcast(msg) {
   for (const p of ports) {
@@ -163,7 +179,7 @@ function broadcast(msg) {
 
 function openSocket() {
   if (!originBase || socket) return;
-  const wsUrl = originBase.replace(/^http/, 'ws') + '/ws';
+  const wsUrl = originBase.replace(/^http/, 'ws') + '/ws' + search;
   try {
     socket = new WebSocket(wsUrl);
     broadcast({ type: 'status', status: 'connecting' });
@@ -205,7 +221,10 @@ onconnect = function (e) {
     const msg = event.data || {};
     if (msg.type === 'init' && msg.origin) {
       // Remember the origin to build ws URL
-      if (!originBase) originBase = msg.origin;
+      if (!originBase) {
+        originBase = msg.origin;
+        search = msg.search || '';
+      }
     }
     if (msg.type === 'connect') {
       if (!socket) openSocket();
@@ -235,4 +254,5 @@ onconnect = function (e) {
     return Response(content=js, media_type="application/javascript")
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# No static assets ship with this demo; don't fail at import when the folder is missing
+app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static", check_dir=False), name="static")
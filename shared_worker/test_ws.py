@@ -1,23 +1,31 @@
+import json
+
 from playwright.sync_api import Page
 
-def test_shared_worker_chart(page: Page):
-    page.goto("http://localhost:8000")
-    page.wait_for_timeout(10_000)
+def test_shared_worker_chart(page: Page, ws_config, ws_waiters):
+    page.goto("/")
+    ws_waiters.wait_for_frame("m => m && m.type === 'data'")
 
-    # Switch interception mode at runtime
-    page.evaluate("() => { window.__ws_intercept__.mode = 'constant' }")
-    page.evaluate("() => { window.__ws_intercept__.constant = 123.45 }")
+    # Switch interception mode at runtime, in one update
+    ws_config.set_mode("constant", const=123.45)
 
     # Now all WS/SharedWorker messages with a `value` field will be rewritten to 123.45
-    page.wait_for_timeout(10_000)
-
-    # Change to increasing mode (start at 0.0, step 0.5)
-    page.evaluate("""() => {
-        const cfg = window.__ws_intercept__;
-        cfg.mode = 'increasing';
-        cfg.start = 0.0;
-        cfg.step = 5;
-        cfg.current = 0.0;
-    }""")
-
-    page.wait_for_timeout(15_000)
+    ws_waiters.wait_for_text("#value", "123.45000")
+
+    # Change to increasing mode (start at 0.0, step 5)
+    ws_config.set_mode("increasing", start=0.0, step=5)
+
+    ws_waiters.wait_for_frame("m => m && m.type === 'data' && m.payload.value >= 10")
+
+
+
+def test_frame_log_records_worker_traffic(page: Page, ws_config, ws_frames, ws_waiters):
+    page.goto("/")
+    ws_config.set_mode("constant", const=7)
+    ws_waiters.wait_for_frame("m => m && m.type === 'data' && m.payload.value === 7")
+
+    batch = ws_frames.drain()
+    assert batch.dropped == 0 and batch.recorded == batch.seen
+    assert [f["seq"] for f in batch.frames] == sorted(f["seq"] for f in batch.frames)
+    last = [f["data"] for f in batch.frames if f["dir"] == "sw-recv"][-1]
+    assert (json.loads(last) if isinstance(last, str) else last)["payload"]["value"] == 7
@@ -1,28 +1,45 @@
 # app.py
-import asyncio
-import math
-import time
+from pathlib import Path
 from fastapi import FastAPI, WebSocket
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
+from ws_intercept.broadcast import BroadcastHub, serve_broadcast
+from ws_intercept.loadgen import LoadProfile, demo_feed, flag, stream
+
+STATIC = Path(__file__).parent / "static"
+
 app = FastAPI()
 
+# ?broadcast=1 serves the feed from one producer shared by all clients
+hub = BroadcastHub()
+
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
-    t0 = time.time()
+    # /ws?rate=...&shape=ticks&... turns the demo feed into a load generator
+    try:
+        profile = LoadProfile.from_query(ws.query_params)
+    except ValueError as e:
+        await ws.close(code=1008, reason=str(e))
+        return
+    stamp = flag(ws.query_params.get("stamp"))  # seq/sent for ws_intercept.latency
     try:
-        while True:
-            t = time.time() - t0
-            value = 1.0 * math.sin(t*2*3.1415/5)
-            await ws.send_json({"ts": time.time(), "value": value})
-            await asyncio.sleep(2)
+        if flag(ws.query_params.get("broadcast")):
+            # One producer per feed for every client asking for it (ws_intercept.broadcast)
+            await serve_broadcast(ws, profile, stamp, hub)
+            return
+        if profile is not None:
+            await stream(ws.send_text, profile)
+            await ws.close()  # duration elapsed
+            return
+        await demo_feed(ws.send_text, stamp)
     except Exception:
         pass
 
 @app.get("/")
 def index():
-    return FileResponse("static/index.html")
+    return FileResponse(STATIC / "index.html")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+app.mount("/static", StaticFiles(directory=STATIC), name="static")
\ No newline at end of file
@@ -6,15 +6,163 @@
 # - Release notes (WS routing): https://playwright.dev/docs/release-notes
 
 from __future__ import annotations
+import asyncio
+import functools
+import inspect
 import json
+import time
 import pytest
-from dataclasses import dataclass
-from typing import Callable, Literal, Union
+from dataclasses import dataclass, field, fields
+from typing import Any, Awaitable, Callable, Literal, Union
+
+from playwright.async_api import BrowserContext as AsyncBrowserContext
+from playwright.sync_api import BrowserContext, TimeoutError
+from ws_intercept.appserver import app_fixtures
+from ws_intercept.binarycodec import BINARY_JS, BinaryCodec, get_binary_codec
+from ws_intercept.conflation import Conflation, ConflationStats, Conflator
+from ws_intercept.hub import FanoutHub, Upstream
+from ws_intercept.jsoncodec import DecodeError, JSONCodec, get_codec
+from ws_intercept.jsonpath import SELECTOR_JS, Selector, compile_selector
+from ws_intercept.latency import LatencyProbe
+from ws_intercept.outbound import OUTBOUND_JS, OutboundAction, OutboundEngine, OutboundStats, make_outbound_rule
+from ws_intercept.patching import patch_number
+from ws_intercept.pool import PooledContext, open_pool
+from ws_intercept.pump import FramePump, Overflow, PumpStats
+from ws_intercept.recorder import Compression, FrameRecorder
+from ws_intercept.replay import Replay
+from ws_intercept.shaping import NetworkProfile, Shaper, ShapingStats
+from ws_intercept.timers import TimerQueue
+from ws_intercept.waiters import WAITERS_JS, PageWaiters
 
 Msg = Union[str, bytes]
 Mode = Literal["untouched", "constant", "increasing", "decreasing"]
 
 
+# In-page runtime for the fast path. It wraps the page's WebSocket (which is
+# Playwright's routing mock once route_web_socket is registered) and applies the
+# built-in modes right where frames are delivered, so untouched/constant/
+# increasing/decreasing traffic never has to visit Python. The rule is pushed
+# from WSBehavior.set_mode() via window.__ws_intercept__.configure(rule).
+INIT_SCRIPT = r"""
+(() => {
+  try {
+    if (window.__ws_intercept__) return;
+    const ctl = window.__ws_intercept__ = {
+      rule: { enabled: false, mode: 'untouched', selector: 'value', constant: 0, incr: 0, decr: 100, step: 1, epoch: 0, outbound: [] },
+      configure(rule) { Object.assign(this.rule, rule); },
+    };
+
+    // Per-socket counters; re-seeded whenever set_mode() passes a new start.
+    const nextValue = (state) => {
+      const r = ctl.rule;
+      if (state.epoch !== r.epoch) {
+        state.epoch = r.epoch;
+        state.incr = r.incr;
+        state.decr = r.decr;
+      }
+      switch (r.mode) {
+        case 'constant':
+          return r.constant;
+        case 'increasing': {
+          const v = state.incr;
+          state.incr += r.step;
+          return v;
+        }
+        case 'decreasing': {
+          const v = state.decr;
+          state.decr -= r.step;
+          return v;
+        }
+        default:
+          return null;
+      }
+    };
+
+    const patch = (state, data) => {
+      const r = ctl.rule;
+      if (!r.enabled || r.mode === 'untouched') return data;
+      const sel = globalThis.__ws_selector__.compile(r.selector);
+      if (typeof data !== 'string') {
+        // binaryType 'arraybuffer' frames, in place (ws_intercept.binarycodec); Blobs pass
+        if (r.binary) globalThis.__ws_binary__.patch(r.binary, data, sel, () => nextValue(state));
+        return data;
+      }
+      if (!sel.mayMatch(data)) return data;
+      let obj;
+      try { obj = JSON.parse(data); } catch (_) { return data; }
+      if (!sel.apply(obj, () => nextValue(state))) return data;
+      return JSON.stringify(obj);
+    };
+
+    // Patch each frame once, however many listeners the page attached.
+    const patchedEvents = new WeakMap();
+    const patchEvent = (state, ev) => {
+      let out = patchedEvents.get(ev);
+      if (!out) {
+        const data = patch(state, ev.data);
+        out = data === ev.data ? ev : new MessageEvent('message', { data, origin: ev.origin, lastEventId: ev.lastEventId });
+        patchedEvents.set(ev, out);
+        if (ctl.notifyDelivered) ctl.notifyDelivered(data);  // ws_intercept.waiters
+      }
+      return out;
+    };
+
+    const OrigWS = window.WebSocket;
+    if (!OrigWS || OrigWS.__patched_by_tests__) return;
+    const PatchedWS = function(url, protocols) {
+      const ws = protocols === undefined ? new OrigWS(url) : new OrigWS(url, protocols);
+      const state = { epoch: -1, incr: 0, decr: 0 };
+      if (ctl.rule.enabled) {
+        // Outbound rules (ws_intercept.outbound); the proxy runs them otherwise
+        const origSend = ws.send.bind(ws);
+        ws.send = globalThis.__ws_outbound__.attach(origSend, () => ctl.rule.outbound);
+      }
+      const wrappers = new WeakMap();
+      const origAdd = ws.addEventListener.bind(ws);
+      const origRemove = ws.removeEventListener.bind(ws);
+      ws.addEventListener = function(type, listener, options) {
+        if (type === 'message' && typeof listener === 'function') {
+          let wrapped = wrappers.get(listener);
+          if (!wrapped) {
+            wrapped = function(ev) { return listener.call(this, patchEvent(state, ev)); };
+            wrappers.set(listener, wrapped);
+          }
+          return origAdd(type, wrapped, options);
+        }
+        return origAdd(type, listener, options);
+      };
+      ws.removeEventListener = function(type, listener, options) {
+        return origRemove(type, (type === 'message' && wrappers.get(listener)) || listener, options);
+      };
+      Object.defineProperty(ws, 'onmessage', {
+        configurable: true,
+        enumerable: true,
+        get() { return this.__onmessage_original || null; },
+        set(fn) {
+          if (this.__onmessage_wrapped) {
+            origRemove('message', this.__onmessage_wrapped);
+            this.__onmessage_wrapped = null;
+          }
+          this.__onmessage_original = fn;
+          if (typeof fn === 'function') {
+            this.__onmessage_wrapped = (ev) => fn.call(ws, patchEvent(state, ev));
+            origAdd('message', this.__onmessage_wrapped);
+          }
+        },
+      });
+      return ws;
+    };
+    PatchedWS.prototype = OrigWS.prototype;
+    for (const k of ['CONNECTING', 'OPEN', 'CLOSING', 'CLOSED']) PatchedWS[k] = OrigWS[k];
+    PatchedWS.__patched_by_tests__ = true;
+    window.WebSocket = PatchedWS;
+  } catch (e) {
+    console.log('[init ERROR]', String(e && e.stack || e));
+  }
+})();
+"""
+
+
 @dataclass
 class WSBehavior:
     """Mutable controls for a single test.
@@ -23,17 +171,78 @@ class WSBehavior:
     By default, traffic is proxied untouched.
     """
 
-    url_pattern: str = "**/ws"           # which WS URLs to intercept
+    url_pattern: str = "**/ws*"          # which WS URLs to intercept (query strings included)
     mode: Mode = "untouched"             # current mode
-    value_key: str = "value"             # JSON field to patch
+    value_key: str = "value"             # JSON field or selector to patch, e.g. "messages[*].ts.tk.ba[0]"
     const_value: float = 0.0              # for constant mode
     _incr: float = 0.0                    # current value for increasing
     _decr: float = 100.0                  # current value for decreasing
     _step: float = 1.0                    # step for inc/dec
+    _epoch: int = 0                       # bumped when `start` re-seeds the counters
+
+    # Run the built-in modes in-page instead of round-tripping every frame
+    # through Python. Hooks (if any) still run in Python, before the in-page rule.
+    fast_path: bool = False
+
+    # JSON backend for the proxy (orjson/msgspec when installed, else stdlib)
+    codec: JSONCodec = field(default_factory=get_codec)
+
+    # Binary frames are patched (and handed to JSON hooks) through this codec;
+    # None passes them through untouched. See set_binary_codec().
+    binary_codec: BinaryCodec | None = None
+
+    # Declarative page -> server rules (see add_outbound_rule) and the
+    # proxy's counters for them
+    outbound_rules: list[dict[str, Any]] = field(default_factory=list)
+    outbound_stats: OutboundStats = field(default_factory=OutboundStats)
+
+    # Network conditions per direction (see set_network), their counters, and
+    # the one timer queue every proxied socket schedules on
+    network_inbound: NetworkProfile | None = None    # server -> page
+    network_outbound: NetworkProfile | None = None   # page -> server
+    inbound_shaping: ShapingStats = field(default_factory=ShapingStats)
+    outbound_shaping: ShapingStats = field(default_factory=ShapingStats)
+    _timers: TimerQueue = field(default_factory=TimerQueue, repr=False)
+
+    # Latest-frame-per-key conflation of server -> page frames (see set_conflation)
+    conflation: Conflation | None = None
+    conflation_stats: ConflationStats = field(default_factory=ConflationStats)
+
+    # Shared upstream connections (see share_upstream)
+    hub: FanoutHub | None = None
+
+    # Queue counters of attach_ws_router_async (both directions, all sockets)
+    pump_stats: PumpStats = field(default_factory=PumpStats)
 
     # Optional custom hooks; if set, they run after mode logic
     inbound_hook: Callable[[Msg], Msg] | None = None   # server -> page
     outbound_hook: Callable[[Msg], Msg] | None = None  # page -> server
+    # Same, but handed the decoded JSON object (run before the raw hooks);
+    # frames that fail to decode skip them and are counted in codec.stats
+    inbound_json_hook: Callable[[Any], Any] | None = None
+    outbound_json_hook: Callable[[Any], Any] | None = None
+
+    _selector: Selector = field(init=False, repr=False)
+
+    # Frame log written by install_ws_router (see start_recording)
+    recorder: FrameRecorder | None = None
+
+    # Recorded session served instead of the backend (see replay_from)
+    replay: Replay | None = None
+
+    # Per-frame latency stamps of proxied frames (set by the ws_latency fixture)
+    latency: LatencyProbe | None = None
+
+    # Called with rule() whenever the config changes (wired up by install_ws_router)
+    _listeners: list[Callable[[dict[str, Any]], None]] = field(default_factory=list, repr=False)
+
+    # In-page waiters of the routed page (set by install_ws_router) and the
+    # Python predicates currently waiting on proxied frames
+    _waiters: PageWaiters | None = field(default=None, repr=False)
+    _frame_checks: list[Callable[[Any], None]] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        self._selector = compile_selector(self.value_key)
 
     def set_mode(
         self,
@@ -51,7 +260,8 @@ class WSBehavior:
             start: starting value for increasing/decreasing.
             step: increment/decrement per frame.
             const: constant value for constant mode.
-            value_key: override which JSON field to patch.
+            value_key: override which JSON field to patch; any selector from
+                ws_intercept.jsonpath, compiled here once.
         """
         self.mode = mode
         if const is not None:
@@ -59,68 +269,735 @@ class WSBehavior:
         if start is not None:
             self._incr = start
             self._decr = start
+            self._epoch += 1
         if step is not None:
             self._step = step
         if value_key is not None:
+            self._selector = compile_selector(value_key)
             self.value_key = value_key
+        self._publish()
+
+    def set_codec(self, name: str) -> None:
+        """Select the JSON backend: "auto", "orjson", "msgspec" or "json"."""
+        self.codec = get_codec(name)
+
+    def set_binary_codec(self, codec: BinaryCodec | str | None, **options: Any) -> None:
+        """Parse binary frames with a ws_intercept.binarycodec codec, or stop (None).
+
+        Args:
+            codec: a codec instance, or "msgpack" / "struct".
+            **options: StructCodec arguments (fmt, fields, repeated, prefix).
+
+        The selector (value_key) then applies to binary frames as well, and
+        fixed-width numbers are overwritten in place. On the fast path only
+        ArrayBuffer frames (binaryType "arraybuffer") are patched, and only in
+        place; Blob frames need the proxy.
+        """
+        self.binary_codec = get_binary_codec(codec, **options) if isinstance(codec, str) else codec
+        self._publish()
+
+    def start_recording(self, path: str, compression: Compression = "zlib") -> FrameRecorder:
+        """Log every frame of sockets opened from now on (see ws_intercept.recorder).
+
+        Frames are logged as they crossed the wire, before any patching, and
+        recording routes traffic through Python even on the fast path.
+        """
+        self.recorder = FrameRecorder(path, compression=compression)
+        return self.recorder
+
+    def replay_from(self, path: str, *, speed: float = 1.0, triggers: bool = False, **kwargs: Any) -> Replay:
+        """Serve sockets opened from now on from a recording instead of the backend.
+
+        Args:
+            path: frame log written by start_recording().
+            speed: time compression (20 -> 20x faster); math.inf for no pacing.
+            triggers: hold playback at each recorded client message until the
+                page sends one.
+            **kwargs: passed on to ws_intercept.replay.Replay.
+
+        Modes and hooks still apply to the replayed frames.
+        """
+        self.replay = Replay(path, speed=speed, triggers=triggers, **kwargs)
+        return self.replay
+
+    def add_outbound_rule(self, action: OutboundAction, **options: Any) -> dict[str, Any]:
+        """Append a page -> server rule: drop, rewrite, delay, dedupe, coalesce or repeat.
+
+        Options are those of ws_intercept.outbound.make_outbound_rule (match,
+        pattern, set, delay_ms, key, window_ms, times, interval_ms). Rules run
+        in the proxy, or in the page on the fast path, and apply to open
+        sockets too. Counters of the proxy are in outbound_stats.
+        """
+        rule = make_outbound_rule(action, **options)
+        self.outbound_rules = [*self.outbound_rules, rule]
+        self._publish()
+        return rule
+
+    def clear_outbound_rules(self) -> None:
+        self.outbound_rules = []
+        self._publish()
+
+    def set_network(
+        self,
+        profile: NetworkProfile | None = None,
+        *,
+        inbound: NetworkProfile | None = None,
+        outbound: NetworkProfile | None = None,
+        **conditions: Any,
+    ) -> None:
+        """Shape proxied traffic like a slow network; no arguments turn it off.
+
+        Args:
+            profile: conditions for both directions.
+            inbound: conditions for server -> page only.
+            outbound: conditions for page -> server only.
+            **conditions: NetworkProfile fields (latency_ms, jitter_ms,
+                bandwidth, burst, loss, duplicate, reorder_ms, seed) for both
+                directions, e.g. set_network(latency_ms=200, loss=0.01).
+
+        Profiles are read per frame, so they apply to open sockets. On the
+        fast path a direction is only proxied if it was shaped when the
+        socket opened.
+        """
+        if conditions:
+            if profile is not None:
+                raise ValueError("pass a profile or conditions, not both")
+            profile = NetworkProfile(**conditions)
+        self.network_inbound = inbound if inbound is not None else profile
+        self.network_outbound = outbound if outbound is not None else profile
+
+    def set_conflation(self, key: str | None, *, interval_ms: float = 100.0) -> None:
+        """Forward only the latest server frame per key every interval_ms; None turns it off.
+
+        Args:
+            key: selector (ws_intercept.jsonpath) whose values form the key,
+                e.g. "sl", or "messages[*].ts.tk.sl" for batched tick frames.
+            interval_ms: how long frames are collected before a flush.
+
+        Conflation runs in the proxy, before modes and hooks, and applies to
+        open sockets. On the fast path only sockets opened while it was set
+        are proxied. Counters are in conflation_stats.
+        """
+        self.conflation = Conflation(key, interval_ms) if key is not None else None
+
+    def share_upstream(
+        self, enabled: bool = True, *, queue_size: int = 256, overflow: Overflow = "drop_oldest"
+    ) -> FanoutHub | None:
+        """Serve sockets to the same URL from one backend connection (see ws_intercept.hub).
+
+        Args:
+            enabled: False goes back to one backend connection per socket.
+            queue_size: frames a page may fall behind the upstream by.
+            overflow: what a full page queue does ("drop_oldest", "drop_newest"
+                or "close").
+
+        Frames are conflated, patched and handed to the hooks once per
+        upstream, then fanned out; each page gets its own queue and network
+        shaping. Hooks must be synchronous, and the latency probe does not
+        see hub frames. Applies to sockets opened afterwards; counters are in
+        hub.stats.
+        """
+        self.hub = FanoutHub(queue_size=queue_size, overflow=overflow) if enabled else None
+        return self.hub
+
+    def set_fast_path(self, enabled: bool = True) -> None:
+        """Toggle the in-page fast path; applies to sockets opened afterwards."""
+        self.fast_path = enabled
+        self._publish()
+
+    def rule(self) -> dict[str, Any]:
+        """The current mode compiled into the JSON rule the in-page runtime runs."""
+        return {
+            "enabled": self.fast_path,
+            "mode": self.mode,
+            "selector": self.value_key,
+            "constant": self.const_value,
+            "incr": self._incr,
+            "decr": self._decr,
+            "step": self._step,
+            "epoch": self._epoch,
+            "binary": self.binary_codec.spec() if self.binary_codec else None,
+            "outbound": self.outbound_rules,
+        }
+
+    def wait_for_frames(self, n: int = 1, *, timeout: float | None = None) -> int:
+        """Block until the page has received `n` more frames; returns the running total.
+
+        Timeouts are in milliseconds (30 s by default) and raise Playwright's
+        TimeoutError. Frames keep being proxied while waiting.
+        """
+        return self._waiters.wait_for_frames(n, timeout=timeout)
+
+    def wait_for_frame(self, predicate: str | Callable[[Any], bool], *, timeout: float | None = None) -> Any:
+        """Block until a frame delivered to the page matches `predicate`; returns it.
+
+        Args:
+            predicate: JS function source evaluated in the page ("f => f.value > 5"),
+                or a Python callable run on the decoded frame as the proxy
+                forwards it (after the mode and hooks). Callables need the
+                proxy, so not the fast path without hooks.
+            timeout: milliseconds, 30 s by default.
+        """
+        if isinstance(predicate, str):
+            return self._waiters.wait_for_frame(predicate, timeout=timeout)
+        if self.fast_path and self.replay is None and self.recorder is None and not (
+            self.inbound_hook or self.inbound_json_hook
+        ):
+            raise ValueError("on the fast path frames bypass Python; pass a JS predicate instead")
+
+        matched: list[Any] = []
+
+        def check(frame: Any) -> None:
+            if not matched and predicate(frame):
+                matched.append(frame)
+
+        if timeout is None:
+            timeout = self._waiters.default_timeout
+        deadline = time.monotonic() + timeout / 1000
+        self._frame_checks.append(check)
+        try:
+            while not matched:
+                remaining = (deadline - time.monotonic()) * 1000
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for a frame matching {predicate!r} ({timeout} ms)")
+                # Wakes up on every delivered frame; the proxy ran check() before sending it
+                self._waiters.wait_for_frames(1, timeout=remaining)
+        finally:
+            self._frame_checks.remove(check)
+        return matched[0]
+
+    def wait_for_text(self, selector: str, text: str, *, timeout: float | None = None) -> None:
+        """Block until the element at CSS `selector` renders exactly `text`."""
+        self._waiters.wait_for_text(selector, text, timeout=timeout)
+
+    def reset(self) -> None:
+        """Back to a fresh WSBehavior's settings, keeping the router attached.
+
+        Used between tests on a pooled context (ws_intercept.pool), where one
+        behavior drives the context's route for its whole life.
+        """
+        if self.recorder:
+            self.recorder.close()
+        fresh = WSBehavior(url_pattern=self.url_pattern)
+        for f in fields(self):
+            if f.name not in ("url_pattern", "_listeners", "_waiters", "_timers"):
+                setattr(self, f.name, getattr(fresh, f.name))
+        self._publish()
+
+    def _check_frame(self, msg: Msg) -> None:
+        frame: Any = msg
+        codec = self.codec if isinstance(msg, str) else self.binary_codec
+        if codec is not None:
+            try:
+                frame = codec.decode(msg)
+            except DecodeError:
+                pass
+        for check in list(self._frame_checks):
+            check(frame)
+
+    def _publish(self) -> None:
+        rule = self.rule()
+        for listener in self._listeners:
+            listener(rule)
+
+
+# simple_ws.app in-process on an ephemeral port, unless --base-url points elsewhere
+app_server, base_url = app_fixtures("simple_ws.app:app")
+
+
+@pytest.fixture(scope="session")
+def context_pool(request):
+    """Contexts with the router attached once each, when run with --ws-pool N."""
+
+    def setup(context) -> WSBehavior:
+        behavior = WSBehavior()
+        attach_ws_router(context, behavior)
+        return behavior
+
+    pool = open_pool(request, setup, reset=lambda lease: lease.state.reset())
+    yield pool
+    if pool is not None:
+        pool.close()
 
 
 @pytest.fixture
-def ws_behavior() -> WSBehavior:
+def ws_behavior(pooled_context: PooledContext | None) -> WSBehavior:
     """Per-test behavior object. Modify it inside tests as needed."""
-    return WSBehavior()
+    return pooled_context.state if pooled_context is not None else WSBehavior()
 
 
-@pytest.fixture(autouse=True)
-def install_ws_router(page, ws_behavior: WSBehavior):
-    """Auto-install a WS proxy for each test.
+class _Connection:
+    """Per-connection frame transforms, shared by the sync and asyncio routers.
+
+    Counters live here so they do not bleed across sockets. The *_async
+    variants also accept hooks that return awaitables.
+    """
+
+    def __init__(self, behavior: WSBehavior) -> None:
+        self.b = behavior
+        self.fast_path = behavior.fast_path   # fixed for the life of the socket
+        self.incr, self.decr, self.epoch = behavior._incr, behavior._decr, behavior._epoch
+        self.closed = False
+
+    def next_value(self) -> float:
+        """Value for the next patched frame; only called when a frame has the key."""
+        b = self.b
+        if self.epoch != b._epoch:
+            # set_mode(start=...) re-seeds the series on open sockets too
+            self.incr, self.decr, self.epoch = b._incr, b._decr, b._epoch
+        m = b.mode
+        if m == "increasing":
+            v = self.incr
+            self.incr += b._step
+            return v
+        if m == "decreasing":
+            v = self.decr
+            self.decr -= b._step
+            return v
+        return b.const_value
+
+    def patch_frame(self, msg: str) -> str:
+        """Frames without a match (and everything in "untouched" mode) go out byte-for-byte."""
+        sel, codec = self.b._selector, self.b.codec
+        key = sel.top_level_key
+        if key is not None:
+            # Splices the number in place without decoding the frame
+            return patch_number(msg, key, self.next_value, loads=codec.decode, dumps=codec.encode)
+        if not sel.may_match(msg):
+            return msg
+        try:
+            obj = codec.decode(msg)
+        except DecodeError:
+            return msg
+        return codec.encode(obj) if sel.apply(obj, lambda _: self.next_value()) else msg
+
+    def _hook_input(self, msg: Msg, patch: bool) -> tuple[Any, Any] | None:
+        """(codec, decoded frame) for a JSON hook, with the mode applied if `patch`."""
+        b = self.b
+        codec = b.codec if isinstance(msg, str) else b.binary_codec
+        if codec is None:
+            return None
+        try:
+            obj = codec.decode(msg)
+        except DecodeError:
+            return None  # counted in codec.stats; the raw hook still sees it
+        if patch and b.mode != "untouched":
+            b._selector.apply(obj, lambda _: self.next_value())
+        return codec, obj
+
+    def run_hooks(self, msg: Msg, json_hook, raw_hook, *, patch: bool = False) -> Msg:
+        """Decode once for json_hook (applying the mode to the object), then raw_hook."""
+        decoded = json_hook and self._hook_input(msg, patch)
+        if decoded:
+            codec, obj = decoded
+            msg = codec.encode(json_hook(obj))
+        return raw_hook(msg) if raw_hook else msg
+
+    async def run_hooks_async(self, msg: Msg, json_hook, raw_hook, *, patch: bool = False) -> Msg:
+        decoded = json_hook and self._hook_input(msg, patch)
+        if decoded:
+            codec, obj = decoded
+            msg = codec.encode(await _resolve(json_hook(obj)))
+        return await _resolve(raw_hook(msg)) if raw_hook else msg
+
+    def _patch_mode(self, msg: Msg) -> Msg:
+        """server -> page mutation according to the current mode (left to the page on the fast path)."""
+        b = self.b
+        if self.fast_path or b.inbound_json_hook is not None or b.mode == "untouched":
+            return msg
+        if isinstance(msg, str):
+            return self.patch_frame(msg)
+        if b.binary_codec is not None:
+            return b.binary_codec.patch(msg, b._selector, self.next_value)
+        return msg
+
+    def _checked(self, msg: Msg) -> Msg:
+        if self.b._frame_checks:
+            self.b._check_frame(msg)  # before sending, so the page-side wake-up sees the match
+        return msg
+
+    def inbound(self, msg: Msg) -> Msg:
+        b = self.b
+        msg = self.run_hooks(self._patch_mode(msg), b.inbound_json_hook, b.inbound_hook, patch=not self.fast_path)
+        return self._checked(msg)
+
+    def outbound(self, msg: Msg) -> Msg:
+        """page -> server (left unchanged unless a hook is set)."""
+        return self.run_hooks(msg, self.b.outbound_json_hook, self.b.outbound_hook)
+
+    async def inbound_async(self, msg: Msg) -> Msg:
+        b = self.b
+        msg = await self.run_hooks_async(self._patch_mode(msg), b.inbound_json_hook, b.inbound_hook,
+                                         patch=not self.fast_path)
+        return self._checked(msg)
+
+    async def outbound_async(self, msg: Msg) -> Msg:
+        return await self.run_hooks_async(msg, self.b.outbound_json_hook, self.b.outbound_hook)
+
+    def connect(self, ws_route, server, deliver: Callable[[Msg, int], Any]) -> tuple[bool, bool]:
+        """Set up proxying between the page and the backend.
+
+        Server frames handed to from_server() reach deliver(msg, t_recv_ns)
+        once conflation lets them through. Returns whether page -> server and
+        server -> page frames need an on_message handler; otherwise Playwright
+        forwards them itself.
+        """
+        b = self.b
+        self.conflator = Conflator(lambda: b.conflation, deliver, timers=b._timers, stats=b.conflation_stats,
+                                   loads=lambda m: b.codec.decode(m))
+        self.ws_route, self.server = ws_route, server
+        self.rec = b.recorder
+        self.conn = self.rec.open_connection(ws_route.url) if self.rec else 0
+        self.probe = b.latency
+        self.probe_conn = self.probe.open_connection() if self.probe else 0
+        # Network shaping sits last in each direction, right before the wire
+        self.shape_in = Shaper(lambda: b.network_inbound, ws_route.send, timers=b._timers, stats=b.inbound_shaping)
+        self.shape_out = Shaper(lambda: b.network_outbound, server.send, timers=b._timers, stats=b.outbound_shaping)
+        # On the fast path the page runs the outbound rules itself
+        self.engine = None if self.fast_path else OutboundEngine(
+            lambda: b.outbound_rules,
+            self.shape_out.push,
+            timers=b._timers,
+            stats=b.outbound_stats,
+            loads=lambda m: b.codec.decode(m),
+            dumps=lambda obj: b.codec.encode(obj),
+        )
+        if not self.fast_path:
+            return True, True
+        # Without on_message handlers Playwright forwards frames itself and the
+        # in-page rule applies the mode; only hooked, recorded or shaped
+        # directions come here.
+        rec = self.rec is not None
+        return (
+            bool(rec or b.outbound_hook or b.outbound_json_hook or b.network_outbound),
+            bool(rec or b.inbound_hook or b.inbound_json_hook or b.network_inbound or b.conflation),
+        )
+
+    def join_hub(self, ws_route) -> None:
+        """Serve the socket from the hub, connecting to the server if it is the first for its URL."""
+        b = self.b
+        shape = Shaper(lambda: b.network_inbound, ws_route.send, timers=b._timers, stats=b.inbound_shaping)
+
+        def connect(upstream: Upstream) -> None:
+            server = ws_route.connect_to_server()
+            # Processed once here, then fanned out
+            self.connect(ws_route, server, lambda m, t: upstream.publish(self.inbound(m)))
+            server.on_message(self.from_server)
+
+            def to_server(m: Msg) -> None:
+                self.record("outbound", m)
+                self.to_server(self.outbound(m))
+
+            def close(code: int | None = None, reason: str | None = None):
+                self.close()
+                return server.close(code=code, reason=reason)
+
+            def server_closed(code, reason) -> None:
+                self.close()
+                upstream.server_closed(code, reason)
+
+            server.on_close(server_closed)
+            upstream.attach(to_server, close)
+
+        upstream = b.hub.subscribe(ws_route, connect, deliver=shape.push)
+        ws_route.on_message(upstream.send)
+
+        def closed(code, reason) -> None:
+            shape.close()
+            upstream.leave(ws_route)
+
+        ws_route.on_close(closed)
+
+    def needs_close_handlers(self) -> bool:
+        b = self.b
+        return bool(self.rec or self.engine or b.network_inbound or b.network_outbound or b.conflation)
+
+    def record(self, direction: Literal["inbound", "outbound"], msg: Msg) -> None:
+        if self.rec:
+            self.rec.record(self.conn, direction, msg)
+
+    def from_server(self, msg: Msg) -> None:
+        """A frame arrived from the backend: record it, then conflate it."""
+        t_recv = time.time_ns() if self.probe else 0
+        if self.rec:
+            self.rec.record(self.conn, "inbound", msg)
+        self.conflator.push(msg, t_recv)
+
+    def to_server(self, msg: Msg) -> None:
+        """Send a transformed page frame on through the outbound rules and shaping."""
+        if self.engine is not None:
+            self.engine.push(msg)
+        else:
+            self.shape_out.push(msg)
+
+    def to_page(self, original: Msg, msg: Msg, t_recv: int) -> None:
+        """Send a transformed server frame on to the page."""
+        if self.probe:
+            self.probe.on_forward(original, conn=self.probe_conn, mode=self.b.mode, t_recv_ns=t_recv,
+                                  t_fwd_ns=time.time_ns())
+        self.shape_in.push(msg)
+
+    def close(self) -> None:
+        """The socket is gone: release what the connection holds, once."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.rec:
+            self.rec.close_connection(self.conn)
+        if self.engine is not None:
+            self.engine.close()
+        self.conflator.close()
+        self.shape_in.close()
+        self.shape_out.close()
+
+
+async def _resolve(value: Any) -> Any:
+    return await value if inspect.isawaitable(value) else value
+
+
+# In-page patches of the router, in registration order
+PAGE_SCRIPTS = (SELECTOR_JS, BINARY_JS, OUTBOUND_JS, INIT_SCRIPT, WAITERS_JS)
+_APPLY_RULE = "rule => window.__ws_intercept__ && window.__ws_intercept__.configure(rule)"
+
+
+def _rule_script(rule: dict[str, Any]) -> str:
+    return f"window.__ws_intercept__ && window.__ws_intercept__.configure({json.dumps(rule)});"
+
+
+def attach_ws_router(target, ws_behavior: WSBehavior) -> Callable[[], None]:
+    """Route the sockets of a page or context through a proxy driven by ws_behavior; returns detach().
 
     Default: passthrough. Tests can call ws_behavior.set_mode(...) to switch to
     constant/increasing/decreasing mid-test. The route is attached to THIS page
-    only, so parallel tests stay isolated.
+    only, so parallel tests stay isolated. A BrowserContext target covers all
+    of its pages (pooled contexts); ws_behavior.wait_for_*() then needs
+    ws_behavior._waiters set to the page under test.
+
+    With ws_behavior.fast_path enabled, the built-in modes run in the page and
+    frames only pass through Python when an inbound/outbound hook is set.
+    JSON is handled by ws_behavior.codec (see ws_intercept.jsoncodec), binary
+    frames by ws_behavior.binary_codec (ws_intercept.binarycodec), and
+    ws_behavior.wait_for_*() wait on frames delivered to this page.
     """
 
     def handler(ws_route):
+        frames = _Connection(ws_behavior)
+
+        if ws_behavior.replay is not None:
+            # Serve the recorded session; no backend connection is made at all.
+            ws_behavior.replay.play(ws_route, transform=frames.inbound)
+            return
+        if ws_behavior.hub is not None:
+            frames.join_hub(ws_route)
+            return
+
         # Connect to the real backend; we are in proxy mode now.
         server = ws_route.connect_to_server()
+        proxy_out, proxy_in = frames.connect(ws_route, server, lambda m, t: frames.to_page(m, frames.inbound(m), t))
 
-        # Per-connection counters (do not bleed across sockets)
-        state = {"incr": ws_behavior._incr, "decr": ws_behavior._decr}
-
-        def patch_inbound(msg: Msg) -> Msg:
-            """server -> page mutation according to current mode."""
-            if isinstance(msg, (bytes, bytearray)):
-                return ws_behavior.inbound_hook(msg) if ws_behavior.inbound_hook else msg
-            try:
-                obj = json.loads(msg)
-            except Exception:
-                return ws_behavior.inbound_hook(msg) if ws_behavior.inbound_hook else msg
-
-            m = ws_behavior.mode
-            if m == "constant":
-                obj[ws_behavior.value_key] = ws_behavior.const_value
-            elif m == "increasing":
-                obj[ws_behavior.value_key] = state["incr"]
-                state["incr"] += ws_behavior._step
-            elif m == "decreasing":
-                obj[ws_behavior.value_key] = state["decr"]
-                state["decr"] -= ws_behavior._step
-            # "untouched" -> no change
-
-            out = json.dumps(obj)
-            return ws_behavior.inbound_hook(out) if ws_behavior.inbound_hook else out
-
-        def patch_outbound(msg: Msg) -> Msg:
-            """page -> server (left unchanged unless a hook is set)."""
-            if ws_behavior.outbound_hook:
-                return ws_behavior.outbound_hook(msg)
-            return msg
+        def from_page(m: Msg) -> None:
+            frames.record("outbound", m)
+            frames.to_server(frames.outbound(m))
 
         # Once handlers are attached, you MUST forward messages manually.
-        ws_route.on_message(lambda m: server.send(patch_outbound(m)))   # page -> server
-        server.on_message(lambda m: ws_route.send(patch_inbound(m)))    # server -> page
+        if proxy_out:
+            ws_route.on_message(from_page)             # page -> server
+        if proxy_in:
+            server.on_message(frames.from_server)      # server -> page
+
+        if frames.needs_close_handlers():
+            # Close handlers replace Playwright's automatic forwarding as well;
+            # frames still held back die with the socket
+            def closed(forward, code, reason) -> None:
+                frames.close()
+                forward(code=code, reason=reason)
+
+            ws_route.on_close(lambda code, reason: closed(server.close, code, reason))
+            server.on_close(lambda code, reason: closed(ws_route.close, code, reason))
+
+    is_context = isinstance(target, BrowserContext)
+    rule_script = None
+
+    def push_rule(rule: dict[str, Any]) -> None:
+        """Deliver a new rule to the live documents and to future navigations."""
+        nonlocal rule_script
+        previous = rule_script
+        rule_script = target.add_init_script(_rule_script(rule))
+        if previous is not None:
+            previous.dispose()  # only the latest rule has to run on navigation
+        for page in target.pages if is_context else [target]:
+            page.evaluate(_APPLY_RULE, rule)
+
+    # Register before navigation so sockets are routed. The route goes first:
+    # Playwright installs its WebSocket mock as an init script, and ours has to
+    # run after it to wrap the mock.
+    target.route_web_socket(ws_behavior.url_pattern, handler)
+    for script in PAGE_SCRIPTS:
+        target.add_init_script(script)
+    push_rule(ws_behavior.rule())
+    ws_behavior._listeners.append(push_rule)
+    ws_behavior._waiters = None if is_context else PageWaiters(target)
+
+    def detach() -> None:
+        ws_behavior._listeners.remove(push_rule)
+        ws_behavior._waiters = None
+        if rule_script is not None:
+            rule_script.dispose()
+        if ws_behavior.recorder:
+            ws_behavior.recorder.close()
+
+    return detach
+
+
+async def attach_ws_router_async(
+    target,
+    ws_behavior: WSBehavior,
+    *,
+    queue_size: int = 1024,
+    overflow: Overflow = "close",
+) -> Callable[[], Awaitable[None]]:
+    """attach_ws_router for the asyncio Playwright API; returns an async detach().
+
+    Each socket gets a bounded queue per direction (ws_intercept.pump), drained
+    by its own task, so a slow hook only holds up its own socket and one event
+    loop can drive dozens of pages. Hooks may be coroutine functions here.
+    When a queue fills up, `overflow` applies: "close" closes the socket with
+    1013, "drop_oldest"/"drop_newest" discard frames. Counters are in
+    ws_behavior.pump_stats.
+
+    Everything else behaves as with the sync router, except the blocking
+    ws_behavior.wait_for_*() helpers (use expect() or page.wait_for_function())
+    and replays and shared upstreams, whose hooks must stay synchronous.
+    """
+    tasks: set[asyncio.Future] = set()
+
+    def spawn(aw: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(aw)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def call(fn: Callable[..., Any], **kwargs: Any) -> None:
+        # The server side of a route is not wrapped by the async API: its
+        # close() is synchronous, the page side's a coroutine
+        result = fn(**kwargs)
+        if inspect.isawaitable(result):
+            spawn(result)
+
+    def handler(ws_route) -> None:
+        frames = _Connection(ws_behavior)
+        if ws_behavior.replay is not None:
+            ws_behavior.replay.play(ws_route, transform=frames.inbound)
+            return
+        if ws_behavior.hub is not None:
+            frames.join_hub(ws_route)
+            return
+
+        server = ws_route.connect_to_server()
+        proxy_out, proxy_in = frames.connect(ws_route, server, lambda m, t: to_page.put((m, t)))
+        pumps: list[FramePump] = []
+
+        def pump(transform, send) -> FramePump:
+            p = FramePump(transform, send, maxsize=queue_size, overflow=overflow,
+                          on_overflow=overloaded, stats=ws_behavior.pump_stats)
+            pumps.append(p.start())
+            return p
+
+        def overloaded() -> None:
+            shut()
+            call(server.close, code=1013, reason="proxy queue full")
+            call(ws_route.close, code=1013, reason="proxy queue full")
+
+        def shut() -> None:
+            frames.close()
+            for p in pumps:
+                p.close()
+
+        if proxy_out:
+            to_server = pump(frames.outbound_async, frames.to_server)
 
-    # Register before navigation so sockets are routed.
-    page.route_web_socket(ws_behavior.url_pattern, handler)
+            def from_page(m: Msg) -> None:
+                frames.record("outbound", m)
+                to_server.put(m)
+
+            ws_route.on_message(from_page)
+
+        if proxy_in:
+            async def inbound(item: tuple[Msg, int]) -> tuple[Msg, Msg, int]:
+                m, t_recv = item
+                return m, await frames.inbound_async(m), t_recv
+
+            to_page = pump(inbound, lambda r: frames.to_page(*r))
+            server.on_message(frames.from_server)
+
+        if pumps or frames.needs_close_handlers():
+            async def closed(forward, code, reason) -> None:
+                for p in pumps:
+                    await p.drain()   # what was queued before the close still goes out
+                shut()
+                result = forward(code=code, reason=reason)
+                if inspect.isawaitable(result):
+                    await result
+
+            ws_route.on_close(lambda code, reason: spawn(closed(server.close, code, reason)))
+            server.on_close(lambda code, reason: spawn(closed(ws_route.close, code, reason)))
+
+    is_context = isinstance(target, AsyncBrowserContext)
+    rule_script = None
+    lock = asyncio.Lock()   # rules are applied in publish order
+
+    async def push_rule(rule: dict[str, Any]) -> None:
+        nonlocal rule_script
+        async with lock:
+            previous = rule_script
+            rule_script = await target.add_init_script(_rule_script(rule))
+            if previous is not None:
+                await previous.dispose()
+            for page in target.pages if is_context else [target]:
+                await page.evaluate(_APPLY_RULE, rule)
+
+    def publish(rule: dict[str, Any]) -> None:
+        spawn(push_rule(rule))
+
+    await target.route_web_socket(ws_behavior.url_pattern, handler)
+    for script in PAGE_SCRIPTS:
+        await target.add_init_script(script)
+    await push_rule(ws_behavior.rule())
+    ws_behavior._listeners.append(publish)
+
+    async def detach() -> None:
+        ws_behavior._listeners.remove(publish)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if rule_script is not None:
+            await rule_script.dispose()
+        if ws_behavior.recorder:
+            ws_behavior.recorder.close()
+
+    return detach
+
+
+@pytest.fixture
+def ws_router_async() -> tuple[WSBehavior, Callable[..., Awaitable[Callable[[], Awaitable[None]]]]]:
+    """A fresh WSBehavior and attach_ws_router_async bound to it.
+
+    For tests that drive their own asyncio Playwright; run it in a thread, as
+    the sync fixtures own the event loop of this one.
+    """
+    behavior = WSBehavior()
+    return behavior, functools.partial(attach_ws_router_async, ws_behavior=behavior)
+
+
+@pytest.fixture(autouse=True)
+def install_ws_router(page, ws_behavior: WSBehavior, pooled_context: PooledContext | None):
+    """Auto-install a WS proxy for each test (see attach_ws_router).
+
+    Pooled contexts (--ws-pool) had it attached once, when the pool made them.
+    """
+    if pooled_context is not None:
+        ws_behavior._waiters = PageWaiters(page)
+        yield
+        return
+    detach = attach_ws_router(page, ws_behavior)
     yield
+    detach()
     # Teardown handled automatically when page/context closes.
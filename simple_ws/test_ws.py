@@ -1,25 +1,145 @@
-from playwright.sync_api import Page
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def test_default(page):
-    page.goto("http://localhost:8000/")
-    page.wait_for_timeout(8_000)
+from playwright.async_api import async_playwright, expect as async_expect
+from playwright.sync_api import Page, expect
+
+from ws_intercept.recorder import FrameLog, FrameRecorder
+
+STATIC = Path(__file__).parent / "static"
+
+def test_default(page, ws_behavior):
+    page.goto("/")
+    ws_behavior.wait_for_frames(3)
 
 def test_constant_mid_run(page: Page, ws_behavior):
-    page.goto("http://localhost:8000/")
-    page.wait_for_timeout(4_000)
+    page.goto("/")
+    ws_behavior.wait_for_frames(2)
 
     current_value = page.locator("css=#current-value").inner_html()
     ws_behavior.set_mode("constant", const=float(current_value))
-    page.wait_for_timeout(8_000)
+    ws_behavior.wait_for_frames(3)
+    assert page.locator("css=#current-value").inner_html() == current_value
 
 def test_increasing_then_decreasing(page, ws_behavior):
-    page.goto("http://localhost:8000")
-    page.wait_for_timeout(4_000)
+    page.goto("/")
+    ws_behavior.wait_for_frames(2)
 
     current_value = page.locator("css=#current-value").inner_html()
-    ws_behavior.set_mode("increasing", start=float(current_value), step=5.0)
-    page.wait_for_timeout(8_000)
+    start = float(current_value)
+    ws_behavior.set_mode("increasing", start=start, step=5.0)
+    ws_behavior.wait_for_frame(lambda f: f["value"] >= start + 10.0)
 
     current_value = page.locator("css=#current-value").inner_html()
-    ws_behavior.set_mode("decreasing", start=float(current_value), step=10.0)
-    page.wait_for_timeout(8_000)
\ No newline at end of file
+    start = float(current_value)
+    ws_behavior.set_mode("decreasing", start=start, step=10.0)
+    ws_behavior.wait_for_frame(lambda f: f["value"] <= start - 20.0)
+
+def test_fast_path_constant(page: Page, ws_behavior):
+    ws_behavior.set_fast_path()
+    page.goto("/")
+    ws_behavior.wait_for_frames(1)
+
+    ws_behavior.set_mode("constant", const=42.0)
+    ws_behavior.wait_for_text("#current-value", "42.00")
+
+def test_recording(page: Page, ws_behavior, tmp_path):
+    ws_behavior.start_recording(tmp_path / "session.wsrec")
+    page.goto("/")
+    ws_behavior.wait_for_frames(2)
+    ws_behavior.recorder.flush()
+
+    with FrameLog(tmp_path / "session.wsrec") as log:
+        inbound = [f for f in log if f.direction == "inbound"]
+    assert len(inbound) >= 2
+    assert "value" in json.loads(inbound[0].payload)
+
+
+def test_replay_without_backend(page: Page, ws_behavior, tmp_path, base_url):
+    # Ten frames on the app's 2 s cadence, replayed at 20x: ~1 s instead of 20 s
+    path = tmp_path / "feed.wsrec"
+    with FrameRecorder(path) as rec:
+        conn = rec.open_connection("ws://localhost:8000/ws", t_ns=0)
+        for i in range(10):
+            frame = {"ts": 1756320764 + 2 * i, "value": i / 10}
+            rec.record(conn, "inbound", json.dumps(frame), t_ns=i * 2_000_000_000)
+    ws_behavior.replay_from(path, speed=20)
+
+    # The page itself is served from disk too; the app server is never hit
+    page.route(f"{base_url}/", lambda route: route.fulfill(path=STATIC / "index.html"))
+    page.goto("/")
+    expect(page.locator("css=#current-value")).to_have_text("0.90", timeout=5_000)
+
+
+def test_latency_instrumentation(page: Page, ws_behavior, ws_latency):
+    # Stamped demo-shaped feed at 20 msg/s; the proxy must not add measurable lag
+    page.goto("/?rate=20&stamp=1")
+    ws_behavior.set_mode("constant", const=1.0)
+    ws_behavior.wait_for_frames(20)
+
+    stats = ws_latency.collect()
+    assert stats.by("end_to_end")["constant"].count >= 15
+    assert stats.by("proxy")["constant"].percentile(99) < 50_000   # µs
+
+
+def test_conflation_under_burst_load(page: Page, ws_behavior):
+    # 1000 msg/s over 4 symbols, conflated to the latest frame per symbol every 100 ms
+    ws_behavior.set_conflation("sl", interval_ms=100)
+    page.goto("/?rate=1000&symbols=4")
+    ws_behavior.wait_for_frames(20)
+
+    stats = ws_behavior.conflation_stats
+    assert stats.coalesced > stats.forwarded
+    assert stats.forwarded <= 4 * (stats.flushes + 1)
+
+
+def test_async_router_drives_many_pages(ws_router_async, base_url, browser_type, browser_type_launch_args):
+    behavior, attach = ws_router_async
+
+    async def slow_hook(frame):
+        await asyncio.sleep(0.05)    # awaited per socket; the other sockets keep flowing
+        frame["value"] = 42
+        return frame
+
+    async def main():
+        async with async_playwright() as p:
+            browser = await p[browser_type.name].launch(**browser_type_launch_args)
+            context = await browser.new_context(base_url=base_url)
+            detach = await attach(context, queue_size=64)
+            behavior.inbound_json_hook = slow_hook
+            pages = [await context.new_page() for _ in range(8)]
+            await asyncio.gather(*(pg.goto("/?rate=20") for pg in pages))
+            for pg in pages:
+                await async_expect(pg.locator("css=#current-value")).to_have_text("42.00")
+            await detach()
+            await browser.close()
+
+    # The sync fixtures own this thread's event loop
+    with ThreadPoolExecutor(1) as pool:
+        pool.submit(asyncio.run, main()).result()
+    assert behavior.pump_stats.sent >= 8 and behavior.pump_stats.errors == 0
+
+
+def test_shared_upstream_fans_out(ws_router_async, base_url, browser_type, browser_type_launch_args):
+    behavior, attach = ws_router_async
+    hub = behavior.share_upstream()
+    behavior.set_mode("constant", const=7.0)
+
+    async def main():
+        async with async_playwright() as p:
+            browser = await p[browser_type.name].launch(**browser_type_launch_args)
+            context = await browser.new_context(base_url=base_url)
+            detach = await attach(context)
+            pages = [await context.new_page() for _ in range(6)]
+            await asyncio.gather(*(pg.goto("/?rate=20") for pg in pages))
+            for pg in pages:
+                await async_expect(pg.locator("css=#current-value")).to_have_text("7.00")
+            await detach()
+            await browser.close()
+
+    with ThreadPoolExecutor(1) as pool:
+        pool.submit(asyncio.run, main()).result()
+    # One backend socket, and one patch per frame, for all six pages
+    assert hub.stats.upstreams == 1 and hub.stats.subscribers == 6
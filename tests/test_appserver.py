@@ -0,0 +1,19 @@
+import urllib.request
+
+from fastapi import FastAPI
+
+from ws_intercept.appserver import AppServer
+
+
+def test_serves_on_ephemeral_ports_and_stops():
+    app = FastAPI()
+
+    @app.get("/")
+    def index():
+        return {"ok": True}
+
+    with AppServer(app) as a, AppServer(app) as b:
+        assert a.port != b.port and a.port > 0
+        assert urllib.request.urlopen(a.base_url + "/").read() == b'{"ok":true}'
+        assert b.ws_url == f"ws://127.0.0.1:{b.port}"
+    assert not a._thread.is_alive()
@@ -0,0 +1,138 @@
+import json
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from ws_intercept.binarycodec import BINARY_JS, BinaryCodec, MessagePackCodec, StructCodec, get_binary_codec, msgpack, msgspec
+from ws_intercept.jsoncodec import DecodeError
+from ws_intercept.jsonpath import SELECTOR_JS
+from ws_intercept.runtime import render, runtime_config
+
+needs_msgpack = pytest.mark.skipif(msgspec is None and msgpack is None, reason="no MessagePack library installed")
+
+
+def counter(start=0):
+    n = [start]
+
+    def value():
+        n[0] += 1
+        return n[0]
+    return value
+
+
+# {"ts": 1.5 (float64), "payload": {"value": 7 (uint32), "name": "x"}, "ticks": [2.0 (float32), 3 (int8)]}
+PACKED = (
+    b"\x83"
+    b"\xa2ts\xcb" + struct.pack(">d", 1.5)
+    + b"\xa7payload\x82\xa5value\xce" + struct.pack(">I", 7) + b"\xa4name\xa1x"
+    + b"\xa5ticks\x92\xca" + struct.pack(">f", 2.0) + b"\xd0\x03"
+)
+
+
+def test_msgpack_patches_fixed_width_numbers_in_place():
+    codec = MessagePackCodec()
+    out = codec.patch(PACKED, "payload.value", lambda: 42)
+    assert len(out) == len(PACKED) and out[out.index(b"value") + 5:][:5] == b"\xce" + struct.pack(">I", 42)
+    out = codec.patch(out, "ticks[*]", counter(10))
+    assert struct.unpack(">f", out[-6:-2]) == (11.0,) and out[-1] == 12
+    assert codec.patch(PACKED, "missing|also.missing", counter()) is PACKED
+    assert codec.patched_in_place == 2 and codec.reencoded == 0
+    truncated = PACKED[:-3]
+    assert codec.patch(truncated, "ticks[0]", counter()) is truncated
+    assert codec.stats.decode_errors == 1
+
+
+@needs_msgpack
+def test_msgpack_falls_back_to_reencoding():
+    codec = MessagePackCodec()
+    doc = codec.decode(PACKED)
+    assert doc == {"ts": 1.5, "payload": {"value": 7, "name": "x"}, "ticks": [2.0, 3]}
+    # A float does not fit the uint32, a string is no number at all
+    assert codec.decode(codec.patch(PACKED, "payload.value", lambda: 0.5))["payload"]["value"] == 0.5
+    assert codec.decode(codec.patch(PACKED, "payload.name", lambda: 1))["payload"]["name"] == 1
+    assert codec.reencoded == 2 and codec.patched_in_place == 0
+    with pytest.raises(DecodeError):
+        codec.decode(b"\xc1")
+
+
+def test_struct_codec_records_and_length_prefix():
+    codec = StructCodec(">Hd4sxf", ["id", "price", "tag", "qty"], repeated=True, prefix=">I")
+    records = [{"id": 1, "price": 1.5, "tag": b"abcd", "qty": 2.0}, {"id": 2, "price": 2.5, "tag": b"efgh", "qty": 4.0}]
+    frame = codec.encode(records)
+    assert len(frame) == 4 + 2 * codec.size and struct.unpack_from(">I", frame)[0] == 2 * codec.size
+    assert codec.decode(frame) == records
+
+    out = codec.patch(frame, "[*].price", counter(100))
+    assert [r["price"] for r in codec.decode(out)] == [101.0, 102.0] and out[:4] == frame[:4]
+    out = codec.patch(frame, "[1].qty", lambda: 9)
+    assert codec.decode(out)[1]["qty"] == 9.0 and codec.decode(out)[0] == records[0]
+    assert codec.patch(frame, "price", counter()) is frame     # records are addressed by index
+    assert codec.decode(codec.patch(frame, "[0].tag", lambda: b"zzzz"))[0]["tag"] == b"zzzz"
+    assert codec.reencoded == 1
+
+    with pytest.raises(DecodeError):
+        codec.decode(frame[:-1])
+    with pytest.raises(ValueError):
+        StructCodec("Hd", ["id", "price"])           # native alignment
+    with pytest.raises(ValueError):
+        StructCodec("<Hd", ["id"])
+    assert get_binary_codec("struct", fmt="<d", fields=["value"]).decode(struct.pack("<d", 3.0)) == {"value": 3.0}
+
+
+def test_plugins_must_implement_the_wire_format():
+    class Partial(BinaryCodec):
+        def _loads(self, view):
+            return bytes(view)
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_page_patcher_matches_python():
+    single = StructCodec("<Hd", ["id", "value"])
+    frames = {
+        "msgpack": [list(PACKED), MessagePackCodec().spec(), "payload.value|value"],
+        "msgpack_float": [list(PACKED), MessagePackCodec().spec(), "payload.value", 0.5],
+        "struct": [list(single.encode({"id": 3, "value": 1.0})), single.spec(), "value"],
+        "struct_text": [list(StructCodec("<H2s", ["id", "tag"]).encode({"id": 1, "tag": b"ab"})),
+                        StructCodec("<H2s", ["id", "tag"]).spec(), "tag"],
+    }
+    script = SELECTOR_JS + BINARY_JS + """
+const cases = %s;
+const out = {};
+for (const [name, [bytes, spec, expr, value]] of Object.entries(cases)) {
+  const buf = new Uint8Array(bytes).buffer;
+  const ok = globalThis.__ws_binary__.patch(spec, buf, globalThis.__ws_selector__.compile(expr), () => value === undefined ? 42 : value);
+  out[name] = [ok, Array.from(new Uint8Array(buf))];
+}
+console.log(JSON.stringify(out));
+""" % json.dumps(frames)
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert out["msgpack"] == [True, list(MessagePackCodec().patch(PACKED, "payload.value", lambda: 42))]
+    assert out["msgpack_float"] == [False, list(PACKED)]   # no re-encoding in the page
+    assert out["struct"] == [True, list(single.encode({"id": 3, "value": 42.0}))]
+    assert out["struct_text"][0] is False
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_runtime_patches_arraybuffer_frames():
+    codec = StructCodec("<Hd", ["id", "value"])
+    script = """
+globalThis.window = globalThis;
+class FakeWS extends EventTarget { constructor(url) { super(); this.url = url; } }
+window.WebSocket = FakeWS;
+""" + render(mode="increasing", start=5, step=1, binary=codec) + """
+const got = [];
+const ws = new WebSocket('ws://h/ws');
+ws.onmessage = (ev) => got.push(Array.from(new Uint8Array(ev.data)));
+ws.dispatchEvent(new MessageEvent('message', { data: new Uint8Array(%s).buffer }));
+console.log(JSON.stringify(got));
+process.exit(0);
+""" % list(codec.encode({"id": 1, "value": 0.0}))
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert out == [list(codec.encode({"id": 1, "value": 5.0}))]
+    with pytest.raises(ValueError):
+        runtime_config(binary={"codec": "protobuf"})
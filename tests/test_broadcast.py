@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+
+from ws_intercept.broadcast import BroadcastHub, serve_broadcast
+
+
+def counter(n, produced):
+    """A producer of n frames, yielding between them like a paced feed."""
+    async def producer(publish):
+        for i in range(n):
+            frame = f"f{i}"
+            produced.append(frame)
+            await publish(frame)
+            await asyncio.sleep(0)
+    return producer
+
+
+def test_one_producer_per_key_shared_by_clients():
+    async def main():
+        hub = BroadcastHub()
+        produced, other = [], []
+        received = [[], [], []]
+        gate = asyncio.Event()
+
+        async def gated(publish):
+            await gate.wait()
+            await counter(3, produced)(publish)
+
+        def send_to(log):
+            async def send(frame):
+                log.append(frame)
+            return send
+
+        clients = [hub.serve("a", gated, send_to(log)) for log in received]
+        tasks = [asyncio.ensure_future(c) for c in clients]
+        b = asyncio.ensure_future(hub.serve("b", counter(2, other), send_to([])))
+        await asyncio.sleep(0)
+        gate.set()
+        return hub, await asyncio.gather(*tasks, b), produced, other, received
+
+    hub, results, produced, other, received = asyncio.run(main())
+    assert results == ["ended"] * 4
+    assert produced == ["f0", "f1", "f2"] and other == ["f0", "f1"]
+    # The same encoded str objects went to every client
+    assert all(log == produced and all(a is b for a, b in zip(log, produced)) for log in received)
+    assert (hub.stats.feeds, hub.stats.published, hub.stats.delivered) == (2, 5, 11)
+    assert hub.stats.peak_clients == 4 and hub.stats.clients == 0
+    assert hub.feeds == {}
+
+
+@pytest.mark.parametrize("overflow, expected, result", [
+    ("close", [], "lagged"),
+    ("drop_oldest", ["f8", "f9"], "ended"),
+    ("drop_newest", ["f1", "f2"], "ended"),
+])
+def test_slow_client_does_not_hold_up_the_feed(overflow, expected, result):
+    async def main():
+        hub = BroadcastHub(queue_size=2, overflow=overflow)
+        release = asyncio.Event()
+        fast, slow = [], []
+
+        async def slow_send(frame):
+            if frame == "f0" and not slow:
+                slow.append(None)      # stuck on its first frame until the feed is over
+                await release.wait()
+                return
+            slow.append(frame)
+
+        async def fast_send(frame):
+            fast.append(frame)
+
+        async def producer(publish):
+            for i in range(10):
+                await publish(f"f{i}")
+                await asyncio.sleep(0)
+            release.set()
+
+        fast_task = asyncio.ensure_future(hub.serve("k", producer, fast_send))
+        slow_task = asyncio.ensure_future(hub.serve("k", producer, slow_send))
+        return hub, await fast_task, await slow_task, fast, slow[1:]
+
+    hub, fast_result, slow_result, fast, slow = asyncio.run(main())
+    assert fast_result == "ended" and fast == [f"f{i}" for i in range(10)]
+    assert slow_result == result and slow == expected
+    assert hub.stats.lagged == (overflow == "close")
+    assert hub.stats.dropped == {"close": 3, "drop_oldest": 7, "drop_newest": 7}[overflow]
+
+
+def test_last_client_leaving_stops_the_producer():
+    async def main():
+        hub = BroadcastHub()
+        cancelled = asyncio.Event()
+
+        async def forever(publish):
+            try:
+                while True:
+                    await publish("tick")
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def gone(frame):
+            raise ConnectionError("client went away")
+
+        with pytest.raises(ConnectionError):
+            await hub.serve("k", forever, gone)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return hub
+
+    hub = asyncio.run(main())
+    assert hub.feeds == {} and hub.stats.clients == 0
+
+
+def test_thousands_of_clients():
+    async def main():
+        hub = BroadcastHub()
+        start = asyncio.Event()
+        counts = [0] * 5000
+
+        async def producer(publish):
+            await start.wait()
+            for i in range(20):
+                await publish(f'{{"seq":{i}}}')
+                await asyncio.sleep(0)
+
+        def sender(i):
+            async def send(frame):
+                counts[i] += 1
+            return send
+
+        tasks = [asyncio.ensure_future(hub.serve("k", producer, sender(i))) for i in range(len(counts))]
+        await asyncio.sleep(0)
+        start.set()
+        await asyncio.gather(*tasks)
+        return hub, counts
+
+    hub, counts = asyncio.run(main())
+    assert set(counts) == {20}
+    assert (hub.stats.feeds, hub.stats.published, hub.stats.delivered) == (1, 20, 100_000)
+    assert hub.stats.peak_clients == 5000
+
+
+def test_rejects_bad_configuration():
+    with pytest.raises(ValueError):
+        BroadcastHub(queue_size=0)
+    with pytest.raises(ValueError):
+        BroadcastHub(overflow="block")
+
+
+def test_clients_override_the_lag_policy():
+    async def main():
+        hub = BroadcastHub(queue_size=2, overflow="close")
+        release = asyncio.Event()
+        slow = []
+
+        async def slow_send(frame):
+            if not slow:
+                slow.append(None)
+                await release.wait()
+                return
+            slow.append(frame)
+
+        async def producer(publish):
+            for i in range(10):
+                await publish(f"f{i}")
+                await asyncio.sleep(0)
+            release.set()
+
+        task = asyncio.ensure_future(hub.serve("k", producer, slow_send, overflow="drop_oldest", queue_size=3))
+        with pytest.raises(ValueError):
+            await hub.serve("k", producer, slow_send, queue_size=0)
+        return await task, slow[1:]
+
+    result, frames = asyncio.run(main())
+    assert result == "ended" and frames == ["f7", "f8", "f9"]
+
+
+class FakeWebSocket:
+    def __init__(self, query):
+        self.query_params = query
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+@pytest.mark.parametrize("query", [{"queue_size": "0"}, {"queue_size": "many"}, {"overflow": "block"}])
+def test_serve_broadcast_rejects_bad_lag_parameters(query):
+    hub = BroadcastHub()
+    ws = FakeWebSocket(query)
+    asyncio.run(serve_broadcast(ws, None, False, hub))
+    assert ws.closed == 1008 and ws.sent == [] and hub.stats.clients == 0
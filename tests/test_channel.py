@@ -0,0 +1,108 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+from playwright.sync_api import Error, TimeoutError
+
+from ws_intercept.channel import ConfigChannel
+from ws_intercept.runtime import render
+
+
+class FakeScript:
+    def __init__(self):
+        self.disposed = False
+
+    def dispose(self):
+        self.disposed = True
+
+
+class FakePage:
+    def __init__(self, fail=None):
+        self.scripts = []
+        self.evaluated = []
+        self.fail = fail
+
+    def add_init_script(self, script):
+        self.scripts.append((script, FakeScript()))
+        return self.scripts[-1][1]
+
+    def evaluate(self, expression, arg):
+        if self.fail:
+            raise Error(self.fail)
+        self.evaluated.append(arg)
+        return 1
+
+
+def test_publish_versions_updates_and_keeps_one_init_script():
+    page = FakePage()
+    channel = ConfigChannel(page, timeout=250)
+    assert channel.set_mode("constant", const=1.5) == 1
+    assert channel.publish(mode="increasing", start=0, wait=False) == 2
+
+    # Pages get each update as is; new documents get everything published so far
+    assert page.evaluated == [
+        [{"version": 1, "config": {"mode": "constant", "constant": 1.5}}, 250],
+        [{"version": 2, "config": {"mode": "increasing", "start": 0}}, 0],
+    ]
+    (first, first_handle), (latest, latest_handle) = page.scripts
+    assert first_handle.disposed and not latest_handle.disposed
+    assert '{"version": 2, "config": {"mode": "increasing", "constant": 1.5, "start": 0}}' in latest
+    channel.close()
+    assert latest_handle.disposed
+
+    with pytest.raises(ValueError):
+        channel.publish(mode="sideways")
+    with pytest.raises(ValueError):
+        channel.publish(worker={"symbol": "US100Cash"})
+    assert channel.version == 2
+
+
+def test_publish_turns_worker_timeouts_into_playwright_timeouts():
+    channel = ConfigChannel(FakePage(fail="Error: __ws_timeout__ 1 worker(s) to apply config version 1 (250 ms)"))
+    with pytest.raises(TimeoutError, match="waiting for 1 worker"):
+        channel.publish(constant=2)
+    with pytest.raises(Error, match="boom"):
+        ConfigChannel(FakePage(fail="boom")).publish(constant=2)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_workers_apply_published_config_live():
+    script = """
+globalThis.window = globalThis;
+globalThis.location = { href: 'http://h/' };
+const created = [];
+window.SharedWorker = class { constructor(url) { created.push(url); } };
+""" + render(page=False, worker={"symbol": "US100Cash", "forcedBa": [950, 1050]}) + """
+const cfg = window.__ws_intercept__;
+const tick = () => ({ messages: [{ ts: { tk: { sl: 'US100Cash', ba: [1, 2] } } }] });
+const startWorker = async (url) => {
+  const code = await require('buffer').resolveObjectURL(url).text();
+  const posted = [];
+  class MessagePort { postMessage(data) { posted.push(data); } }
+  new Function('self', 'importScripts', code)({ MessagePort }, () => {});
+  return () => { new MessagePort().postMessage(tick()); return posted.pop().messages[0].ts.tk.ba; };
+};
+const settle = () => new Promise((r) => setTimeout(r, 50));
+const rule = (bid) => ({ symbols: { US100Cash: { mode: 'constant', ba: [bid, bid + 1], epoch: 0 } } });
+(async () => {
+  new SharedWorker('/worker.js');
+  const post = await startWorker(created[0]);
+  await settle();   // the worker's hello
+  const out = { before: post() };
+  out.acked = await cfg.publish({ version: 1, config: { worker: rule(10), mode: 'constant' } }, 1000);
+  out.after = post();
+  out.mode = cfg.mode;
+  cfg.applyConfig({ version: 1, config: { mode: 'untouched' } });   // not newer: ignored
+  out.stale = cfg.mode;
+  // A worker started from the version-0 blob catches up on its hello
+  const late = await startWorker(created[0]);
+  await settle();
+  out.late = late();
+  console.log(JSON.stringify(out));
+  process.exit(0);
+})();
+"""
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert out == {"before": [950, 1050], "acked": 1, "after": [10, 11], "mode": "constant",
+                   "stale": "constant", "late": [10, 11]}
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+from ws_intercept.conflation import Conflation, Conflator
+
+
+def tick(sl, bid):
+    return json.dumps({"messages": [{"ts": {"tk": {"sl": sl, "ba": [bid, bid + 1]}}}]})
+
+
+def test_latest_frame_per_key_is_flushed_on_a_timer():
+    async def main():
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        sent = []
+        conflator = Conflator(Conflation("messages[*].ts.tk.sl", interval_ms=50),
+                              lambda m, n: sent.append((round((loop.time() - t0) * 1000 / 50) * 50, n, m)))
+        for n, (sl, bid) in enumerate([("EURUSD", 1), ("GOLD", 2), ("EURUSD", 3), ("EURUSD", 4)]):
+            conflator.push(tick(sl, bid), n)
+        conflator.push('{"op": "heartbeat"}', 4)     # no key: straight through
+        conflator.push(b"\x00", 5)
+        await asyncio.sleep(0.08)
+        conflator.push(tick("GOLD", 5), 6)
+        await asyncio.sleep(0.08)
+        return sent, conflator.stats
+
+    sent, stats = asyncio.run(main())
+    assert sent == [
+        (0, 4, '{"op": "heartbeat"}'),
+        (0, 5, b"\x00"),
+        (50, 1, tick("GOLD", 2)),
+        (50, 3, tick("EURUSD", 4)),
+        (150, 6, tick("GOLD", 5)),
+    ]
+    assert (stats.received, stats.forwarded, stats.coalesced, stats.passed, stats.flushes) == (7, 5, 2, 2, 2)
+    assert stats.ratio == 7 / 5
+
+
+def test_switching_off_flushes_first_and_close_drops():
+    async def main():
+        sent = []
+        policy = Conflation("sl", interval_ms=20)
+        conflator = Conflator(lambda: policy, sent.append)
+        conflator.push('{"sl": "A", "v": 1}')
+        policy = None
+        conflator.push('{"sl": "A", "v": 2}')
+        policy = Conflation("sl", interval_ms=20)
+        conflator.push('{"sl": "B", "v": 3}')
+        conflator.close()
+        await asyncio.sleep(0.05)
+        return sent
+
+    assert asyncio.run(main()) == ['{"sl": "A", "v": 1}', '{"sl": "A", "v": 2}']
+    with pytest.raises(ValueError):
+        Conflation("sl", interval_ms=0)
+    with pytest.raises(ValueError):
+        Conflation("[")
@@ -0,0 +1,88 @@
+import json
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from ws_intercept.framelog import FrameBatch, PageFrameLog
+from ws_intercept.runtime import render, runtime_config
+
+
+class FakePage:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.drained = []
+        self.waited = []
+
+    def evaluate(self, expression, arg):
+        self.drained.append(arg)
+        return self.batches.pop(0) if self.batches else None
+
+    def wait_for_timeout(self, ms):
+        self.waited.append(ms)
+        time.sleep(ms / 1000)
+
+
+def frame(seq):
+    return {"seq": seq, "t": 1.5 * seq, "dir": "ws-recv", "url": "ws://h/ws", "data": f"r{seq}"}
+
+
+def counters(frames, pending=0):
+    return {"frames": frames, "pending": pending, "seen": 9, "recorded": 5, "dropped": 1}
+
+
+def test_drain_and_follow_batches():
+    page = FakePage([counters([frame(1)], pending=1), counters([frame(2)]), None])
+    log = PageFrameLog(page, batch=1)
+    batches = list(log.follow(100, interval_ms=60))
+    # Drains until the ring is empty after each wait, then stops at the deadline
+    assert [b.frames for b in batches] == [[frame(1)], [frame(2)], []]
+    assert page.drained == [1, 1, 1] and len(page.waited) == 2 and sum(page.waited) <= 100
+    assert batches[0].dropped == 1 and batches[-1] == FrameBatch()
+    assert batches[0].format().splitlines() == [
+        "[       1.5 ms #1 ws-recv] r1",
+        "-- 1 frame(s); seen 9, recorded 5, dropped 1, pending 1",
+    ]
+
+
+def test_sampling_options_are_validated():
+    assert runtime_config(sample=10, frame_buffer=100)["sample"] == 10
+    for bad in ({"sample": -1}, {"sample": 1.5}, {"frame_buffer": 0}, {"sample": True}):
+        with pytest.raises(ValueError):
+            runtime_config(**bad)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_ring_samples_and_counts_overflow():
+    script = """
+globalThis.window = globalThis;
+class FakeWS extends EventTarget { constructor(url) { super(); this.url = url; } send(d) {} }
+window.WebSocket = FakeWS;
+""" + render(sample=2, frame_buffer=3) + """
+const cfg = window.__ws_intercept__;
+const ws = new WebSocket('ws://h/ws');
+ws.onmessage = () => {};
+const recv = (i) => ws.dispatchEvent(new MessageEvent('message', { data: 'r' + i }));
+const out = {};
+for (let i = 1; i <= 10; i++) recv(i);    // every 2nd frame: r2 r4 r6 r8 r10 into 3 slots
+const first = cfg.drainFrames(2);
+out.first = [first.frames.map((f) => f.data), first.pending, first.seen, first.recorded, first.dropped];
+ws.send('s1');
+ws.send('s2');                             // seen 12: sampled
+const rest = cfg.drainFrames(0);
+out.rest = rest.frames.map((f) => [f.seq, f.dir, f.url, f.data]);
+cfg.sample = 0;
+recv(11);
+cfg.sample = 1;
+cfg.frame_buffer = 1;                      // ring is empty: takes effect now
+recv(12); recv(13);
+const last = cfg.drainFrames();
+out.last = [last.frames.map((f) => f.data), last.seen, last.dropped];
+console.log(JSON.stringify(out));
+process.exit(0);
+"""
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert out["first"] == [["r6", "r8"], 1, 10, 5, 2]
+    assert out["rest"] == [[10, "ws-recv", "ws://h/ws", "r10"], [12, "ws-send", "ws://h/ws", "s2"]]
+    assert out["last"] == [["r13"], 15, 3]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from ws_intercept.hub import FanoutHub
+
+
+class FakeRoute:
+    def __init__(self, url, log):
+        self.url, self.log = url, log
+
+    def send(self, msg):
+        self.log.append((self, msg))
+
+    def close(self, code=None, reason=None):
+        self.log.append((self, "closed", code))
+
+
+def test_one_upstream_per_url_fanned_out():
+    async def main():
+        hub = FanoutHub(queue_size=4)
+        log, connects, sent = [], [], []
+
+        def connect(upstream):
+            connects.append(upstream.url)
+            upstream.attach(sent.append, lambda code=None, reason=None: sent.append(("close", code)))
+
+        a, b, c = (FakeRoute("ws://h/ws", log) for _ in range(3))
+        other = FakeRoute("ws://h/ws?rate=10", log)
+        up = hub.subscribe(a, connect)
+        assert hub.subscribe(b, connect) is up and hub.subscribe(c, connect) is up
+        hub.subscribe(other, connect)
+        for i in range(3):
+            up.publish(f"f{i}")
+        up.publish(None)                 # filtered out upstream: nobody gets it
+        up.send("from b")
+        await asyncio.sleep(0)
+        up.leave(a)                      # the owner leaving keeps the upstream open
+        up.publish("f3")
+        await asyncio.sleep(0)
+        up.leave(b)
+        up.leave(c)
+        return hub, log, connects, sent, (a, b, c)
+
+    hub, log, connects, sent, (a, b, c) = asyncio.run(main())
+    assert connects == ["ws://h/ws", "ws://h/ws?rate=10"]
+    assert [m for r, m in log if r is a] == ["f0", "f1", "f2"]
+    assert [m for r, m in log if r is c] == ["f0", "f1", "f2", "f3"]
+    assert sent == ["from b", ("close", 1000)]
+    assert list(hub.upstreams) == ["ws://h/ws?rate=10"]
+    s = hub.stats
+    assert (s.upstreams, s.subscribers, s.published, s.peak_subscribers, s.queues.sent) == (2, 4, 4, 4, 11)
+
+
+def test_full_queues_close_only_their_subscriber():
+    async def main():
+        hub = FanoutHub(queue_size=3, overflow="close")
+        log = []
+        a, b, late = (FakeRoute("ws://h/ws", log) for _ in range(3))
+        ignore = lambda *a, **k: None   # noqa: E731
+        up = hub.subscribe(a, lambda u: u.attach(ignore, ignore))
+        hub.subscribe(b, ignore)
+        for i in range(3):
+            up.publish(str(i))           # a and b now hold 3 frames each
+        hub.subscribe(late, ignore)
+        up.publish("3")                  # a and b overflow, late does not
+        await asyncio.sleep(0)
+        up.server_closed(1011, "gone")
+        return hub, log, (a, b, late), up
+
+    hub, log, (a, b, late), up = asyncio.run(main())
+    assert [m for r, *m in log if r is a] == [["closed", 1013]]
+    assert [m for r, *m in log if r is late] == [["3"], ["closed", 1011]]
+    assert hub.stats.queues.dropped == 8 and up.closed and not hub.upstreams
+    with pytest.raises(ValueError):
+        FanoutHub(overflow="block")
@@ -0,0 +1,26 @@
+import pytest
+
+from ws_intercept import jsoncodec
+from ws_intercept.jsoncodec import DecodeError, JSONCodec, available_codecs, get_codec
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_roundtrip_and_counters(name):
+    codec = get_codec(name)
+    assert codec.name == name
+    text = codec.encode({"ts": 1, "value": [0.5, "x"]})
+    assert text == '{"ts":1,"value":[0.5,"x"]}'   # compact, like JSON.stringify
+    assert codec.decode(text) == {"ts": 1, "value": [0.5, "x"]}
+    with pytest.raises(DecodeError):
+        codec.decode("{not json")
+    assert (codec.stats.decoded, codec.stats.decode_errors, codec.stats.encoded) == (1, 1, 1)
+
+
+def test_missing_backend_falls_back_to_stdlib(monkeypatch):
+    monkeypatch.setattr(jsoncodec, "orjson", None)
+    monkeypatch.setattr(jsoncodec, "msgspec", None)
+    assert type(get_codec("auto")) is JSONCodec
+    with pytest.warns(UserWarning, match="orjson"):
+        assert type(get_codec("orjson")) is JSONCodec
+    with pytest.raises(ValueError):
+        get_codec("yaml")
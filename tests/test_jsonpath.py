@@ -0,0 +1,55 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ws_intercept.jsonpath import SELECTOR_JS, compile_selector, parse_selector
+
+TICKS = {
+    "messages": [
+        {"ts": {"tk": {"sl": "GOLDm#", "ba": [3382.16, 3382.39]}, "sid": 50}},
+        {"ts": {"tk": {"sl": "US100Cash", "ba": [23569.42, 23571.62]}, "sid": 50}},
+    ],
+}
+
+
+def test_parse():
+    assert parse_selector("messages[*].ts.tk.ba[0]") == [[
+        ("key", "messages"), ("each", None), ("key", "ts"), ("key", "tk"), ("key", "ba"), ("index", 0),
+    ]]
+    for bad in ("", "a..b", "a[x]", "a[1"):
+        with pytest.raises(ValueError):
+            parse_selector(bad)
+
+
+def test_apply_rewrites_every_match():
+    obj = json.loads(json.dumps(TICKS))
+    assert compile_selector("messages[*].ts.tk.ba[0]").apply(obj, lambda v: v + 1) == 2
+    assert [m["ts"]["tk"]["ba"] for m in obj["messages"]] == [[3383.16, 3382.39], [23570.42, 23571.62]]
+    assert compile_selector("messages[*].ts.tk.*").values(obj)[0] == "GOLDm#"
+
+
+def test_alternatives_and_spliceable_keys():
+    sel = compile_selector("value|payload.value")
+    obj = {"payload": {"value": 1}}
+    assert sel.apply(obj, lambda _: 5) == 1 and obj == {"payload": {"value": 5}}
+    assert not sel.may_match('{"ts": 1}')
+    assert sel.top_level_key is None
+    assert compile_selector("value").top_level_key == "value"
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_js_compiler_matches_python():
+    exprs = ["messages[*].ts.tk.ba[0]", "value|payload.value", "*.x[*][2]"]
+    script = SELECTOR_JS + f"""
+const S = globalThis.__ws_selector__;
+const obj = {json.dumps(TICKS)};
+const n = S.compile('messages[*].ts.tk.ba[1]').apply(obj, (v) => v * 2);
+console.log(JSON.stringify({{steps: {json.dumps(exprs)}.map(S.parse), n, obj}}));
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    assert out["steps"] == json.loads(json.dumps([parse_selector(e) for e in exprs]))
+    obj = json.loads(json.dumps(TICKS))
+    assert out["n"] == compile_selector("messages[*].ts.tk.ba[1]").apply(obj, lambda v: v * 2)
+    assert out["obj"] == obj
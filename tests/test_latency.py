@@ -0,0 +1,92 @@
+import json
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from ws_intercept.latency import LATENCY_JS, LatencyHistogram, LatencyProbe, LatencyStats, parse_stamp
+from ws_intercept.waiters import WAITERS_JS
+
+
+def test_histogram_percentiles_within_precision():
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(7, 1.5)) for _ in range(20_000)]
+    h = LatencyHistogram()
+    for v in values:
+        h.record(v)
+    values.sort()
+    for p in (50, 90, 99, 99.9):
+        exact = values[round(p / 100 * len(values)) - 1]
+        assert h.percentile(p) == pytest.approx(exact, rel=0.01, abs=1)
+    assert (h.min, h.max, h.count) == (values[0], values[-1], len(values))
+
+
+def test_histogram_merge_and_small_values_are_exact():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for v in range(100):
+        (a if v % 2 else b).record(v)
+    a.merge(b)
+    assert a.count == 100 and a.percentile(50) == 49 and a.max == 99
+    a.record(-5)  # clock skew clamps to zero
+    assert a.min == 0
+    with pytest.raises(ValueError):
+        a.merge(LatencyHistogram(bits=4))
+
+
+def test_parse_stamp():
+    assert parse_stamp('{"seq":12,"sent":1756320764.123456,"value":1}') == (12, 1756320764.123456)
+    assert parse_stamp('{"seq": 3, "sent": 1.5}') == (3, 1.5)
+    assert parse_stamp('{"value":1}') is None
+    assert parse_stamp(b'{"seq":1,"sent":2}') is None
+
+
+def test_probe_joins_proxy_and_page_stamps():
+    probe = LatencyProbe()
+    frame = '{"seq":0,"sent":1000.000000,"value":1}'
+    probe.on_forward(frame, conn=1, mode="constant", t_recv_ns=1000_000_500_000, t_fwd_ns=1000_000_600_000)
+    probe.record_delivery([[0, "1000.000000", 1000_001.0, "constant"], [5, "1000.5", 1000_501.0, "untouched"]])
+    stats = probe.stats
+    assert stats.by("server_to_proxy")["constant"].max == 500
+    assert stats.by("proxy")["constant"].max == 100
+    assert stats.by("proxy_to_page")["constant"].max == 400
+    assert stats.by("end_to_end", "conn")[1].max == 1000
+    assert stats.by("end_to_end")["untouched"].count == 1   # not proxied
+    assert probe.unmatched_page == 1
+
+    session = LatencyStats()
+    session.merge(stats)
+    session.merge(stats)
+    assert session.report()["end_to_end"]["mode"]["constant"]["count"] == 2
+    assert session.format()[1].startswith("server_to_proxy")
+
+
+def test_probe_gives_up_on_frames_the_page_never_reports():
+    probe = LatencyProbe(max_pending=3)
+    for seq in range(5):
+        probe.on_forward('{"seq":%d,"sent":1000.0,"value":1}' % seq, conn=1, mode="constant",
+                         t_recv_ns=1000_000_500_000, t_fwd_ns=1000_000_600_000)
+    assert len(probe._pending) == 3 and probe.stats.evicted == 2
+    probe.record_delivery([[0, "1000.0", 1000_001.0, "constant"], [4, "1000.0", 1000_001.0, "constant"]])
+    assert probe.unmatched_page == 1 and probe.stats.by("proxy_to_page")["constant"].count == 1
+
+    session = LatencyStats()
+    session.merge(probe.stats)
+    assert session.evicted == 2 and session.format()[-1].startswith("2 proxied frames")
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_page_collector_stamps_delivered_frames():
+    script = "globalThis.window = globalThis;" + WAITERS_JS + LATENCY_JS + """
+const c = window.__ws_intercept__;
+c.mode = 'constant';
+c.notifyDelivered('{"seq":7,"sent":1756320764.250000,"value":1}');
+c.notifyDelivered({ type: 'data', payload: { seq: 8, sent: 1756320764.5, value: 2 } });
+c.notifyDelivered('{"value":3}');
+console.log(JSON.stringify({ drained: c.latency.drain(), delivered: c.delivered }));
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    stamps = out["drained"]["stamps"]
+    assert [s[:2] for s in stamps] == [[7, "1756320764.250000"], [8, "1756320764.5"]]
+    assert all(s[3] == "constant" and s[2] > 1e12 for s in stamps)
+    assert out["delivered"] == 3
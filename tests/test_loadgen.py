@@ -0,0 +1,63 @@
+import asyncio
+import json
+import math
+
+import pytest
+
+from ws_intercept.loadgen import LoadProfile, encode_frames, stream
+
+
+def test_from_query():
+    assert LoadProfile.from_query({"foo": "1"}) is None
+    p = LoadProfile.from_query({"rate": "max", "burst": "50", "shape": "ticks", "batch": "4"})
+    assert p == LoadProfile(rate=math.inf, burst=50, shape="ticks", batch=4)
+    with pytest.raises(ValueError, match="bad value for burst"):
+        LoadProfile.from_query({"burst": "many"})
+    with pytest.raises(ValueError, match="shape"):
+        LoadProfile.from_query({"shape": "xml"})
+    with pytest.raises(ValueError, match="rate"):
+        LoadProfile(rate=0)
+
+
+def test_value_frames_match_the_demo_shape():
+    frames = encode_frames(LoadProfile(frames=8))
+    assert len(set(frames)) == 8
+    assert set(json.loads(frames[0])) == {"ts", "value"}
+
+
+def test_tick_envelopes_rotate_symbols_and_pad():
+    frames = encode_frames(LoadProfile(shape="ticks", symbols=3, batch=2, frames=6, size=1024))
+    assert all(len(f) == 1024 for f in frames)
+    msgs = [json.loads(f) for f in frames]
+    ticks = [m["ts"]["tk"] for msg in msgs for m in msg["messages"]]
+    assert [t["sl"] for t in ticks[:4]] == ["US100Cash", "GOLDm#", "AUDNZD#", "US100Cash"]
+    assert all(len(t["ba"]) == 2 and t["ba"][0] < t["ba"][1] for t in ticks)
+    assert json.loads(encode_frames(LoadProfile(symbols=12, frames=12))[11])["sl"] == "SYM11"
+
+
+def test_stream_is_paced_and_cycles_the_ring():
+    sent: list[str] = []
+
+    async def send(text: str) -> None:
+        sent.append(text)
+
+    n = asyncio.run(stream(send, LoadProfile(rate=2000, burst=10, frames=16, duration=0.1)))
+    assert n == len(sent)
+    assert 150 <= n <= 260
+    assert sent[16] == sent[0]
+
+    sent.clear()
+    assert asyncio.run(stream(send, LoadProfile(rate=math.inf, burst=100, duration=0.05))) > 1000
+
+
+def test_stamped_frames_carry_seq_and_send_time():
+    sent: list[str] = []
+
+    async def send(text: str) -> None:
+        sent.append(text)
+
+    profile = LoadProfile.from_query({"rate": "1000", "duration": "0.02", "stamp": "1", "shape": "ticks"})
+    asyncio.run(stream(send, profile))
+    msgs = [json.loads(m) for m in sent]
+    assert [m["seq"] for m in msgs] == list(range(len(msgs)))
+    assert all(m["sent"] > 1e9 and "messages" in m for m in msgs)
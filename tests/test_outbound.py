@@ -0,0 +1,162 @@
+import asyncio
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ws_intercept.jsonpath import SELECTOR_JS
+from ws_intercept.outbound import OUTBOUND_JS, OutboundEngine, make_outbound_rule
+
+RULES = [
+    make_outbound_rule("rewrite", match={"op": "auth"}, set={"token": "x"}),
+    make_outbound_rule("drop", match={"op": "ping"}),
+    make_outbound_rule("coalesce", pattern='"(un)?subscribe"', key=["symbol"], window_ms=50),
+    make_outbound_rule("dedupe", match={"op": "hello"}),
+    make_outbound_rule("delay", match={"op": "slow"}, delay_ms=150),
+    make_outbound_rule("repeat", match={"op": "spam"}, times=3, interval_ms=100),
+]
+
+FRAMES = [
+    {"op": "subscribe", "symbol": "EURUSD"},
+    {"op": "unsubscribe", "symbol": "EURUSD"},
+    {"op": "subscribe", "symbol": "EURUSD"},
+    {"op": "subscribe", "symbol": "GBPUSD"},
+    {"op": "ping"},
+    {"op": "auth", "token": "secret"},
+    {"op": "hello"},
+    {"op": "hello"},
+    {"op": "slow"},
+    {"op": "spam"},
+    {"op": "other"},
+]
+
+# Sent frames with their time slot (ms, to the nearest 50)
+EXPECTED = [
+    (0, {"op": "auth", "token": "x"}),
+    (0, {"op": "hello"}),
+    (0, {"op": "spam"}),
+    (0, {"op": "other"}),
+    (50, {"op": "subscribe", "symbol": "EURUSD"}),
+    (50, {"op": "subscribe", "symbol": "GBPUSD"}),
+    (100, {"op": "spam"}),
+    (150, {"op": "slow"}),
+    (200, {"op": "spam"}),
+]
+
+
+def test_engine_applies_rules_in_order():
+    async def main():
+        loop = asyncio.get_running_loop()
+        sent = []
+        t0 = loop.time()
+        engine = OutboundEngine(lambda: RULES, lambda m: sent.append(((loop.time() - t0) * 1000, json.loads(m))))
+        for frame in FRAMES:
+            engine.push(json.dumps(frame))
+        await asyncio.sleep(0.3)
+        return engine, sent
+
+    engine, sent = asyncio.run(main())
+    assert [(round(t / 50) * 50, m) for t, m in sent] == EXPECTED
+    s = engine.stats
+    assert (s.received, s.sent, s.dropped, s.rewritten, s.delayed, s.deduped, s.coalesced) == (11, 9, 1, 1, 1, 1, 2)
+
+
+# A rewrite that changes nothing leaves the frame as the page sent it
+REWRITES = [
+    ('{"op":"auth","token":"x","ids":[1, 2]}', '{"op":"auth","token":"x","ids":[1, 2]}'),
+    ('{"op":"auth","token":"secret","ids":[1, 2]}', '{"op":"auth","token":"x","ids":[1,2]}'),
+    ('{"op": "other"}', '{"op": "other"}'),
+]
+
+
+def test_rewrite_only_reencodes_changed_frames():
+    async def main():
+        sent = []
+        engine = OutboundEngine(lambda: RULES[:1], sent.append)
+        for frame, _ in REWRITES:
+            engine.push(frame)
+        return engine.stats, sent
+
+    stats, sent = asyncio.run(main())
+    assert sent == [want for _, want in REWRITES] and stats.rewritten == 1
+
+
+def test_rule_changes_and_close():
+    async def main():
+        sent = []
+        rules = [make_outbound_rule("coalesce", window_ms=20)]
+        engine = OutboundEngine(lambda: rules, sent.append)
+        engine.push("a")
+        engine.push("b")
+        rules = []                   # a new list: the held-back "b" still goes out
+        engine.push("c")
+        await asyncio.sleep(0.05)
+        rules = [make_outbound_rule("delay", delay_ms=20)]
+        engine.push("d")
+        engine.close()               # gone before the delay ran out
+        await asyncio.sleep(0.05)
+        return sent
+
+    assert asyncio.run(main()) == ["c", "b"]
+    with pytest.raises(ValueError):
+        make_outbound_rule("coalesce", key=["symbol"])
+    with pytest.raises(ValueError):
+        make_outbound_rule("rewrite")
+    with pytest.raises(ValueError):
+        make_outbound_rule("throttle")
+    with pytest.raises(ValueError):
+        make_outbound_rule("delay", delay_ms=-1)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_page_engine_matches_python():
+    script = SELECTOR_JS + OUTBOUND_JS + """
+const rules = %s;
+const sent = [];
+const t0 = performance.now();
+const send = globalThis.__ws_outbound__.attach((m) => sent.push([performance.now() - t0, JSON.parse(m)]), () => rules);
+for (const frame of %s) send(JSON.stringify(frame));
+setTimeout(() => {
+  console.log(JSON.stringify({ sent, stats: globalThis.__ws_outbound__.stats }));
+}, 300);
+""" % (json.dumps(RULES), json.dumps(FRAMES))
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert [(round(t / 50) * 50, m) for t, m in out["sent"]] == EXPECTED
+    assert out["stats"] == {"received": 11, "sent": 9, "dropped": 1, "rewritten": 1, "delayed": 1, "deduped": 1,
+                            "coalesced": 2}
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_page_engine_rewrites_like_python():
+    script = SELECTOR_JS + OUTBOUND_JS + """
+const sent = [];
+const send = globalThis.__ws_outbound__.attach((m) => sent.push(m), () => %s);
+for (const frame of %s) send(frame);
+console.log(JSON.stringify({ sent, rewritten: globalThis.__ws_outbound__.stats.rewritten }));
+""" % (json.dumps(RULES[:1]), json.dumps([frame for frame, _ in REWRITES]))
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    assert out == {"sent": [want for _, want in REWRITES], "rewritten": 1}
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_page_engine_keeps_its_state_across_unrelated_config_pushes():
+    # Pushes arrive as fresh objects, like window.__ws_intercept__.configure(rule)
+    script = SELECTOR_JS + OUTBOUND_JS + """
+const dedupe = %s;
+const rule = { mode: 'untouched', outbound: JSON.parse(dedupe) };
+const sent = [];
+const send = globalThis.__ws_outbound__.attach((m) => sent.push(m), () => rule.outbound);
+const push = (changes) => Object.assign(rule, JSON.parse(JSON.stringify(changes)));
+send('{"op":"hello"}');
+push({ mode: 'constant', outbound: JSON.parse(dedupe) });
+send('{"op":"hello"}');
+push({ outbound: [] });
+send('{"op":"hello"}');
+push({ outbound: JSON.parse(dedupe) });
+send('{"op":"hello"}');
+console.log(JSON.stringify({ sent: sent.length, deduped: globalThis.__ws_outbound__.stats.deduped }));
+""" % json.dumps(json.dumps([make_outbound_rule("dedupe", match={"op": "hello"})]))
+    out = json.loads(subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True).stdout)
+    # The mode change kept the window; clearing the rules and adding them back started a new one
+    assert out == {"sent": 3, "deduped": 1}
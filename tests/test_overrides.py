@@ -0,0 +1,68 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ws_intercept.overrides import SymbolOverrides, make_rule, normalize_worker
+from ws_intercept.runtime import TICK_MATCHER_JS
+
+
+def test_rules_are_validated_and_published():
+    seen = []
+    o = SymbolOverrides()
+    o._listeners.append(seen.append)
+    o.set_mode(["EURUSD#", "GBPUSD#"], "increasing", start=1.1, step=0.001)
+    o.set_mode("EURUSD#", "increasing", start=1.2)
+    assert len(seen) == 2
+    assert seen[-1]["symbols"]["EURUSD#"] == {
+        "mode": "increasing", "epoch": 1, "start": 1.2, "step": 1.0, "spread": None
+    }
+    assert seen[-1]["symbols"]["GBPUSD#"]["epoch"] == 0
+    o.clear("GBPUSD#")
+    assert list(o.config()["symbols"]) == ["EURUSD#"]
+
+    with pytest.raises(ValueError):
+        make_rule("constant")
+    with pytest.raises(ValueError):
+        make_rule("spread", mid=1.0)
+    with pytest.raises(ValueError):
+        make_rule("increasing", start=float("nan"))
+    with pytest.raises(ValueError):
+        make_rule("sideways")
+
+
+def test_single_symbol_form_is_normalized():
+    assert normalize_worker({"symbol": "US100Cash", "forcedBa": [950, 1050]}) == {
+        "symbols": {"US100Cash": {"mode": "constant", "epoch": 0, "ba": [950, 1050]}}
+    }
+    with pytest.raises(ValueError):
+        normalize_worker({"symbols": {"X": {"mode": "constant"}}})
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_worker_table_applies_each_symbols_rule():
+    o = SymbolOverrides()
+    o.set_mode("A", "constant", ba=[1, 2])
+    o.set_mode("B", "increasing", start=10, step=1, spread=2)
+    o.set_mode("C", "decreasing", start=10, step=2)
+    o.set_mode("D", "spread", spread=4)
+    o.set_mode("E", "untouched")
+    script = f"const CFG = {json.dumps(o.config())};" + TICK_MATCHER_JS + """
+const tick = (sl, ba) => ({ ts: { tk: { sl, ba } } });
+const batch = () => ({ messages: ['A', 'B', 'C', 'D', 'E', 'F'].map((s) => tick(s, [100, 101])) });
+const first = batch(), second = batch();
+mutateTicks(first);
+mutateTicks(second);
+// Re-setting a rule re-seeds its generator; an unchanged one keeps going
+const next = JSON.parse(JSON.stringify(CFG.symbols));
+next.C = Object.assign({}, next.C, { start: 50, epoch: next.C.epoch + 1 });
+loadTable(next);
+const third = batch();
+mutateTicks(third);
+console.log(JSON.stringify([first, second, third].map((b) => b.messages.map((m) => m.ts.tk.ba))));
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    assert out[0] == [[1, 2], [9, 11], [9.5, 10.5], [98.5, 102.5], [100, 101], [100, 101]]
+    assert out[1][1:3] == [[10, 12], [7.5, 8.5]]
+    assert out[2][1:3] == [[11, 13], [49.5, 50.5]]
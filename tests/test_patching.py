@@ -0,0 +1,47 @@
+import json
+
+from ws_intercept.patching import find_number, patch_number, splice_number
+
+
+def test_frame_without_key_is_forwarded_as_is():
+    text = '{"ts": 1, "other": 2}'
+    assert patch_number(text, "value", lambda: 1.0) is text
+
+
+def test_number_is_spliced_in_place():
+    assert patch_number('{"ts":1,"value":0.5 }', "value", lambda: 7.5) == '{"ts":1,"value":7.5 }'
+
+
+def test_only_top_level_keys_are_patched():
+    text = '{"payload":{"value":1},"note":"a \\"value\\": 3","value":-2e3}'
+    assert json.loads(splice_number(text, "value", 9)) == {
+        "payload": {"value": 1},
+        "note": 'a "value": 3',
+        "value": 9,
+    }
+    assert find_number('{"a":[{"value":1}]}', "value") is None
+    assert find_number('{"a":"value"}', "value") is None
+
+
+def test_non_number_value_falls_back_to_strict_json():
+    assert json.loads(patch_number('{"value":null,"x":1}', "value", lambda: 2)) == {"value": 2, "x": 1}
+
+
+def test_value_is_only_computed_for_patched_frames():
+    calls = []
+
+    def value():
+        calls.append(1)
+        return 1
+
+    patch_number('{"x":1}', "value", value)
+    patch_number('not json "value"', "value", value)
+    assert calls == []
+
+
+def test_key_repeated_at_depth_before_the_top_level_one():
+    text = json.dumps({"items": [{"value": i, "note": "a \"value\": 1"} for i in range(2000)], "value": 3})
+    assert json.loads(splice_number(text, "value", 9))["value"] == 9
+    assert json.loads(splice_number(text.replace('\\"', "'"), "value", 9))["value"] == 9   # no escapes
+    assert find_number('{"a":[{"value":1}],"b":"x\\"value\\"","c":{"value":2}}', "value") is None
+    assert find_number('{"a":"unterminated "value":1', "value") is None
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from ws_intercept.pool import ContextPool, PoolStats
+
+
+class FakeFrame:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.handlers = {}
+        self.evaluated = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def goto(self, url):
+        self.handlers["framenavigated"](FakeFrame(url))
+
+    def evaluate(self, expression):
+        self.evaluated.append(expression)
+
+    def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, fail_reset=False):
+        self.pages = []
+        self.handlers = {}
+        self.cleared = 0
+        self.closed = False
+        self.fail_reset = fail_reset
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        self.handlers["page"](page)
+        return page
+
+    def clear_cookies(self):
+        if self.fail_reset:
+            raise RuntimeError("context crashed")
+        self.cleared += 1
+
+    def clear_permissions(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowserType:
+    name = "firefox"
+
+
+class FakeBrowser:
+    browser_type = FakeBrowserType()
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.contexts = []
+
+    def new_context(self, **kwargs):
+        time.sleep(self.delay)  # what the pool saves
+        context = FakeContext(**kwargs)
+        self.contexts.append(context)
+        return context
+
+
+def test_contexts_are_set_up_once_and_reset_between_leases():
+    browser = FakeBrowser(delay=0.01)
+    setups, resets = [], []
+    pool = ContextPool(browser, 2, setup=lambda ctx: setups.append(ctx) or len(setups), reset=resets.append)
+    assert len(browser.contexts) == 2 and len(setups) == 2
+
+    lease = pool.acquire()
+    first_page = lease.page
+    first_page.goto("http://127.0.0.1:8000/?rate=10")
+    assert lease.origins == {"http://127.0.0.1:8000"}
+    pool.release(lease)
+
+    assert resets == [lease] and lease.context.cleared == 1
+    assert any("localStorage.clear()" in e for e in first_page.evaluated)
+    assert lease.context.pages == [lease.page] and lease.page is not first_page
+    assert not lease.origins
+
+    again = pool.acquire()
+    assert again is lease and again.uses == 2 and again.state in (1, 2)
+    pool.release(again)
+    assert len(browser.contexts) == 2 and len(setups) == 2
+
+    s = pool.stats.summary()
+    assert s["tests"] == 2 and s["contexts"] == 2
+    assert s["cold_ms"] >= 10 and s["saved_per_test_ms"] > 5
+
+    pool.close()
+    assert all(c.closed for c in browser.contexts)
+
+
+def test_failed_or_worn_out_contexts_are_replaced():
+    browser = FakeBrowser()
+    pool = ContextPool(browser, 1, context_args={"fail_reset": True})
+    lease = pool.acquire()
+    pool.release(lease)
+    assert lease.context.closed and pool.stats.recycled == 1
+    assert len(browser.contexts) == 2
+
+    pool = ContextPool(FakeBrowser(), 1, max_uses=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    assert first.context.closed and pool.acquire() is not first
+
+
+def test_acquire_grows_when_all_contexts_are_leased():
+    browser = FakeBrowser()
+    pool = ContextPool(browser, 1)
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not b and len(browser.contexts) == 2
+    pool.release(a)
+    pool.release(b)
+    with pytest.raises(ValueError):
+        ContextPool(browser, 0)
+
+
+def test_stats_merge_and_format():
+    stats = PoolStats()
+    assert not stats
+    other = PoolStats()
+    other.cold, other.acquire, other.reset = [0.4, 0.4], [0.0] * 10, [0.02] * 10
+    stats.merge(other)
+    s = stats.summary()
+    assert s["saved_per_test_ms"] == pytest.approx(380, abs=0.1)
+    assert s["saved_total_s"] == pytest.approx(4.0 - 0.8 - 0.2)
+    assert "saved 380.0 ms per test" in stats.format()[1]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from ws_intercept.pump import FramePump, PumpStats
+
+
+def test_slow_transform_only_holds_up_its_own_pump():
+    async def main():
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        sent = {"slow": [], "fast": []}
+
+        async def slow(m):
+            await asyncio.sleep(0.05)
+            return m.upper()
+
+        stats = PumpStats()
+        pumps = {
+            "slow": FramePump(slow, lambda m: sent["slow"].append((loop.time() - t0, m)), stats=stats).start(),
+            "fast": FramePump(lambda m: m, lambda m: sent["fast"].append((loop.time() - t0, m)), stats=stats).start(),
+        }
+        for i in range(3):
+            for p in pumps.values():
+                p.put(f"m{i}")
+        await pumps["fast"].drain()
+        fast_done = loop.time() - t0
+        await pumps["slow"].drain()
+        return fast_done, sent, stats
+
+    fast_done, sent, stats = asyncio.run(main())
+    assert [m for _, m in sent["fast"]] == ["m0", "m1", "m2"] and fast_done < 0.04
+    assert [m for _, m in sent["slow"]] == ["M0", "M1", "M2"] and sent["slow"][-1][0] >= 0.14
+    assert (stats.received, stats.sent, stats.dropped) == (6, 6, 0) and stats.peak_queued == 3
+
+
+@pytest.mark.parametrize("overflow, expected, dropped", [
+    ("drop_newest", ["0", "1"], 3),
+    ("drop_oldest", ["3", "4"], 3),
+    ("close", [], 3),          # "2" and the two queued ones; later frames are refused
+])
+def test_overflow_policies(overflow, expected, dropped):
+    async def main():
+        sent, tripped = [], []
+        pump = FramePump(lambda m: m, sent.append, maxsize=2, overflow=overflow,
+                         on_overflow=lambda: tripped.append(True)).start()
+        for i in range(5):
+            pump.put(str(i))     # the task has not run yet: the queue fills up
+        await pump.drain()
+        return sent, tripped, pump
+
+    sent, tripped, pump = asyncio.run(main())
+    assert sent == expected and pump.stats.dropped == dropped
+    assert pump.closed == (overflow == "close") and tripped == ([True] if overflow == "close" else [])
+
+
+def test_errors_lose_the_frame_not_the_pump():
+    async def main():
+        sent = []
+        pump = FramePump(lambda m: 1 / int(m), sent.append).start()
+        for m in "202":
+            pump.put(m)
+        await pump.drain()
+        return sent, pump
+
+    sent, pump = asyncio.run(main())
+    assert sent == [0.5, 0.5] and pump.stats.errors == 1 and isinstance(pump.error, ZeroDivisionError)
+
+    async def failing_send():
+        sent = []
+
+        def send(m):
+            if m == "gone":
+                raise RuntimeError("socket closed")
+            sent.append(m)
+
+        pump = FramePump(lambda m: m, send).start()
+        for m in ("a", "gone", "b"):
+            pump.put(m)
+        await asyncio.wait_for(pump.drain(), 1)   # used to hang once a send raised
+        return sent, pump
+
+    sent, pump = asyncio.run(failing_send())
+    assert sent == ["a", "b"] and pump.stats.errors == 1 and isinstance(pump.error, RuntimeError)
+    with pytest.raises(ValueError):
+        FramePump(str, print, overflow="block")
+    with pytest.raises(ValueError):
+        FramePump(str, print, maxsize=0)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from ws_intercept import recorder
+from ws_intercept.recorder import CLOSE, INBOUND, OPEN, OUTBOUND, FrameLog, FrameRecorder
+
+COMPRESSIONS = ["none", "zlib"] + (["zstd"] if recorder.zstandard is not None else [])
+
+
+def tick(i: int) -> str:
+    return json.dumps({"ts": 1756320764.152 + i, "value": i * 0.01, "sl": "US100Cash", "ba": [23569.42, 23571.62]})
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_roundtrip(tmp_path, compression):
+    path = tmp_path / "session.wsrec"
+    with FrameRecorder(path, compression=compression) as rec:
+        conn = rec.open_connection("ws://localhost:8000/ws")
+        rec.record(conn, "outbound", '{"op": "subscribe"}')
+        for i in range(50):
+            rec.record(conn, "inbound", tick(i))
+        rec.record(conn, "inbound", b"\x00\x01binary")
+        rec.close_connection(conn)
+
+    with FrameLog(path) as log:
+        frames = list(log)
+        assert log.urls == {1: "ws://localhost:8000/ws"}
+    assert [f.kind for f in frames] == [OPEN, OUTBOUND] + [INBOUND] * 51 + [CLOSE]
+    assert [f.payload for f in frames if f.kind == INBOUND] == [tick(i) for i in range(50)] + [b"\x00\x01binary"]
+    assert frames[1].direction == "outbound" and frames[1].url == "ws://localhost:8000/ws"
+    assert all(a.t_ns <= b.t_ns for a, b in zip(frames, frames[1:]))
+
+
+def test_delta_compression_shrinks_repeated_shapes(tmp_path):
+    sizes = {}
+    for compression in ("none", "zlib"):
+        with FrameRecorder(tmp_path / f"{compression}.wsrec", compression=compression) as rec:
+            conn = rec.open_connection("ws://x/ws")
+            for i in range(200):
+                rec.record(conn, "inbound", tick(i))
+            sizes[compression] = rec.bytes_out
+    assert sizes["zlib"] < sizes["none"] / 2
+
+
+def test_append_keeps_connection_ids_unique(tmp_path):
+    path = tmp_path / "session.wsrec"
+    for _ in range(2):
+        with FrameRecorder(path) as rec:
+            rec.record(rec.open_connection("ws://x/ws"), "inbound", tick(0))
+    with FrameLog(path) as log:
+        assert sorted(log.urls) == [1, 2]
+        assert [f.payload for f in log if f.kind == INBOUND] == [tick(0), tick(0)]
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a log at all")
+    with pytest.raises(ValueError):
+        FrameLog(path)
@@ -0,0 +1,77 @@
+import asyncio
+import math
+
+import pytest
+
+from ws_intercept.recorder import FrameRecorder
+from ws_intercept.replay import Replay
+
+MS = 1_000_000
+
+
+class FakeRoute:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self.on_message_handler = None
+
+    def send(self, message):
+        self.sent.append((asyncio.get_running_loop().time(), message))
+
+    def on_message(self, handler):
+        self.on_message_handler = handler
+
+    def on_close(self, handler):
+        pass
+
+    async def close(self, code=None, reason=None):
+        self.closed = True
+
+
+@pytest.fixture
+def session(tmp_path):
+    path = tmp_path / "session.wsrec"
+    with FrameRecorder(path) as rec:
+        conn = rec.open_connection("ws://localhost:8000/ws", t_ns=0)
+        rec.record(conn, "inbound", '{"value": 0}', t_ns=0)
+        rec.record(conn, "inbound", '{"value": 1}', t_ns=200 * MS)
+        rec.record(conn, "outbound", '{"op": "more"}', t_ns=300 * MS)
+        rec.record(conn, "inbound", '{"value": 2}', t_ns=400 * MS)
+        rec.close_connection(conn, t_ns=500 * MS)
+    return path
+
+
+def play(replay, until, on_start=None):
+    async def main():
+        route = FakeRoute()
+        t0 = asyncio.get_running_loop().time()
+        replay.play(route, transform=str.upper)
+        if on_start:
+            await on_start(route)
+        await asyncio.sleep(until)
+        return route, [(round(t - t0, 2), m) for t, m in route.sent]
+
+    return asyncio.run(main())
+
+
+def test_time_compression(session):
+    route, sent = play(Replay(session, speed=10, close_at_end=True), until=0.1)
+    assert [m for _, m in sent] == ['{"VALUE": 0}', '{"VALUE": 1}', '{"VALUE": 2}']
+    assert [t for t, _ in sent] == [0.0, 0.02, 0.04]
+    assert route.closed
+
+
+def test_unpaced(session):
+    _, sent = play(Replay(session, speed=math.inf, burst=1), until=0.01)
+    assert len(sent) == 3
+
+
+def test_client_messages_trigger_the_rest(session):
+    async def nudge(route):
+        await asyncio.sleep(0.1)
+        assert len(route.sent) == 2  # parked on the recorded client message
+        route.on_message_handler('{"op": "more"}')
+
+    _, sent = play(Replay(session, speed=2, triggers=True), until=0.3, on_start=nudge)
+    assert len(sent) == 3
+    assert sent[2][0] == pytest.approx(0.15, abs=0.03)  # 100 ms after the nudge at 2x
@@ -0,0 +1,184 @@
+"""The routers of simple_ws/conftest.py against stand-ins for Playwright's routes."""
+
+import asyncio
+
+import pytest
+
+from simple_ws.conftest import WSBehavior, attach_ws_router, attach_ws_router_async
+
+
+class FakeServer:
+    """The server side of a route: Playwright leaves it unwrapped, so close() is sync."""
+
+    def __init__(self, log):
+        self.log = log
+        self.message = self.closed = None
+
+    def send(self, msg):
+        self.log.append(("to server", msg))
+
+    def close(self, code=None, reason=None):
+        self.log.append(("server closed", code))
+
+    def on_message(self, handler):
+        self.message = handler
+
+    def on_close(self, handler):
+        self.closed = handler
+
+
+class FakeRoute:
+    """The page side of a route, as the async API has it."""
+
+    url = "ws://localhost/ws"
+
+    def __init__(self):
+        self.log = []
+        self.server = FakeServer(self.log)
+        self.message = self.closed = None
+
+    def connect_to_server(self):
+        return self.server
+
+    def send(self, msg):
+        self.log.append(("to page", msg))
+
+    async def close(self, code=None, reason=None):
+        self.log.append(("page closed", code))
+
+    def on_message(self, handler):
+        self.message = handler
+
+    def on_close(self, handler):
+        self.closed = handler
+
+
+class FakeSyncRoute(FakeRoute):
+    """The page side as the sync API has it: close() blocks on the dispatcher."""
+
+    def __init__(self):
+        super().__init__()
+        route = self
+
+        class Impl:
+            async def close(self, code=None, reason=None):
+                route.log.append(("page closed", code))
+
+        self._impl_obj = Impl()
+
+    def close(self, code=None, reason=None):
+        raise AssertionError("sync close() called from inside a callback")
+
+
+class FakeScript:
+    async def dispose(self):
+        pass
+
+
+class FakeSyncPage:
+    def __init__(self):
+        self.handler = None
+
+    def route_web_socket(self, pattern, handler):
+        self.handler = handler
+
+    def add_init_script(self, script):
+        return FakeSyncScript()
+
+    def evaluate(self, script, arg=None):
+        pass
+
+
+class FakeSyncScript:
+    def dispose(self):
+        pass
+
+
+class FakePage:
+    def __init__(self):
+        self.handler = None
+
+    async def route_web_socket(self, pattern, handler):
+        self.handler = handler
+
+    async def add_init_script(self, script):
+        return FakeScript()
+
+    async def evaluate(self, script, arg=None):
+        pass
+
+
+async def routed(behavior, **kwargs):
+    page = FakePage()
+    detach = await attach_ws_router_async(page, behavior, **kwargs)
+    route = FakeRoute()
+    page.handler(route)
+    return route, detach
+
+
+def test_async_router_closes_both_sides_with_1013_on_overflow():
+    async def main():
+        behavior = WSBehavior()
+        release = asyncio.Event()
+
+        async def stuck(msg):
+            await release.wait()
+            return msg
+
+        behavior.inbound_hook = stuck
+        route, detach = await routed(behavior, queue_size=1, overflow="close")
+        for i in range(3):   # the first is held by the hook, the second queued, the third overflows
+            route.server.message(f"f{i}")
+            await asyncio.sleep(0)
+        release.set()
+        await detach()
+        return route.log, behavior.pump_stats
+
+    log, stats = asyncio.run(main())
+    assert ("server closed", 1013) in log and ("page closed", 1013) in log
+    assert stats.overflows == 1
+    assert not [m for m in log if m[0] == "to page"]
+
+
+def test_async_router_forwards_a_page_close_to_the_server():
+    async def main():
+        behavior = WSBehavior()
+        route, detach = await routed(behavior)
+        route.message("hello")
+        route.server.message("tick")
+        await asyncio.sleep(0.01)
+        route.closed(1000, "bye")
+        await detach()
+        return route.log
+
+    log = asyncio.run(main())
+    assert log == [("to server", "hello"), ("to page", "tick"), ("server closed", 1000)]
+
+
+@pytest.mark.parametrize("api", ["sync", "async"])
+def test_shared_upstream_closes_overflowing_pages_with_1013(api):
+    async def main():
+        behavior = WSBehavior()
+        behavior.share_upstream(queue_size=1, overflow="close")
+        if api == "sync":
+            page = FakeSyncPage()
+            detach = attach_ws_router(page, behavior)
+            routes = [FakeSyncRoute(), FakeSyncRoute()]
+        else:
+            page = FakePage()
+            detach = await attach_ws_router_async(page, behavior)
+            routes = [FakeRoute(), FakeRoute()]
+        for route in routes:
+            page.handler(route)
+        for i in range(3):   # no pump runs in between: the second frame overflows
+            routes[0].server.message(f"f{i}")
+        await asyncio.sleep(0.01)
+        result = detach()
+        if result is not None:
+            await result
+        return routes, behavior.hub
+
+    routes, hub = asyncio.run(main())
+    assert ("page closed", 1013) in routes[0].log and ("page closed", 1013) in routes[1].log
+    assert ("server closed", 1000) in routes[0].log   # the last subscriber out closed the upstream
+    assert hub.upstreams == {} and hub.stats.queues.overflows == 2
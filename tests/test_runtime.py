@@ -0,0 +1,101 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ws_intercept.runtime import bundle, minify_js, render, runtime_config
+
+
+def test_minify_keeps_literals_and_drops_comments():
+    src = """
+    // leading comment
+    const re = /\\/\\/[/]x/g;   /* block */
+    const s = "a // b", t = `c // ${ {k: 1}.k } d`;
+    function f(a, b) {
+      return a / 2 / b;
+    }
+    """
+    out = minify_js(src)
+    assert "comment" not in out and "block" not in out
+    assert '/\\/\\/[/]x/g' in out and '"a // b"' in out and "`c // ${{k:1}.k} d`" in out
+    assert "return a / 2 / b" in out
+    assert len(bundle()) < 0.8 * len(bundle(minified=False))
+
+
+def test_render_is_cached_by_config_and_validated():
+    a = render(mode="constant", constant=5)
+    assert render(constant=5, mode="constant") is a
+    assert render(mode="constant", constant=6) is not a
+    assert a.endswith(bundle())
+    head = a.split(";\n", 1)[0]
+    assert json.loads(head.split("=", 1)[1])["constant"] == 5
+    with pytest.raises(ValueError):
+        runtime_config(colour="red")
+    with pytest.raises(ValueError):
+        runtime_config(mode="sideways")
+    with pytest.raises(ValueError):
+        runtime_config(worker={"symbol": "US100Cash"})
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.parametrize("minified", [True, False])
+def test_runtime_patches_socket_delivery(minified):
+    script = """
+globalThis.window = globalThis;
+class FakeWS extends EventTarget { constructor(url) { super(); this.url = url; } }
+window.WebSocket = FakeWS;
+""" + render(mode="increasing", start=1, step=2, minified=minified) + """
+const got = [];
+const ws = new WebSocket('ws://h/ws');
+ws.onmessage = (ev) => got.push(ev.data);
+ws.addEventListener('message', (ev) => got.push(ev.data));
+ws.dispatchEvent(new MessageEvent('message', { data: '{"value":0}' }));
+ws.dispatchEvent(new MessageEvent('message', { data: '{"payload":{"value":0}}' }));
+window.__ws_intercept__.mode = 'untouched';
+ws.dispatchEvent(new MessageEvent('message', { data: '{"value":0}' }));
+console.log(JSON.stringify({ got, delivered: window.__ws_intercept__.delivered }));
+process.exit(0);  // the runtime's BroadcastChannel would keep node running
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    # Patched once per frame however many listeners; each listener sees the same data
+    assert out["got"] == ['{"value":1}'] * 2 + ['{"payload":{"value":3}}'] * 2 + ['{"value":0}'] * 2
+    assert out["delivered"] == 3
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_worker_bootstrap_patches_posts_inside_the_worker():
+    script = """
+globalThis.window = globalThis;
+globalThis.location = { href: 'http://h/' };
+const created = [];
+window.SharedWorker = class { constructor(url, opts) { created.push(url); this.port = null; } };
+""" + render(page=False, worker={"symbol": "US100Cash", "forcedBa": [950, 1050]}) + """
+new SharedWorker('/worker.js');
+new SharedWorker('/worker.js');
+(async () => {
+  const code = await require('buffer').resolveObjectURL(created[0]).text();
+  // Run the bootstrap against a fake worker scope
+  const posted = [];
+  class MessagePort { postMessage(data) { posted.push(data); } }
+  const imported = [];
+  new Function('self', 'importScripts', code)({ MessagePort }, (u) => imported.push(u));
+  const tick = (sl) => ({ ts: { tk: { sl, ba: [1, 2] } } });
+  new MessagePort().postMessage({ messages: [tick('AUDNZD#'), tick('US100Cash')] });
+  new MessagePort().postMessage(JSON.stringify({ messages: [tick('US100Cash')] }));
+  new MessagePort().postMessage({ quotes: [{ sl: 'US100Cash', ba: [1, 2] }] });   // unknown shape: deep scan
+  new MessagePort().postMessage({ messages: [tick('US100Cash'), { other: tick('US100Cash').ts }] });
+  new MessagePort().postMessage('{"messages": []}');
+  console.log(JSON.stringify({ created, imported, posted }));
+  process.exit(0);
+})();
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    assert len(set(out["created"])) == 1 and out["created"][0].startswith("blob:")   # one blob per script
+    assert out["imported"] == ["http://h/worker.js"]
+    obj, text, other, mixed, untouched = out["posted"]
+    assert [m["ts"]["tk"]["ba"] for m in obj["messages"]] == [[1, 2], [950, 1050]]
+    assert json.loads(text)["messages"][0]["ts"]["tk"]["ba"] == [950, 1050]
+    assert other["quotes"][0]["ba"] == [950, 1050]
+    assert mixed["messages"][0]["ts"]["tk"]["ba"] == mixed["messages"][1]["other"]["tk"]["ba"] == [950, 1050]
+    assert untouched == '{"messages": []}'
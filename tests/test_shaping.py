@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from ws_intercept.shaping import NetworkProfile, Shaper
+
+
+def run(profile, frames, *, wait=0.2, between=0.0):
+    """Push frames through a Shaper; returns (delivered (ms, msg) pairs, stats)."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        got = []
+        t0 = loop.time()
+        shaper = Shaper(profile, lambda m: got.append(((loop.time() - t0) * 1000, m)))
+        for m in frames:
+            shaper.push(m)
+            if between:
+                await asyncio.sleep(between)
+        await asyncio.sleep(wait)
+        return got, shaper.stats
+
+    return asyncio.run(main())
+
+
+def test_latency_keeps_order():
+    got, stats = run(NetworkProfile(latency_ms=50, jitter_ms=40, seed=1), [str(i) for i in range(20)])
+    assert [m for _, m in got] == [str(i) for i in range(20)]
+    assert all(t >= 45 for t, _ in got)
+    assert stats.delivered == 20 and stats.reordered == 0 and stats.in_flight == 0
+    assert 50 <= stats.mean_delay_ms < 100
+
+
+def test_unshaped_frames_go_out_synchronously():
+    delivered = []
+    shaper = Shaper(lambda: None, delivered.append)
+    shaper.push("a")
+    shaper.push(b"b")
+    assert delivered == ["a", b"b"] and shaper.stats.peak_in_flight == 0
+
+
+def test_bandwidth_queues_frames_behind_each_other():
+    # 1 kB burst, then 10 kB/s: each further 1 kB frame takes 100 ms
+    got, _ = run(NetworkProfile(bandwidth=10_000, burst=1000), [b"x" * 1000] * 4, wait=0.4)
+    assert [round(t / 50) * 50 for t, _ in got] == [0, 100, 200, 300]
+
+
+def test_loss_and_duplicates_are_seeded():
+    profile = NetworkProfile(loss=0.3, duplicate=0.2, seed=7)
+    frames = [str(i) for i in range(200)]
+    got, stats = run(profile, frames, wait=0.05)
+    again, _ = run(profile, frames, wait=0.05)
+    assert [m for _, m in got] == [m for _, m in again]
+    assert stats.received == 200 and stats.delivered == 200 - stats.dropped + stats.duplicated
+    assert 30 < stats.dropped < 90 and 10 < stats.duplicated < 60
+
+
+def test_reorder_window_lets_frames_overtake():
+    got, stats = run(NetworkProfile(reorder_ms=40, seed=3), [str(i) for i in range(50)], wait=0.1)
+    assert sorted(m for _, m in got) == sorted(str(i) for i in range(50))
+    assert [m for _, m in got] != [str(i) for i in range(50)] and stats.reordered > 0
+
+
+def test_thousands_in_flight_and_close():
+    async def main():
+        got = []
+        shaper = Shaper(NetworkProfile(latency_ms=30), got.append)
+        for i in range(5000):
+            shaper.push(str(i))
+        in_flight = shaper.stats.in_flight
+        await asyncio.sleep(0.1)
+        delivered = len(got)
+        shaper.push("late")
+        shaper.close()
+        await asyncio.sleep(0.1)
+        return in_flight, delivered, got, shaper.stats
+
+    in_flight, delivered, got, stats = asyncio.run(main())
+    assert in_flight == 5000 and delivered == 5000 and got[-1] == "4999"
+    assert stats.peak_in_flight == 5000 and stats.in_flight == 0 and stats.delivered == 5000
+
+
+def test_profile_validation():
+    assert NetworkProfile(seed=3).is_noop and not NetworkProfile(latency_ms=1).is_noop
+    with pytest.raises(ValueError):
+        NetworkProfile(loss=1.5)
+    with pytest.raises(ValueError):
+        NetworkProfile(latency_ms=-1)
+    with pytest.raises(ValueError):
+        NetworkProfile(bandwidth=0)
@@ -0,0 +1,35 @@
+import asyncio
+
+from ws_intercept.timers import TimerQueue
+
+
+def test_callbacks_run_in_deadline_order():
+    async def main():
+        timers = TimerQueue()
+        ran = []
+        now = timers.time()
+        for when, name in ((0.02, "c"), (0.01, "a"), (0.01, "b"), (0.0, "first")):
+            timers.call_at(now + when, ran.append, name)
+        await asyncio.sleep(0.05)
+        return ran, len(timers)
+
+    assert asyncio.run(main()) == (["first", "a", "b", "c"], 0)
+
+
+def test_a_raising_callback_does_not_stop_the_queue():
+    async def main():
+        timers = TimerQueue()
+        ran = []
+
+        def boom():
+            raise RuntimeError("boom")
+
+        timers.call_later(0, boom)
+        timers.call_later(0, ran.append, "same tick")
+        timers.call_later(0.02, ran.append, "later")
+        await asyncio.sleep(0.05)
+        return timers, ran
+
+    timers, ran = asyncio.run(main())
+    assert ran == ["same tick", "later"]
+    assert timers.errors == 1 and isinstance(timers.error, RuntimeError)
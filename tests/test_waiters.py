@@ -0,0 +1,57 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+from playwright.sync_api import Error, TimeoutError
+
+from ws_intercept.waiters import WAITERS_JS, PageWaiters
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_waiters_settle_on_delivery():
+    script = "globalThis.window = globalThis;" + WAITERS_JS + """
+const c = window.__ws_intercept__;
+(async () => {
+  const frames = c.waitForFrames(2, 1000);
+  const match = c.waitForFrame((f) => f.value > 3, 1000);
+  for (let i = 0; i < 5; i++) c.notifyDelivered(JSON.stringify({ value: i }));
+  let timeout = null;
+  try { await c.waitForFrames(1, 20); } catch (e) { timeout = e.message; }
+  console.log(JSON.stringify({ frames: await frames, match: await match, delivered: c.delivered, timeout }));
+})();
+"""
+    out = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    assert out["frames"] == 2
+    assert out["match"] == {"value": 4}
+    assert out["delivered"] == 5
+    assert out["timeout"].startswith("__ws_timeout__ 1 more frame(s)")
+
+
+class FakePage:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+        self.calls: list[tuple[str, object]] = []
+
+    def evaluate(self, expression, arg=None):
+        self.calls.append((expression, arg))
+        if self.error:
+            raise self.error
+        return 3
+
+
+def test_timeout_becomes_playwright_timeout():
+    page = FakePage(Error("Error: __ws_timeout__ 2 more frame(s) (100 ms)"))
+    with pytest.raises(TimeoutError, match=r"2 more frame\(s\) \(100 ms\)"):
+        PageWaiters(page).wait_for_frames(2, timeout=100)
+
+
+def test_other_errors_propagate_and_defaults_apply():
+    with pytest.raises(Error, match="boom"):
+        PageWaiters(FakePage(Error("boom"))).wait_for_text("#v", "1.00")
+
+    page = FakePage()
+    assert PageWaiters(page, default_timeout=500).wait_for_frames() == 3
+    assert page.calls[0][1] == [1, 500]
+    PageWaiters(page).wait_for_frame("f => f.value > 5", timeout=10)
+    assert "waitForFrame(f => f.value > 5, t)" in page.calls[1][0]
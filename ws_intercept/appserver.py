@@ -0,0 +1,120 @@
+"""Run a demo ASGI app in-process, on an ephemeral port.
+
+The socket is bound before uvicorn starts (port 0, so the OS picks a free one)
+and handed to it, which leaves no window for another process to take the port.
+uvicorn runs its own event loop on a daemon thread; start() returns once an HTTP
+probe of `ready_path` gets any response.
+
+One server per pytest session is enough. With pytest-xdist every worker is its
+own session, so each gets a private server and port. A demo's conftest.py gets
+its `app_server` and `base_url` fixtures from app_fixtures().
+"""
+
+from __future__ import annotations
+import importlib
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Iterator
+
+import pytest
+import uvicorn
+
+
+class AppServer:
+    """An ASGI app served by uvicorn on a background thread.
+
+    Args:
+        app: the ASGI application (e.g. simple_ws.app.app).
+        host: interface to bind.
+        port: 0 for an ephemeral port.
+        ready_path: path probed until the server answers.
+    """
+
+    def __init__(self, app: Any, host: str = "127.0.0.1", port: int = 0, ready_path: str = "/") -> None:
+        self.app = app
+        self.host = host
+        self.ready_path = ready_path
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self.port = self._sock.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> AppServer:
+        """Start serving and block until the readiness probe succeeds."""
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._sock]}, name=f"app-server:{self.port}", daemon=True
+        )
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"app server on port {self.port} exited during startup")
+            if self._server.started and self._probe():
+                return self
+            time.sleep(0.02)
+        self.stop()
+        raise RuntimeError(f"app server on port {self.port} not ready after {timeout} s")
+
+    def _probe(self) -> bool:
+        try:
+            urllib.request.urlopen(self.base_url + self.ready_path, timeout=1).close()
+        except urllib.error.HTTPError:
+            pass  # any HTTP answer means the server is up
+        except OSError:
+            return False
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._sock.close()
+
+    def __enter__(self) -> AppServer:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def app_fixtures(target: str) -> tuple[Callable[..., Any], Callable[..., Any]]:
+    """Session fixtures serving the ASGI app at `target` ("module:attribute").
+
+    Usage in a demo's conftest.py::
+
+        app_server, base_url = app_fixtures("simple_ws.app:app")
+
+    Returns:
+        (app_server, base_url). app_server imports and serves the app once per
+        session (or xdist worker). base_url, which page.goto("/") resolves
+        against, is app_server's unless --base-url (or PYTEST_BASE_URL) targets
+        an already running server, and then nothing is started.
+    """
+    module, _, attr = target.partition(":")
+
+    @pytest.fixture(scope="session")
+    def app_server() -> Iterator[AppServer]:
+        """The app under test, served in-process on an ephemeral port."""
+        app = getattr(importlib.import_module(module), attr or "app")
+        with AppServer(app) as server:
+            yield server
+
+    @pytest.fixture(scope="session")
+    def base_url(pytestconfig, request) -> str:
+        """Where page.goto("/") resolves: --base-url, or else app_server."""
+        return pytestconfig.getoption("--base-url", None) or request.getfixturevalue("app_server").base_url
+
+    return app_server, base_url
@@ -0,0 +1,572 @@
+"""Codecs for binary frames, patched in place where the field is fixed-width.
+
+A BinaryCodec knows a binary wire format well enough to find where a selector
+(ws_intercept.jsonpath) points inside a frame. When every match is a
+fixed-width number (an int32, a float64, ...), patch() copies the frame into
+one writable buffer and overwrites just those bytes with struct.pack_into.
+Nothing is decoded or re-encoded. Otherwise it falls back to
+decode, apply and encode.
+
+Built-ins:
+
+    MessagePackCodec   any MessagePack document; numbers stored as float32/64
+                       or (u)int8..64 are patched in place; decode/encode
+                       need msgspec or msgpack (optional)
+    StructCodec        a fixed record layout (struct format + field names),
+                       one record or a run of them, optionally behind a
+                       length prefix; every numeric field is patchable
+
+Plugins subclass BinaryCodec and implement _loads, _dumps and _slots. A codec
+that also returns a spec() can be patched in the page as well: BINARY_JS is the
+same in-place patcher for ArrayBuffers and typed arrays.
+"""
+
+from __future__ import annotations
+import abc
+import re
+import struct
+import sys
+import warnings
+from typing import Any, Callable, Sequence
+
+from ws_intercept.jsoncodec import CodecStats, DecodeError
+from ws_intercept.jsonpath import Selector, Step, compile_selector
+
+try:
+    import msgspec
+except ImportError:  # optional backend
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:  # optional backend
+    msgpack = None
+
+Slot = tuple[int, str]  # (byte offset, struct format of the number stored there)
+
+
+class NotFixedWidth(Exception):
+    """A match is not a fixed-width number; the frame has to be re-encoded."""
+
+
+class BinaryCodec(abc.ABC):
+    """Base class: counters, decode/encode and the in-place patch."""
+
+    name = "binary"
+
+    def __init__(self) -> None:
+        self.stats = CodecStats()
+        self.patched_in_place = 0
+        self.reencoded = 0
+
+    @abc.abstractmethod
+    def _loads(self, view: memoryview) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def _dumps(self, obj: Any) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def _slots(self, view: memoryview, steps: list[Step]) -> list[Slot]:
+        """Where the matches of one selector alternative sit in the frame.
+
+        Raises:
+            NotFixedWidth: some match cannot be overwritten in place.
+            ValueError, IndexError, struct.error: the frame is malformed.
+        """
+
+    def spec(self) -> dict[str, Any] | None:
+        """JSON description for BINARY_JS, None if the codec only works in Python."""
+        return None
+
+    def decode(self, data: bytes | memoryview) -> Any:
+        """Decode a frame.
+
+        Raises:
+            DecodeError: the frame is malformed (counted in stats.decode_errors).
+        """
+        try:
+            obj = self._loads(memoryview(data))
+        except (ValueError, IndexError, struct.error) as e:
+            self.stats.decode_errors += 1
+            raise DecodeError(str(e)) from e
+        self.stats.decoded += 1
+        return obj
+
+    def encode(self, obj: Any) -> bytes:
+        self.stats.encoded += 1
+        return self._dumps(obj)
+
+    def patch(self, data: bytes, selector: Selector | str, value: Callable[[], Any]) -> bytes | bytearray:
+        """Set every match of the selector to value(), in place when possible.
+
+        Args:
+            data: the raw frame.
+            selector: an expression or compiled ws_intercept.jsonpath selector.
+            value: called once per match, only when the frame is patched.
+
+        Returns:
+            ``data`` itself when nothing matched or the frame is malformed
+            (counted in stats.decode_errors), else the patched frame.
+        """
+        sel = compile_selector(selector) if isinstance(selector, str) else selector
+        view = memoryview(data)
+        for steps in sel.alternatives:
+            try:
+                slots = self._slots(view, steps)
+            except NotFixedWidth:
+                return self._patch_decoded(data, sel, value)
+            except (ValueError, IndexError, struct.error):
+                self.stats.decode_errors += 1
+                return data
+            if slots:
+                break
+        else:
+            return data
+        values = [value() for _ in slots]
+        buf = bytearray(data)
+        try:
+            for (offset, fmt), v in zip(slots, values):
+                struct.pack_into(fmt, buf, offset, v)
+        except (struct.error, OverflowError):
+            # The new value does not fit the old type (a float into an int, ...)
+            return self._patch_decoded(data, sel, value, values)
+        self.patched_in_place += 1
+        return buf
+
+    def _patch_decoded(self, data, sel, value, values=None) -> bytes:
+        try:
+            obj = self.decode(data)
+        except DecodeError:
+            return data
+        fn = (lambda _: value()) if values is None else (lambda _, it=iter(values): next(it))
+        if not sel.apply(obj, fn):
+            return data
+        self.reencoded += 1
+        return self.encode(obj)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.stats} in_place={self.patched_in_place} reencoded={self.reencoded}>"
+
+
+# MessagePack type bytes: payload sizes of the scalars, number formats, and
+# (length size, extra type byte) of str/bin/ext
+_MP_FIXED = {0xC0: 0, 0xC2: 0, 0xC3: 0, 0xCA: 4, 0xCB: 8, 0xCC: 1, 0xCD: 2, 0xCE: 4, 0xCF: 8,
+             0xD0: 1, 0xD1: 2, 0xD2: 4, 0xD3: 8, 0xD4: 2, 0xD5: 3, 0xD6: 5, 0xD7: 9, 0xD8: 17}
+_MP_NUMBER = {0xCA: ">f", 0xCB: ">d", 0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q",
+              0xD0: ">b", 0xD1: ">h", 0xD2: ">i", 0xD3: ">q"}
+_MP_SIZED = {0xC4: (1, 0), 0xC5: (2, 0), 0xC6: (4, 0), 0xC7: (1, 1), 0xC8: (2, 1), 0xC9: (4, 1),
+             0xD9: (1, 0), 0xDA: (2, 0), 0xDB: (4, 0)}
+_MP_STR = {0xD9: 1, 0xDA: 2, 0xDB: 4}
+
+
+def _mp_uint(view: memoryview, i: int, size: int) -> int:
+    if i + size > len(view):
+        raise ValueError("truncated MessagePack frame")
+    return int.from_bytes(view[i:i + size], "big")
+
+
+def _mp_container(view: memoryview, i: int) -> tuple[str, int, int] | None:
+    """("map" | "array", item count, offset of the first item), None for scalars."""
+    b = view[i]
+    if 0x80 <= b <= 0x8F:
+        return "map", b & 0x0F, i + 1
+    if 0x90 <= b <= 0x9F:
+        return "array", b & 0x0F, i + 1
+    if b in (0xDC, 0xDD):
+        size = 2 if b == 0xDC else 4
+        return "array", _mp_uint(view, i + 1, size), i + 1 + size
+    if b in (0xDE, 0xDF):
+        size = 2 if b == 0xDE else 4
+        return "map", _mp_uint(view, i + 1, size), i + 1 + size
+    return None
+
+
+def _mp_skip(view: memoryview, i: int) -> int:
+    """Offset just past the value at i."""
+    b = view[i]
+    if b <= 0x7F or b >= 0xE0:
+        return i + 1
+    if 0xA0 <= b <= 0xBF:
+        return i + 1 + (b & 0x1F)
+    c = _mp_container(view, i)
+    if c is not None:
+        kind, n, j = c
+        for _ in range(2 * n if kind == "map" else n):
+            j = _mp_skip(view, j)
+        return j
+    if b in _MP_FIXED:
+        return i + 1 + _MP_FIXED[b]
+    if b in _MP_SIZED:
+        size, extra = _MP_SIZED[b]
+        return i + 1 + size + extra + _mp_uint(view, i + 1, size)
+    raise ValueError(f"bad MessagePack type byte 0x{b:02x} at {i}")
+
+
+def _mp_str(view: memoryview, i: int) -> str | None:
+    """The string at i, None if the value there is not a string."""
+    b = view[i]
+    if 0xA0 <= b <= 0xBF:
+        start, n = i + 1, b & 0x1F
+    elif b in _MP_STR:
+        size = _MP_STR[b]
+        start, n = i + 1 + size, _mp_uint(view, i + 1, size)
+    else:
+        return None
+    return bytes(view[start:start + n]).decode("utf-8", "replace")
+
+
+class MessagePackCodec(BinaryCodec):
+    """MessagePack frames. Selectors walk maps and arrays without decoding them."""
+
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        super().__init__()
+        if msgspec is None and msgpack is None:
+            warnings.warn("neither msgspec nor msgpack is installed: only fixed-width "
+                          "MessagePack numbers can be patched", stacklevel=2)
+
+    def _loads(self, view: memoryview) -> Any:
+        if msgspec is not None:
+            try:
+                return msgspec.msgpack.decode(view)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+        if msgpack is not None:
+            try:
+                return msgpack.unpackb(view)
+            except (msgpack.UnpackException, msgpack.ExtraData) as e:
+                raise ValueError(str(e)) from e
+        raise ValueError("no MessagePack library installed (msgspec or msgpack)")
+
+    def _dumps(self, obj: Any) -> bytes:
+        if msgspec is not None:
+            return msgspec.msgpack.encode(obj)
+        if msgpack is not None:
+            return msgpack.packb(obj)
+        raise RuntimeError("no MessagePack library installed (msgspec or msgpack)")
+
+    def _slots(self, view: memoryview, steps: list[Step]) -> list[Slot]:
+        slots: list[Slot] = []
+        self._walk(view, 0, steps, slots)
+        return slots
+
+    def _walk(self, view: memoryview, i: int, steps: list[Step], out: list[Slot]) -> None:
+        if not steps:
+            fmt = _MP_NUMBER.get(view[i])
+            if fmt is None:
+                raise NotFixedWidth
+            if i + 1 + _MP_FIXED[view[i]] > len(view):
+                raise ValueError("truncated MessagePack frame")
+            out.append((i + 1, fmt))
+            return
+        (kind, arg), rest = steps[0], steps[1:]
+        c = _mp_container(view, i)
+        if c is None:
+            return
+        container, n, j = c
+        if container == "map":
+            if kind == "index":
+                return
+            for _ in range(n):
+                value = _mp_skip(view, j)
+                if kind == "each" or _mp_str(view, j) == arg:
+                    self._walk(view, value, rest, out)
+                j = _mp_skip(view, value)
+        else:
+            if kind == "key":
+                return
+            for k in range(n):
+                if kind == "each" or k == arg:
+                    self._walk(view, j, rest, out)
+                    if kind == "index":
+                        return
+                j = _mp_skip(view, j)
+
+    def spec(self) -> dict[str, Any]:
+        return {"codec": "msgpack"}
+
+
+# One struct format item: count + code (a count on s/p is the byte length)
+_STRUCT_ITEM = re.compile(r"\s*(\d*)([xcbB?hHiIlLqQnNefdspP])")
+_NUMERIC = set("bBhHiIlLqQefd")
+
+
+def _little(fmt: str) -> bool:
+    return fmt[0] == "<" or (fmt[0] == "=" and sys.byteorder == "little")
+
+
+class StructCodec(BinaryCodec):
+    """Fixed-layout binary records, described by a struct format.
+
+    Args:
+        fmt: format of one record with an explicit byte order ("<", ">", "!"
+            or "="), e.g. "<Id8s" for a uint32, a float64 and 8 bytes.
+        fields: a name per unpacked value, in order; pad bytes ("x") have none.
+        repeated: the frame is a run of records; decode() gives a list of
+            dicts and selectors start with "[n]" or "[*]".
+        prefix: format of a length header in front of the records, e.g. ">I";
+            it holds the byte length of what follows.
+    """
+
+    name = "struct"
+
+    def __init__(self, fmt: str, fields: Sequence[str], *, repeated: bool = False, prefix: str | None = None) -> None:
+        super().__init__()
+        order = fmt[:1]
+        if order not in ("<", ">", "!", "="):
+            raise ValueError(f"struct format needs an explicit byte order, got {fmt!r}")
+        if prefix is not None and (prefix[:1] not in ("<", ">", "!", "=") or prefix[1:] not in ("B", "H", "I", "Q")):
+            raise ValueError(f"prefix must be an unsigned integer format like '>I', got {prefix!r}")
+        items, offset = [], 0
+        for count, code in _STRUCT_ITEM.findall(fmt[1:]):
+            n = int(count or 1)
+            if code in "sp":
+                items.append((offset, order + count + code, False))
+                offset += n
+            elif code == "x":
+                offset += n
+            else:
+                size = struct.calcsize(order + code)
+                items.extend((offset + k * size, order + code, code in _NUMERIC) for k in range(n))
+                offset += n * size
+        if offset != struct.calcsize(fmt):
+            raise ValueError(f"bad struct format {fmt!r}")
+        if len(fields) != len(items):
+            raise ValueError(f"{fmt!r} holds {len(items)} values but {len(fields)} field names were given")
+        self.fmt = fmt
+        self.fields = tuple(fields)
+        self.repeated = repeated
+        self.prefix = prefix
+        self.size = offset
+        self._struct = struct.Struct(fmt)
+        self._layout = {name: item for name, item in zip(self.fields, items)}
+        self._head = struct.calcsize(prefix) if prefix else 0
+
+    def _count(self, view: memoryview) -> int:
+        """Number of records in the frame."""
+        body = len(view) - self._head
+        if self.prefix and struct.unpack_from(self.prefix, view)[0] != body:
+            raise ValueError(f"length prefix says {struct.unpack_from(self.prefix, view)[0]} bytes, frame has {body}")
+        if self.repeated and body % self.size == 0:
+            return body // self.size
+        if body != self.size:
+            raise ValueError(f"frame body is {body} bytes, a record is {self.size}")
+        return 1
+
+    def _loads(self, view: memoryview) -> Any:
+        records = [
+            dict(zip(self.fields, self._struct.unpack_from(view, self._head + k * self.size)))
+            for k in range(self._count(view))
+        ]
+        return records if self.repeated else records[0]
+
+    def _dumps(self, obj: Any) -> bytes:
+        records = obj if self.repeated else [obj]
+        body = b"".join(self._struct.pack(*(r[f] for f in self.fields)) for r in records)
+        return struct.pack(self.prefix, len(body)) + body if self.prefix else body
+
+    def _slots(self, view: memoryview, steps: list[Step]) -> list[Slot]:
+        n = self._count(view)
+        if self.repeated:
+            if len(steps) != 2 or steps[0][0] == "key":
+                return []
+            (kind, arg), steps = steps[0], steps[1:]
+            records = range(n) if kind == "each" else [arg] if arg < n else []
+        else:
+            records = [0]
+        if len(steps) != 1:
+            return []
+        kind, arg = steps[0]
+        names = self.fields if kind == "each" else [arg] if kind == "key" and arg in self._layout else []
+        slots = []
+        for k in records:
+            for name in names:
+                offset, fmt, numeric = self._layout[name]
+                if not numeric:
+                    raise NotFixedWidth
+                slots.append((self._head + k * self.size + offset, fmt))
+        return slots
+
+    def spec(self) -> dict[str, Any]:
+        layout = {name: [offset, fmt[1:]] for name, (offset, fmt, numeric) in self._layout.items() if numeric}
+        return {"codec": "struct", "names": list(self.fields), "layout": layout, "size": self.size,
+                "little": _little(self.fmt), "repeated": self.repeated, "head": self._head,
+                "head_little": _little(self.prefix) if self.prefix else False}
+
+
+def get_binary_codec(name: str, **options: Any) -> BinaryCodec:
+    """Build a fresh binary codec (with its own counters).
+
+    Args:
+        name: "msgpack" or "struct".
+        options: StructCodec arguments (fmt, fields, repeated, prefix).
+    """
+    if name == "msgpack":
+        return MessagePackCodec(**options)
+    if name == "struct":
+        return StructCodec(**options)
+    raise ValueError(f"unknown binary codec {name!r}")
+
+
+# In-page twin of the in-place patch: installs globalThis.__ws_binary__.patch(spec,
+# data, selector, nextValue) for ArrayBuffers and typed arrays. Frames whose
+# matches are not fixed-width numbers, or whose new values do not fit, are left
+# as they are (there is no re-encoder in the page).
+BINARY_JS = r"""
+(() => {
+  if (globalThis.__ws_binary__) return;
+  const MP_FIXED = { 0xc0: 0, 0xc2: 0, 0xc3: 0, 0xca: 4, 0xcb: 8, 0xcc: 1, 0xcd: 2, 0xce: 4, 0xcf: 8,
+    0xd0: 1, 0xd1: 2, 0xd2: 4, 0xd3: 8, 0xd4: 2, 0xd5: 3, 0xd6: 5, 0xd7: 9, 0xd8: 17 };
+  const MP_NUMBER = { 0xca: 'f', 0xcb: 'd', 0xcc: 'B', 0xcd: 'H', 0xce: 'I', 0xcf: 'Q',
+    0xd0: 'b', 0xd1: 'h', 0xd2: 'i', 0xd3: 'q' };
+  const MP_SIZED = { 0xc4: [1, 0], 0xc5: [2, 0], 0xc6: [4, 0], 0xc7: [1, 1], 0xc8: [2, 1], 0xc9: [4, 1],
+    0xd9: [1, 0], 0xda: [2, 0], 0xdb: [4, 0] };
+  const MP_STR = { 0xd9: 1, 0xda: 2, 0xdb: 4 };
+  // struct code -> [DataView type, min, max] (bounds for integers)
+  const TYPES = {
+    b: ['Int8', -0x80, 0x7f], B: ['Uint8', 0, 0xff], h: ['Int16', -0x8000, 0x7fff], H: ['Uint16', 0, 0xffff],
+    i: ['Int32', -0x80000000, 0x7fffffff], I: ['Uint32', 0, 0xffffffff], l: ['Int32', -0x80000000, 0x7fffffff],
+    L: ['Uint32', 0, 0xffffffff], q: ['BigInt64', -(2 ** 63), 2 ** 63 - 1], Q: ['BigUint64', 0, 2 ** 64 - 1],
+    f: ['Float32'], d: ['Float64'],
+  };
+  const NOT_FIXED = {};
+  const decoder = new TextDecoder();
+
+  const uint = (dv, i, size, little) => {
+    if (i + size > dv.byteLength) throw new RangeError('truncated frame');
+    let n = 0;
+    for (let k = 0; k < size; k++) n = n * 256 + dv.getUint8(little ? i + size - 1 - k : i + k);
+    return n;
+  };
+  const container = (dv, i) => {
+    const b = dv.getUint8(i);
+    if (b >= 0x80 && b <= 0x8f) return ['map', b & 0x0f, i + 1];
+    if (b >= 0x90 && b <= 0x9f) return ['array', b & 0x0f, i + 1];
+    if (b === 0xdc || b === 0xdd) { const s = b === 0xdc ? 2 : 4; return ['array', uint(dv, i + 1, s), i + 1 + s]; }
+    if (b === 0xde || b === 0xdf) { const s = b === 0xde ? 2 : 4; return ['map', uint(dv, i + 1, s), i + 1 + s]; }
+    return null;
+  };
+  const skip = (dv, i) => {
+    const b = dv.getUint8(i);
+    if (b <= 0x7f || b >= 0xe0) return i + 1;
+    if (b >= 0xa0 && b <= 0xbf) return i + 1 + (b & 0x1f);
+    const c = container(dv, i);
+    if (c) {
+      let j = c[2];
+      for (let k = 0, n = c[0] === 'map' ? 2 * c[1] : c[1]; k < n; k++) j = skip(dv, j);
+      return j;
+    }
+    if (b in MP_FIXED) return i + 1 + MP_FIXED[b];
+    if (b in MP_SIZED) { const [s, extra] = MP_SIZED[b]; return i + 1 + s + extra + uint(dv, i + 1, s); }
+    throw new RangeError('bad MessagePack type byte ' + b + ' at ' + i);
+  };
+  const str = (dv, i) => {
+    const b = dv.getUint8(i);
+    let start, n;
+    if (b >= 0xa0 && b <= 0xbf) { start = i + 1; n = b & 0x1f; }
+    else if (b in MP_STR) { start = i + 1 + MP_STR[b]; n = uint(dv, i + 1, MP_STR[b]); }
+    else return null;
+    return decoder.decode(new Uint8Array(dv.buffer, dv.byteOffset + start, n));
+  };
+  const walk = (dv, i, steps, k, out) => {
+    if (k === steps.length) {
+      const code = MP_NUMBER[dv.getUint8(i)];
+      if (!code) throw NOT_FIXED;
+      if (i + 1 + MP_FIXED[dv.getUint8(i)] > dv.byteLength) throw new RangeError('truncated frame');
+      out.push([i + 1, code, false]);
+      return;
+    }
+    const [kind, arg] = steps[k];
+    const c = container(dv, i);
+    if (!c) return;
+    let j = c[2];
+    if (c[0] === 'map') {
+      if (kind === 'index') return;
+      for (let n = 0; n < c[1]; n++) {
+        const v = skip(dv, j);
+        if (kind === 'each' || str(dv, j) === arg) walk(dv, v, steps, k + 1, out);
+        j = skip(dv, v);
+      }
+    } else {
+      if (kind === 'key') return;
+      for (let n = 0; n < c[1]; n++) {
+        if (kind === 'each' || n === arg) {
+          walk(dv, j, steps, k + 1, out);
+          if (kind === 'index') return;
+        }
+        j = skip(dv, j);
+      }
+    }
+  };
+
+  const slots = {
+    msgpack(spec, dv, steps) {
+      const out = [];
+      walk(dv, 0, steps, 0, out);
+      return out;
+    },
+    struct(spec, dv, steps) {
+      const body = dv.byteLength - spec.head;
+      if (spec.head && uint(dv, 0, spec.head, spec.head_little) !== body) throw new RangeError('length prefix mismatch');
+      const count = spec.repeated && body % spec.size === 0 ? body / spec.size : body === spec.size ? 1 : -1;
+      if (count < 0) throw new RangeError('frame body is ' + body + ' bytes, a record is ' + spec.size);
+      let records = [0];
+      if (spec.repeated) {
+        if (steps.length !== 2 || steps[0][0] === 'key') return [];
+        const [kind, arg] = steps[0];
+        records = kind === 'each' ? [...Array(count).keys()] : arg < count ? [arg] : [];
+        steps = steps.slice(1);
+      }
+      if (steps.length !== 1) return [];
+      const [kind, arg] = steps[0];
+      const names = kind === 'each' ? spec.names : kind === 'key' && spec.names.includes(arg) ? [arg] : [];
+      const out = [];
+      for (const r of records) {
+        for (const name of names) {
+          if (!spec.layout[name]) throw NOT_FIXED;
+          const [offset, code] = spec.layout[name];
+          out.push([spec.head + r * spec.size + offset, code, spec.little]);
+        }
+      }
+      return out;
+    },
+  };
+
+  const fits = (code, v) => {
+    const t = TYPES[code];
+    if (!t || typeof v !== 'number') return false;
+    return t.length === 1 || (Number.isInteger(v) && v >= t[1] && v <= t[2]);
+  };
+
+  globalThis.__ws_binary__ = {
+    // True when the frame was rewritten (in place)
+    patch(spec, data, sel, nextValue) {
+      const dv = data instanceof ArrayBuffer ? new DataView(data)
+        : ArrayBuffer.isView(data) ? new DataView(data.buffer, data.byteOffset, data.byteLength) : null;
+      const find = spec && slots[spec.codec];
+      if (!dv || !find) return false;
+      let found = [];
+      try {
+        for (const steps of sel.alternatives) {
+          found = find(spec, dv, steps);
+          if (found.length) break;
+        }
+      } catch (_) {
+        return false;   // not fixed-width, or malformed
+      }
+      if (!found.length) return false;
+      const values = found.map(() => nextValue());
+      if (!found.every(([, code], k) => fits(code, values[k]))) return false;
+      found.forEach(([offset, code, little], k) => {
+        const type = TYPES[code][0];
+        const v = type.startsWith('Big') ? BigInt(values[k]) : values[k];
+        dv['set' + type](offset, v, little);
+      });
+      return true;
+    },
+  };
+})();
+"""
@@ -0,0 +1,228 @@
+"""One producer per feed, fanned out to every client of a demo ws_endpoint.
+
+By default the demo servers run a loop per connection: every client builds,
+encodes and paces its own copy of the feed, which is what limits a load test
+to a few hundred sockets per core. A BroadcastHub runs one producer task per
+feed instead (keyed, e.g. by LoadProfile, so clients asking for the same feed
+share it). Each frame is encoded once and the same str is queued to every
+client; a client's own coroutine only takes frames off its queue and sends
+them, so thousands of clients cost one queue append and one send per frame.
+
+A client queue holds at most `queue_size` frames. A client that falls further
+behind is handled by `overflow` (the policies of ws_intercept.pump); both are
+hub-wide defaults that each client may override:
+
+    close         the client is dropped from the feed and serve() returns
+                  "lagged" (the endpoints close it with 1013 "try again later")
+    drop_oldest   its oldest queued frame is discarded: it skips ahead
+    drop_newest   the new frame is discarded for it
+
+The producer starts with the first client of its feed and is cancelled when
+the last one leaves; clients that join late start at the current frame. A
+stamped feed is stamped once, at production, so every client sees the same
+seq and sent and a late joiner's first seq is not 0.
+
+The demo endpoints hand ?broadcast=1 sockets to serve_broadcast(), which
+reads `queue_size` and `overflow` from the same query string.
+"""
+
+from __future__ import annotations
+import asyncio
+import functools
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from ws_intercept.loadgen import LoadProfile, demo_feed, stream
+from ws_intercept.pump import OVERFLOW_POLICIES, Overflow
+
+# producer(publish): awaits publish(frame) for each encoded frame; returning
+# ends the feed for its clients
+Producer = Callable[[Callable[[str], Awaitable[None]]], Awaitable[Any]]
+
+_ENDED = object()
+_LAGGED = object()
+
+
+def _check_policy(queue_size: int, overflow: str) -> None:
+    if queue_size < 1:
+        raise ValueError(f"queue_size must be at least 1, got {queue_size!r}")
+    if overflow not in OVERFLOW_POLICIES:
+        raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, got {overflow!r}")
+
+
+@dataclass
+class BroadcastStats:
+    feeds: int = 0          # producers started
+    clients: int = 0        # being served right now
+    peak_clients: int = 0
+    published: int = 0      # frames produced (each encoded once)
+    delivered: int = 0      # frames sent to clients
+    dropped: int = 0        # lost to full client queues
+    lagged: int = 0         # clients dropped by the "close" policy
+
+
+class Feed:
+    """One producer task and the queues of the clients it serves."""
+
+    def __init__(self, hub: BroadcastHub, key: Hashable, producer: Producer) -> None:
+        self.hub = hub
+        self.key = key
+        self.clients: dict[asyncio.Queue, tuple[int, Overflow]] = {}   # queue -> (queue_size, overflow)
+        self.ended = False
+        self.task = asyncio.get_running_loop().create_task(self._run(producer))
+
+    async def _run(self, producer: Producer) -> None:
+        try:
+            await producer(self.publish)
+        finally:
+            self.end()
+
+    async def publish(self, frame: str) -> None:
+        """Queue a frame to every client; never waits for them."""
+        stats = self.hub.stats
+        stats.published += 1
+        lagging = []
+        for q, (limit, overflow) in self.clients.items():
+            if q.qsize() >= limit:
+                if overflow == "drop_newest":
+                    stats.dropped += 1
+                    continue
+                if overflow == "drop_oldest":
+                    q.get_nowait()
+                    stats.dropped += 1
+                else:
+                    lagging.append(q)
+                    continue
+            q.put_nowait(frame)
+        for q in lagging:
+            stats.dropped += q.qsize() + 1
+            stats.lagged += 1
+            self._kick(q, _LAGGED)
+
+    def _kick(self, q: asyncio.Queue, why: object) -> None:
+        """Stop serving a client: what it has queued is discarded."""
+        self.clients.pop(q, None)
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(why)
+
+    def end(self) -> None:
+        """The producer finished: clients get what is queued, then "ended"."""
+        if self.ended:
+            return
+        self.ended = True
+        self.hub._forget(self)
+        for q in self.clients:
+            q.put_nowait(_ENDED)   # queues are not capped by asyncio: always fits
+        self.clients.clear()
+
+    def leave(self, q: asyncio.Queue) -> None:
+        """A client is gone; the last one out stops the producer."""
+        self.clients.pop(q, None)
+        if not self.clients and not self.ended:
+            self.ended = True
+            self.hub._forget(self)
+            self.task.cancel()
+
+
+class BroadcastHub:
+    """Serves clients from one producer per feed key.
+
+    Args:
+        queue_size: frames a client may fall behind by.
+        overflow: what a full client queue does (see the module docstring).
+        stats: counters to update.
+    """
+
+    def __init__(self, *, queue_size: int = 64, overflow: Overflow = "close",
+                 stats: BroadcastStats | None = None) -> None:
+        _check_policy(queue_size, overflow)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.stats = stats if stats is not None else BroadcastStats()
+        self.feeds: dict[Hashable, Feed] = {}
+
+    async def serve(
+        self,
+        key: Hashable,
+        producer: Producer,
+        send: Callable[[str], Awaitable[Any]],
+        *,
+        queue_size: int | None = None,
+        overflow: Overflow | None = None,
+    ) -> str:
+        """Send the frames of feed `key` to one client until it ends or lags.
+
+        Args:
+            key: identifies the feed; clients with equal keys share a producer.
+            producer: starts the feed if it is not running yet.
+            send: e.g. the endpoint's WebSocket.send_text.
+            queue_size, overflow: this client's lag handling (default: the hub's).
+
+        Returns:
+            "ended" when the producer returned, "lagged" when the client fell
+            more than queue_size frames behind under the "close" policy.
+            Errors from send() (the client went away) propagate.
+
+        Raises:
+            ValueError: queue_size or overflow is out of range, before subscribing.
+        """
+        policy = (queue_size if queue_size is not None else self.queue_size,
+                  overflow if overflow is not None else self.overflow)
+        _check_policy(*policy)
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = self.feeds[key] = Feed(self, key, producer)
+            self.stats.feeds += 1
+        q: asyncio.Queue = asyncio.Queue()
+        feed.clients[q] = policy
+        stats = self.stats
+        stats.clients += 1
+        stats.peak_clients = max(stats.peak_clients, stats.clients)
+        try:
+            while True:
+                frame = await q.get()
+                if frame is _ENDED:
+                    return "ended"
+                if frame is _LAGGED:
+                    return "lagged"
+                await send(frame)
+                stats.delivered += 1
+        finally:
+            stats.clients -= 1
+            feed.leave(q)
+
+    def _forget(self, feed: Feed) -> None:
+        if self.feeds.get(feed.key) is feed:
+            del self.feeds[feed.key]
+
+
+async def serve_broadcast(ws, profile: LoadProfile | None, stamp: bool, hub: BroadcastHub) -> None:
+    """Serve a demo endpoint's ?broadcast=1 socket from `hub`, then close it.
+
+    The feed is the load-generator `profile`, or the demo feed when there is
+    none. `queue_size` and `overflow` in the query string set this client's
+    lag handling (1008 if malformed); a client that lags under "close" is
+    closed with 1013.
+
+    Args:
+        ws: the accepted Starlette WebSocket.
+    """
+    params = ws.query_params
+    try:
+        queue_size = int(params["queue_size"]) if "queue_size" in params else None
+        overflow = params.get("overflow")
+        _check_policy(queue_size if queue_size is not None else hub.queue_size,
+                      overflow if overflow is not None else hub.overflow)
+    except ValueError as e:
+        await ws.close(code=1008, reason=str(e))
+        return
+    if profile is not None:
+        key, producer = profile, functools.partial(stream, profile=profile)
+    else:
+        key, producer = ("demo", stamp), functools.partial(demo_feed, stamp=stamp)
+    if await hub.serve(key, producer, ws.send_text, queue_size=queue_size, overflow=overflow) == "lagged":
+        await ws.close(code=1013, reason="client too slow")
+    else:
+        await ws.close()
@@ -0,0 +1,112 @@
+"""Versioned config pushes into pages and their SharedWorkers.
+
+Changing the runtime's config used to take one page.evaluate per field, and the
+pwa worker table was frozen into the worker's bootstrap blob. A ConfigChannel
+sends the whole change as one update with a version number:
+
+- live pages get it through a single evaluate each, apply all fields at once
+  and post it on a BroadcastChannel
+- SharedWorkers bootstrapped by the runtime listen on that channel, swap in
+  the new override table and acknowledge the version; publish() returns once
+  every worker of every page runs it
+- documents created later get the latest update from an init script, so the
+  version survives navigations
+
+Frames handled after publish() returns see the new config everywhere; older
+versions arriving late are ignored.
+
+New documents are served by an init script rather than expose_binding: a
+binding call is asynchronous and would race the page's first frames.
+"""
+
+from __future__ import annotations
+import json
+from typing import Any
+
+from playwright.sync_api import BrowserContext, Error, TimeoutError
+
+from ws_intercept.runtime import MODES, config_update
+
+DEFAULT_TIMEOUT = 5_000  # ms to wait for workers to acknowledge an update
+
+# Applies an update whether or not the runtime has run yet in this document
+_UPDATE_JS = (
+    "(u => {{ const c = window.__ws_intercept__;"
+    " if (c && c.applyConfig) c.applyConfig(u); else window.__ws_intercept_pending__ = u; }})({update});"
+)
+
+
+class ConfigChannel:
+    """Push runtime config (ws_intercept.runtime options) to a page, or every page of a context.
+
+    Args:
+        target: a Page, or a BrowserContext for all of its pages.
+        timeout: milliseconds publish() waits for workers to acknowledge.
+    """
+
+    def __init__(self, target: Any, *, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.target = target
+        self.timeout = timeout
+        self.version = 0
+        self.config: dict[str, Any] = {}   # every field published so far, latest values
+        self._script = None
+
+    def _pages(self) -> list[Any]:
+        return list(self.target.pages) if isinstance(self.target, BrowserContext) else [self.target]
+
+    def publish(self, *, wait: bool = True, **fields: Any) -> int:
+        """Apply fields (mode, constant, start, step, current, selector, worker, log) everywhere at once.
+
+        Setting `start` restarts increasing/decreasing series from it. With
+        wait=True, returns once the SharedWorkers have the update too, and
+        raises Playwright's TimeoutError if they do not within the timeout.
+
+        Returns:
+            The update's version.
+        """
+        config = config_update(**fields)
+        self.version += 1
+        self.config.update(config)
+        update = {"version": self.version, "config": config}
+
+        # Only the latest update matters to documents created from now on
+        previous = self._script
+        self._script = self.target.add_init_script(
+            _UPDATE_JS.format(update=json.dumps({"version": self.version, "config": self.config}))
+        )
+        if previous is not None:
+            previous.dispose()
+
+        for page in self._pages():
+            try:
+                page.evaluate(
+                    "([u, t]) => window.__ws_intercept__ && window.__ws_intercept__.publish"
+                    " ? window.__ws_intercept__.publish(u, t) : 0",
+                    [update, self.timeout if wait else 0],
+                )
+            except Error as e:
+                if "__ws_timeout__" in e.message:
+                    raise TimeoutError("Timed out waiting for " + e.message.split("__ws_timeout__ ", 1)[1]) from e
+                raise
+        return self.version
+
+    def set_mode(
+        self,
+        mode: str,
+        *,
+        const: float | None = None,
+        start: float | None = None,
+        step: float | None = None,
+        selector: str | None = None,
+    ) -> int:
+        """Switch the page-level mode in one update (see publish())."""
+        if mode not in MODES:
+            raise ValueError(f"bad mode {mode!r}; expected one of {', '.join(MODES)}")
+        fields = {"constant": const, "start": start, "step": step, "selector": selector}
+        return self.publish(mode=mode, **{k: v for k, v in fields.items() if v is not None})
+
+    def close(self) -> None:
+        """Stop handing the latest update to new documents."""
+        if self._script is not None:
+            self._script.dispose()
+            self._script = None
@@ -0,0 +1,141 @@
+"""Conflation of server -> page frames: only the latest frame per key goes out.
+
+Like market-data conflation: while a feed floods faster than the page can
+render, frames are collected for `interval_ms`, a later frame replaces an
+earlier one with the same key, and what is left is flushed when the interval
+ends, in the order of those latest frames. The page stays current instead of
+falling behind without bound.
+
+The key is a selector (ws_intercept.jsonpath) and covers all of its matches:
+"sl" conflates per symbol for one tick per frame, "messages[*].ts.tk.sl" per
+set of symbols for batched tick frames (pwa/tmp.py). Frames the selector does
+not match, and frames that do not decode, are forwarded at once and may
+overtake held-back ones.
+"""
+
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Union
+
+from ws_intercept.jsonpath import Selector, compile_selector
+from ws_intercept.timers import TimerQueue
+
+Msg = Union[str, bytes]
+
+
+@dataclass(frozen=True)
+class Conflation:
+    """Conflate frames by the values `key` selects, flushing every interval_ms."""
+
+    key: str
+    interval_ms: float = 100.0
+
+    def __post_init__(self) -> None:
+        if not self.interval_ms > 0:
+            raise ValueError(f"interval_ms must be positive, got {self.interval_ms!r}")
+        compile_selector(self.key)  # fail early on a bad selector
+
+    @cached_property
+    def selector(self) -> Selector:
+        return compile_selector(self.key)
+
+
+@dataclass
+class ConflationStats:
+    received: int = 0
+    forwarded: int = 0      # frames sent on, passed-through ones included
+    coalesced: int = 0      # frames replaced by a later one with their key
+    passed: int = 0         # frames without a key, sent at once
+    flushes: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Frames received per frame forwarded."""
+        return self.received / self.forwarded if self.forwarded else 0.0
+
+
+class Conflator:
+    """Conflates one connection's inbound frames.
+
+    Args:
+        policy: the Conflation, or a callable returning the current one (None
+            to forward frames as they come); read per frame.
+        send: called as send(msg, *extra) with the arguments given to push().
+        timers: queue the flushes run on; share one across connections.
+        stats: counters to update (shared across connections if passed in).
+        loads: decodes text frames for the key; binary frames are passed through.
+    """
+
+    def __init__(
+        self,
+        policy: Conflation | Callable[[], Conflation | None],
+        send: Callable[..., Any],
+        *,
+        timers: TimerQueue | None = None,
+        stats: ConflationStats | None = None,
+        loads: Callable[[str], Any] = json.loads,
+    ) -> None:
+        self._policy = policy if callable(policy) else (lambda: policy)
+        self._send = send
+        self.timers = timers if timers is not None else TimerQueue()
+        self.stats = stats if stats is not None else ConflationStats()
+        self._loads = loads
+        self._pending: dict[tuple, tuple] = {}   # key -> (msg, *extra), latest wins
+        self._armed = False
+        self.closed = False
+
+    def push(self, msg: Msg, *extra: Any) -> None:
+        """Take one frame; `extra` travels with it to send()."""
+        stats = self.stats
+        stats.received += 1
+        policy = self._policy()
+        key = self._key(policy.selector, msg) if policy is not None else None
+        if key is None:
+            if policy is None and self._pending:
+                self.flush()   # conflation was switched off: keep the order
+            stats.passed += 1
+            self._forward(msg, extra)
+            return
+        if key in self._pending:
+            stats.coalesced += 1
+            del self._pending[key]   # re-inserted below: flushed in order of the latest frame
+        self._pending[key] = (msg, *extra)
+        if not self._armed:
+            self._armed = True
+            self.timers.call_later(policy.interval_ms / 1000, self._tick)
+
+    def _key(self, sel: Selector, msg: Msg) -> tuple | None:
+        if not isinstance(msg, str) or not sel.may_match(msg):
+            return None
+        try:
+            obj = self._loads(msg)
+        except ValueError:
+            return None
+        values = sel.values(obj)
+        return tuple(json.dumps(v) for v in values) if values else None
+
+    def _tick(self) -> None:
+        self._armed = False
+        self.flush()
+
+    def flush(self) -> None:
+        """Send what is held back now."""
+        if not self._pending or self.closed:
+            return
+        pending, self._pending = self._pending, {}
+        self.stats.flushes += 1
+        for msg, *extra in pending.values():
+            self._forward(msg, extra)
+
+    def _forward(self, msg: Msg, extra) -> None:
+        if self.closed:
+            return
+        self.stats.forwarded += 1
+        self._send(msg, *extra)
+
+    def close(self) -> None:
+        """The socket is gone: frames still held back are dropped."""
+        self.closed = True
+        self._pending = {}
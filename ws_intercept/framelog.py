@@ -0,0 +1,87 @@
+"""Batched frame records from the in-page runtime, instead of console.log bridging.
+
+With ``log=True`` the runtime console.logs every send, receive and port post
+and page.on("console") forwards each line over CDP, one protocol message per
+frame; at high frame rates that traffic is the bottleneck and skews timing.
+
+Instead, the runtime (ws_intercept.runtime) keeps structured records in a
+bounded ring buffer in the page:
+
+    sample=0        off (the default)
+    sample=1        every frame
+    sample=N        every Nth frame
+    frame_buffer=K  the ring holds K records; the oldest are overwritten
+
+Set them with render() or live with ConfigChannel.publish(sample=...).
+PageFrameLog drains the ring with one page.evaluate per batch, and each batch
+carries the counters that tell whether anything was lost. Counters start over
+when the page navigates.
+"""
+
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from playwright.sync_api import Page
+
+_DRAIN_JS = (
+    "max => window.__ws_intercept__ && window.__ws_intercept__.drainFrames"
+    " ? window.__ws_intercept__.drainFrames(max) : null"
+)
+
+
+@dataclass
+class FrameBatch:
+    """One drain of the ring; the counters are totals since the page loaded."""
+
+    # {"seq", "t" (performance.now() ms), "dir" (ws-send, ws-recv, sw-post, sw-recv), "url", "data"}
+    frames: list[dict[str, Any]] = field(default_factory=list)
+    pending: int = 0    # records left in the ring (drain(max) stopped short)
+    seen: int = 0       # frames that went through the runtime
+    recorded: int = 0   # frames sampled into the ring
+    dropped: int = 0    # records overwritten before they were drained
+
+    def format(self) -> str:
+        lines = [f"[{f['t']:10.1f} ms #{f['seq']} {f['dir']}] {f['data']}" for f in self.frames]
+        lines.append(
+            f"-- {len(self.frames)} frame(s); seen {self.seen}, recorded {self.recorded}, "
+            f"dropped {self.dropped}, pending {self.pending}"
+        )
+        return "\n".join(lines)
+
+
+class PageFrameLog:
+    """Drains the runtime's frame records of one page.
+
+    Not to be confused with ws_intercept.recorder.FrameLog, which reads a
+    recording back from disk.
+
+    Args:
+        page: a page running the interception runtime with sample > 0.
+        batch: most records returned by one drain (0: everything buffered).
+    """
+
+    def __init__(self, page: Page, *, batch: int = 0) -> None:
+        self.page = page
+        self.batch = batch
+
+    def drain(self, max: int | None = None) -> FrameBatch:
+        """Take the buffered records, oldest first, in one evaluate call."""
+        out = self.page.evaluate(_DRAIN_JS, self.batch if max is None else max)
+        return FrameBatch(**out) if out else FrameBatch()
+
+    def follow(self, duration_ms: float, *, interval_ms: float = 500) -> Iterator[FrameBatch]:
+        """Yield a batch every interval_ms for duration_ms (a drop-in for page.wait_for_timeout)."""
+        deadline = time.monotonic() + duration_ms / 1000
+        while True:
+            left_ms = (deadline - time.monotonic()) * 1000
+            if left_ms > 0:
+                self.page.wait_for_timeout(min(interval_ms, left_ms))
+            batch = self.drain()
+            yield batch
+            while batch.pending:
+                batch = self.drain()
+                yield batch
+            if left_ms <= interval_ms:
+                return
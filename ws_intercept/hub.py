@@ -0,0 +1,171 @@
+"""One upstream connection per URL, fanned out to every routed socket.
+
+Normally each routed page socket opens its own backend connection, so fifty
+pages mean fifty upstream sockets and fifty decodes of every frame. With a
+FanoutHub the first socket for a URL connects to the server and becomes the
+upstream; later sockets to the same URL are served from it without a backend
+connection of their own. Each upstream frame is processed once and then
+queued to every subscriber (a FramePump each, see ws_intercept.pump), so a
+slow subscriber only falls behind itself. This is what the SharedWorker in
+shared_worker/app_shared.py does for tabs, one level down.
+
+Frames the subscribers send all go to the one upstream connection. The
+upstream lives as long as it has subscribers or its server side stays open;
+when it closes, every subscriber is closed with the same code (the demo pages
+reconnect, and the first one back opens a new upstream). Subscribers that join
+late miss the frames sent before they joined.
+"""
+
+from __future__ import annotations
+import asyncio
+import functools
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Callable, Union
+
+from ws_intercept.pump import OVERFLOW_POLICIES, FramePump, Overflow, PumpStats
+from ws_intercept.replay import close_route
+
+Msg = Union[str, bytes]
+
+
+@dataclass
+class HubStats:
+    upstreams: int = 0       # backend connections opened
+    subscribers: int = 0     # routed sockets served, upstream owners included
+    published: int = 0       # upstream frames, each processed once
+    peak_subscribers: int = 0
+    # All subscriber queues: frames delivered (sent), lost to full queues
+    # (dropped), deepest backlog (peak_queued)
+    queues: PumpStats = field(default_factory=PumpStats)
+
+
+def _call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+    """Call a sync- or async-API method without waiting for it."""
+    result = fn(*args, **kwargs)
+    if inspect.isawaitable(result):
+        asyncio.ensure_future(result)
+
+
+def _defer_close(ws_route, **kwargs: Any) -> None:
+    """Close a page-side route after the current callback, without blocking it.
+
+    Fan-out runs inside another route's message callback (or a timer); see
+    ws_intercept.replay.close_route for why that needs care with the sync API.
+    """
+    asyncio.get_running_loop().call_soon(functools.partial(close_route, ws_route, **kwargs))
+
+
+class Upstream:
+    """The backend connection of one URL and the sockets it serves."""
+
+    def __init__(self, hub: FanoutHub, url: str) -> None:
+        self.hub = hub
+        self.url = url
+        self.subscribers: dict[Any, FramePump] = {}   # ws_route -> its queue
+        self._send: Callable[[Msg], Any] | None = None
+        self._close: Callable[..., Any] | None = None
+        self.closed = False
+
+    def attach(self, send: Callable[[Msg], Any], close: Callable[..., Any]) -> None:
+        """Wire in the server side: send(msg) and close(code=, reason=)."""
+        self._send, self._close = send, close
+
+    def publish(self, msg: Msg | None) -> None:
+        """Fan a processed upstream frame out to every subscriber (None drops it)."""
+        if msg is None or self.closed:
+            return
+        self.hub.stats.published += 1
+        for pump in list(self.subscribers.values()):   # a full queue may unsubscribe
+            pump.put(msg)
+
+    def send(self, msg: Msg) -> None:
+        """A subscriber's frame for the server."""
+        if self._send is not None and not self.closed:
+            self._send(msg)
+
+    def server_closed(self, code: int | None = None, reason: str | None = None) -> None:
+        """The server side went away: so do the subscribers."""
+        if self.closed:
+            return
+        self.closed = True
+        self.hub._forget(self)
+        for ws_route, pump in list(self.subscribers.items()):
+            pump.close()
+            _defer_close(ws_route, code=code, reason=reason)
+        self.subscribers.clear()
+
+    def leave(self, ws_route) -> None:
+        """A subscriber closed; the last one out closes the server side."""
+        pump = self.subscribers.pop(ws_route, None)
+        if pump is not None:
+            pump.close()
+        if not self.subscribers and not self.closed:
+            self.closed = True
+            self.hub._forget(self)
+            if self._close is not None:
+                _call(self._close, code=1000, reason="no subscribers left")
+
+
+class FanoutHub:
+    """Shares upstream connections between routed sockets, by URL.
+
+    Args:
+        queue_size: frames a subscriber may fall behind by.
+        overflow: what a full subscriber queue does (see ws_intercept.pump);
+            "drop_oldest" keeps a slow page current.
+        stats: counters to update.
+    """
+
+    def __init__(self, *, queue_size: int = 256, overflow: Overflow = "drop_oldest",
+                 stats: HubStats | None = None) -> None:
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, got {queue_size!r}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, got {overflow!r}")
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.stats = stats if stats is not None else HubStats()
+        self.upstreams: dict[str, Upstream] = {}
+
+    def subscribe(
+        self,
+        ws_route,
+        connect: Callable[[Upstream], Any],
+        *,
+        deliver: Callable[[Msg], Any] | None = None,
+    ) -> Upstream:
+        """Serve a routed socket from the upstream of its URL, opening it if needed.
+
+        Args:
+            ws_route: the page-side route.
+            connect: called with a new Upstream on the route that opens it;
+                connects to the server, calls upstream.attach() and feeds
+                processed frames to upstream.publish().
+            deliver: sends a frame to this subscriber (default ws_route.send).
+
+        The caller forwards the route's own frames with upstream.send() and
+        calls upstream.leave(ws_route) when it closes.
+        """
+        upstream = self.upstreams.get(ws_route.url)
+        if upstream is None:
+            upstream = self.upstreams[ws_route.url] = Upstream(self, ws_route.url)
+            self.stats.upstreams += 1
+            connect(upstream)
+        stats = self.stats
+
+        def overflowed() -> None:
+            upstream.leave(ws_route)
+            _defer_close(ws_route, code=1013, reason="subscriber queue full")
+
+        pump = FramePump(lambda m: m, deliver or ws_route.send, maxsize=self.queue_size, overflow=self.overflow,
+                         on_overflow=overflowed, stats=stats.queues)
+        upstream.subscribers[ws_route] = pump.start()
+        stats.subscribers += 1
+        stats.peak_subscribers = max(stats.peak_subscribers, sum(len(u.subscribers) for u in self.upstreams.values()))
+        return upstream
+
+    def _forget(self, upstream: Upstream) -> None:
+        if self.upstreams.get(upstream.url) is upstream:
+            del self.upstreams[upstream.url]
+
@@ -0,0 +1,131 @@
+"""Pluggable JSON codecs for the Python proxy.
+
+orjson and msgspec are optional; get_codec("auto") picks the fastest one that is
+installed and falls back to the stdlib json module. Every codec keeps counters so
+a test can see how many frames failed to decode instead of those being silently
+forwarded.
+"""
+
+from __future__ import annotations
+import json
+import warnings
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional backend
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional backend
+    msgspec = None
+
+
+class DecodeError(ValueError):
+    """A frame could not be decoded by the active codec."""
+
+
+@dataclass
+class CodecStats:
+    decoded: int = 0
+    decode_errors: int = 0
+    encoded: int = 0
+
+
+class JSONCodec:
+    """stdlib json; also the base class for the optional backends."""
+
+    name = "json"
+    # Exceptions the backend raises for malformed input
+    errors: tuple[type[Exception], ...] = (ValueError,)
+
+    def __init__(self) -> None:
+        self.stats = CodecStats()
+
+    def _loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def _dumps(self, obj: Any) -> str:
+        # Compact, like orjson, msgspec and the page's JSON.stringify
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def decode(self, data: str | bytes) -> Any:
+        """Decode a frame.
+
+        Raises:
+            DecodeError: the frame is not valid JSON (counted in stats.decode_errors).
+        """
+        try:
+            obj = self._loads(data)
+        except self.errors as e:
+            self.stats.decode_errors += 1
+            raise DecodeError(str(e)) from e
+        self.stats.decoded += 1
+        return obj
+
+    def encode(self, obj: Any) -> str:
+        """Encode to text; str keeps the frame a text frame when sent back out."""
+        self.stats.encoded += 1
+        return self._dumps(obj)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.stats}>"
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def _loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def _dumps(self, obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+
+class MsgspecCodec(JSONCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.errors = (msgspec.DecodeError,)
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def _loads(self, data: str | bytes) -> Any:
+        return self._decoder.decode(data)
+
+    def _dumps(self, obj: Any) -> str:
+        return self._encoder.encode(obj).decode()
+
+
+def available_codecs() -> list[str]:
+    """Names of the codecs usable in this environment, fastest first."""
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """Build a fresh codec (with its own counters).
+
+    Args:
+        name: "auto", "orjson", "msgspec" or "json". A backend that is not
+            installed falls back to the stdlib codec with a warning.
+    """
+    if name == "auto":
+        name = available_codecs()[0]
+    if name == "orjson" and orjson is not None:
+        return OrjsonCodec()
+    if name == "msgspec" and msgspec is not None:
+        return MsgspecCodec()
+    if name not in ("json", "orjson", "msgspec"):
+        raise ValueError(f"unknown JSON codec {name!r}")
+    if name != "json":
+        warnings.warn(f"{name} is not installed, falling back to the stdlib json codec", stacklevel=2)
+    return JSONCodec()
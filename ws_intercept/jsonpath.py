@@ -0,0 +1,218 @@
+"""Compiled selectors for nested JSON fields.
+
+A selector is a dotted path with optional brackets, e.g.::
+
+    value
+    payload.value
+    messages[*].ts.tk.ba[0]
+    value|payload.value          # alternatives: the first one that matches wins
+
+``name`` descends into an object key, ``[n]`` into an array index and ``[*]``
+(or a bare ``*`` segment) into every element/value. compile_selector() turns the
+expression into a chain of closures once, so applying it only walks the path and
+costs O(matches) rather than O(document).
+
+SELECTOR_JS is the same compiler for in-page/worker scripts; it installs
+``globalThis.__ws_selector__.compile(expr)`` with the identical grammar.
+"""
+
+from __future__ import annotations
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable
+
+Step = tuple[str, Any]  # ("key", name) | ("index", n) | ("each", None)
+Visit = Callable[[Any, Callable[[Any], Any]], int]
+
+_SEGMENT = re.compile(r"([^\[\]]*)((?:\[(?:\d+|\*)\])*)")
+_BRACKET = re.compile(r"\[(\d+|\*)\]")
+
+
+def parse_selector(expr: str) -> list[list[Step]]:
+    """Parse an expression into its alternatives, each a list of steps.
+
+    Raises:
+        ValueError: the expression is malformed.
+    """
+    alternatives = []
+    for alt in expr.split("|"):
+        steps: list[Step] = []
+        for part in alt.strip().split("."):
+            m = _SEGMENT.fullmatch(part)
+            if m is None or not part:
+                raise ValueError(f"bad selector: {expr!r}")
+            name, brackets = m.groups()
+            if name:
+                steps.append(("each", None) if name == "*" else ("key", name))
+            for arg in _BRACKET.findall(brackets):
+                steps.append(("each", None) if arg == "*" else ("index", int(arg)))
+        alternatives.append(steps)
+    return alternatives
+
+
+def _compile(steps: list[Step]) -> Visit:
+    """Build visit(node, fn) -> number of slots rewritten with fn(old_value)."""
+    visit: Visit | None = None
+    for kind, arg in reversed(steps):
+        visit = _step(kind, arg, visit)
+    return visit
+
+
+def _step(kind: str, arg: Any, nxt: Visit | None) -> Visit:
+    if kind == "key":
+        def visit(node, fn):
+            if type(node) is not dict or arg not in node:
+                return 0
+            if nxt is not None:
+                return nxt(node[arg], fn)
+            node[arg] = fn(node[arg])
+            return 1
+    elif kind == "index":
+        def visit(node, fn):
+            if type(node) is not list or arg >= len(node):
+                return 0
+            if nxt is not None:
+                return nxt(node[arg], fn)
+            node[arg] = fn(node[arg])
+            return 1
+    else:
+        def visit(node, fn):
+            if type(node) is list:
+                keys = range(len(node))
+            elif type(node) is dict:
+                keys = list(node)
+            else:
+                return 0
+            if nxt is not None:
+                return sum(nxt(node[k], fn) for k in keys)
+            for k in keys:
+                node[k] = fn(node[k])
+            return len(keys)
+    return visit
+
+
+class Selector:
+    """A compiled selector expression; see the module docstring for the grammar."""
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        self.alternatives = parse_selector(expr)
+        self._visits = [_compile(steps) for steps in self.alternatives]
+        # Last key of every alternative: a frame containing none of them can be
+        # forwarded without decoding. None when some alternative ends without a key.
+        needles = []
+        for steps in self.alternatives:
+            keys = [arg for kind, arg in steps if kind == "key"]
+            needles.append(json.dumps(keys[-1]) if keys else None)
+        self.needles = None if None in needles else tuple(needles)
+
+    @property
+    def top_level_key(self) -> str | None:
+        """The key when the selector is a single plain top-level key (spliceable)."""
+        if len(self.alternatives) == 1 and len(self.alternatives[0]) == 1:
+            kind, arg = self.alternatives[0][0]
+            if kind == "key":
+                return arg
+        return None
+
+    def may_match(self, text: str) -> bool:
+        """Cheap pre-check on the raw frame; False means it cannot match."""
+        return self.needles is None or any(n in text for n in self.needles)
+
+    def apply(self, obj: Any, fn: Callable[[Any], Any]) -> int:
+        """Replace every match with fn(old_value), in place.
+
+        Returns:
+            Number of matches of the first alternative that matched at all.
+        """
+        for visit in self._visits:
+            n = visit(obj, fn)
+            if n:
+                return n
+        return 0
+
+    def values(self, obj: Any) -> list[Any]:
+        """Current values of all matches (for assertions and waiters)."""
+        out: list[Any] = []
+
+        def collect(v):
+            out.append(v)
+            return v
+
+        self.apply(obj, collect)
+        return out
+
+    def __repr__(self) -> str:
+        return f"Selector({self.expr!r})"
+
+
+@lru_cache(maxsize=256)
+def compile_selector(expr: str) -> Selector:
+    """Compile (and cache) a selector expression."""
+    return Selector(expr)
+
+
+SELECTOR_JS = r"""
+(() => {
+  if (globalThis.__ws_selector__) return;
+  const hasOwn = (o, k) => Object.prototype.hasOwnProperty.call(o, k);
+  const isObj = (o) => o !== null && typeof o === 'object' && !Array.isArray(o);
+
+  const parse = (expr) => expr.split('|').map((alt) => {
+    const steps = [];
+    for (const part of alt.trim().split('.')) {
+      const m = /^([^\[\]]*)((?:\[(?:\d+|\*)\])*)$/.exec(part);
+      if (!m || !part) throw new Error('bad selector: ' + expr);
+      if (m[1]) steps.push(m[1] === '*' ? ['each', null] : ['key', m[1]]);
+      for (const b of m[2].match(/\[(\d+|\*)\]/g) || []) {
+        const a = b.slice(1, -1);
+        steps.push(a === '*' ? ['each', null] : ['index', Number(a)]);
+      }
+    }
+    return steps;
+  });
+
+  // visit(node, fn) -> number of slots rewritten with fn(oldValue)
+  const step = (kind, arg, nxt) => {
+    const leaf = (c, k, fn) => { if (nxt) return nxt(c[k], fn); c[k] = fn(c[k]); return 1; };
+    if (kind === 'key') return (node, fn) => (isObj(node) && hasOwn(node, arg)) ? leaf(node, arg, fn) : 0;
+    if (kind === 'index') return (node, fn) => (Array.isArray(node) && arg < node.length) ? leaf(node, arg, fn) : 0;
+    return (node, fn) => {
+      let n = 0;
+      if (Array.isArray(node)) { for (let i = 0; i < node.length; i++) n += leaf(node, i, fn); }
+      else if (isObj(node)) { for (const k of Object.keys(node)) n += leaf(node, k, fn); }
+      return n;
+    };
+  };
+
+  const build = (expr) => {
+    const alternatives = parse(expr);
+    const visits = alternatives.map((steps) => steps.reduceRight((nxt, [kind, arg]) => step(kind, arg, nxt), null));
+    const needles = alternatives.map((steps) => {
+      const keys = steps.filter(([kind]) => kind === 'key');
+      return keys.length ? JSON.stringify(keys[keys.length - 1][1]) : null;
+    });
+    return {
+      expr,
+      alternatives,
+      needles: needles.includes(null) ? null : needles,
+      mayMatch(text) { return !this.needles || this.needles.some((n) => text.includes(n)); },
+      apply(root, fn) {
+        for (const visit of visits) { const n = visit(root, fn); if (n) return n; }
+        return 0;
+      },
+    };
+  };
+
+  const cache = new Map();
+  globalThis.__ws_selector__ = {
+    parse,
+    compile(expr) {
+      let sel = cache.get(expr);
+      if (!sel) { sel = build(expr); cache.set(expr, sel); }
+      return sel;
+    },
+  };
+})();
+"""
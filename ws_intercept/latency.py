@@ -0,0 +1,314 @@
+"""Per-frame latency instrumentation with HDR-style histograms.
+
+Frames are stamped at up to three points:
+
+    server send     "seq"/"sent" prefix added by the feed (loadgen stamp=1,
+                    or the demo ws_endpoint with ?stamp=1)
+    proxy           receive and forward times in the route_web_socket handler
+    page delivery   when the in-page runtime hands the frame to the app
+                    (LATENCY_JS, fed by __ws_intercept__.notifyDelivered)
+
+Stamps are joined on (seq, sent) and recorded per segment:
+
+    server_to_proxy   proxy receive - server send
+    proxy             proxy forward - proxy receive (our own processing)
+    proxy_to_page     page delivery - proxy forward
+    end_to_end        page delivery - server send
+
+Every segment is recorded per mode and per connection. Server and page clocks
+are both the host's wall clock, so the numbers are only meaningful with the
+server on the same machine.
+
+This module is also the pytest plugin behind the `ws_latency` fixture and the
+end-of-session report; the root conftest.py loads it once for every demo.
+"""
+
+from __future__ import annotations
+import re
+from typing import Any, Iterable, Iterator
+
+import pytest
+
+SEGMENTS = ("server_to_proxy", "proxy", "proxy_to_page", "end_to_end")
+
+_STAMP = re.compile(r'\{\s*"seq"\s*:\s*(\d+)\s*,\s*"sent"\s*:\s*([0-9.eE+-]+)')
+
+
+def parse_stamp(msg: str | bytes) -> tuple[int, float] | None:
+    """(seq, sent) from a stamped frame's prefix, without decoding the rest."""
+    if not isinstance(msg, str):
+        return None
+    m = _STAMP.match(msg)
+    return (int(m.group(1)), float(m.group(2))) if m else None
+
+
+class LatencyHistogram:
+    """Log-linear histogram of non-negative integer values (microseconds).
+
+    Values below 2**bits are exact; above that each power of two is split into
+    2**(bits - 1) buckets, so any value is known to within 2**-(bits - 1)
+    (0.8% with the default bits=8) at a fixed cost per record().
+    """
+
+    def __init__(self, bits: int = 8) -> None:
+        self.bits = bits
+        self._exact = 1 << bits
+        self._half = 1 << (bits - 1)
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: int | None = None
+        self.max: int | None = None
+
+    def _index(self, v: int) -> int:
+        if v < self._exact:
+            return v
+        shift = v.bit_length() - self.bits
+        return self._exact + (shift - 1) * self._half + ((v >> shift) - self._half)
+
+    def _value(self, idx: int) -> int:
+        """Midpoint of a bucket."""
+        if idx < self._exact:
+            return idx
+        k = idx - self._exact
+        shift = k // self._half + 1
+        low = (k % self._half + self._half) << shift
+        return low + ((1 << shift) >> 1)
+
+    def record(self, value: float, count: int = 1) -> None:
+        v = max(0, int(value))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.count += count
+        self.total += v * count
+        self.min = v if self.min is None else min(self.min, v)
+        self.max = v if self.max is None else max(self.max, v)
+
+    def merge(self, other: LatencyHistogram) -> None:
+        if other.bits != self.bits:
+            raise ValueError("cannot merge histograms of different precision")
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        for v in (other.min, other.max):
+            if v is not None:
+                self.min = v if self.min is None else min(self.min, v)
+                self.max = v if self.max is None else max(self.max, v)
+
+    def percentile(self, p: float) -> int | None:
+        """Value at percentile p (0-100), within the histogram's precision."""
+        if not self.count:
+            return None
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(max(self._value(idx), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+            "mean": None if self.mean is None else round(self.mean, 1),
+        }
+
+
+class LatencyStats:
+    """Histograms keyed by (segment, "mode" | "conn", mode name or connection id)."""
+
+    def __init__(self) -> None:
+        self.histograms: dict[tuple[str, str, Any], LatencyHistogram] = {}
+        self.evicted = 0   # proxied frames the page never reported, given up on
+
+    def record(self, segment: str, micros: float, *, mode: str, conn: int) -> None:
+        for key in ((segment, "mode", mode), (segment, "conn", conn)):
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = LatencyHistogram()
+            h.record(micros)
+
+    def merge(self, other: LatencyStats) -> None:
+        for key, h in other.histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                mine = self.histograms[key] = LatencyHistogram(h.bits)
+            mine.merge(h)
+        self.evicted += other.evicted
+
+    def by(self, segment: str, axis: str = "mode") -> dict[Any, LatencyHistogram]:
+        return {k[2]: h for k, h in self.histograms.items() if k[0] == segment and k[1] == axis}
+
+    def report(self) -> dict[str, Any]:
+        """{segment: {"mode": {...}, "conn": {...}}} of histogram summaries (µs)."""
+        out: dict[str, Any] = {}
+        for (segment, axis, name), h in sorted(self.histograms.items(), key=lambda kv: tuple(map(str, kv[0]))):
+            out.setdefault(segment, {}).setdefault(axis, {})[str(name)] = h.summary()
+        return out
+
+    def format(self, axis: str = "mode") -> list[str]:
+        """Report lines for a terminal, one per segment and mode (or connection)."""
+        lines = [f"{'segment':<16}{axis:<12}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (µs)"]
+        for segment in SEGMENTS:
+            for name, h in sorted(self.by(segment, axis).items(), key=lambda kv: str(kv[0])):
+                s = h.summary()
+                lines.append(f"{segment:<16}{str(name):<12}{s['count']:>8}{s['p50']:>9}{s['p90']:>9}{s['p99']:>9}{s['max']:>9}")
+        if self.evicted:
+            lines.append(f"{self.evicted} proxied frames were never reported by the page (dropped or conflated)")
+        return lines
+
+    def __bool__(self) -> bool:
+        return bool(self.histograms)
+
+
+# Page-side collector; install after ws_intercept.waiters.WAITERS_JS, whose
+# notifyDelivered it wraps.
+LATENCY_JS = r"""
+(() => {
+  const ctl = window.__ws_intercept__;
+  if (!ctl || ctl.latency) return;
+  const STAMP = /^\{\s*"seq"\s*:\s*(\d+)\s*,\s*"sent"\s*:\s*([0-9.eE+-]+)/;
+  const CAP = 100000;
+  const lat = ctl.latency = { buf: [], dropped: 0,
+    drain() { const out = this.buf; this.buf = []; const d = this.dropped; this.dropped = 0; return { stamps: out, dropped: d }; } };
+  const stampOf = (data) => {
+    if (typeof data === 'string') {
+      const m = STAMP.exec(data);
+      return m ? [Number(m[1]), m[2]] : null;
+    }
+    const src = data && (data.seq !== undefined ? data : data.payload);
+    return src && src.seq !== undefined && src.sent !== undefined ? [src.seq, String(src.sent)] : null;
+  };
+  const prev = ctl.notifyDelivered;
+  ctl.notifyDelivered = (data) => {
+    const s = stampOf(data);
+    if (s) {
+      const mode = (ctl.rule && ctl.rule.mode) || ctl.mode || 'untouched';
+      if (lat.buf.length < CAP) lat.buf.push([s[0], s[1], performance.timeOrigin + performance.now(), mode]);
+      else lat.dropped++;
+    }
+    if (prev) prev(data);
+  };
+})();
+"""
+
+
+class LatencyProbe:
+    """Joins proxy and page stamps for one page into LatencyStats.
+
+    The proxy calls on_receive()/on_forward() around each server -> page frame;
+    collect() drains the page's delivery stamps and records every segment.
+
+    Args:
+        page: the page to drain.
+        max_pending: proxied frames kept waiting for their page stamp; past
+            that the oldest are given up on (stats.evicted), so frames the
+            page never reports do not pile up over a long run.
+    """
+
+    def __init__(self, page=None, *, max_pending: int = 100_000) -> None:
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending!r}")
+        self.page = page
+        self.max_pending = max_pending
+        self.stats = LatencyStats()
+        self.unmatched_page = 0    # delivered frames the proxy never saw (fast path)
+        self.page_overflow = 0     # stamps the page dropped because its buffer was full
+        self._pending: dict[tuple[int, float], tuple[int, str, int, int]] = {}
+        self._next_conn = 1
+
+    def open_connection(self) -> int:
+        conn = self._next_conn
+        self._next_conn += 1
+        return conn
+
+    def on_forward(self, msg: str | bytes, *, conn: int, mode: str, t_recv_ns: int, t_fwd_ns: int) -> None:
+        """Proxy stamps of one frame (time.time_ns() at receive and at forward)."""
+        stamp = parse_stamp(msg)
+        if stamp is None:
+            return
+        sent_us = stamp[1] * 1e6
+        self.stats.record("server_to_proxy", t_recv_ns / 1e3 - sent_us, mode=mode, conn=conn)
+        self.stats.record("proxy", (t_fwd_ns - t_recv_ns) / 1e3, mode=mode, conn=conn)
+        pending = self._pending
+        pending[stamp] = (conn, mode, t_recv_ns, t_fwd_ns)
+        if len(pending) > self.max_pending:
+            del pending[next(iter(pending))]   # dicts keep insertion order: the oldest
+            self.stats.evicted += 1
+
+    def record_delivery(self, stamps: Iterable[list[Any]]) -> None:
+        """Page stamps: [seq, sent (as sent), delivered epoch ms, mode]."""
+        for seq, sent, delivered_ms, page_mode in stamps:
+            sent_s = float(sent)
+            delivered_us = delivered_ms * 1e3
+            proxied = self._pending.pop((int(seq), sent_s), None)
+            if proxied is None:
+                self.unmatched_page += 1
+                conn, mode = 0, page_mode
+            else:
+                conn, mode, _, t_fwd_ns = proxied
+                self.stats.record("proxy_to_page", delivered_us - t_fwd_ns / 1e3, mode=mode, conn=conn)
+            self.stats.record("end_to_end", delivered_us - sent_s * 1e6, mode=mode, conn=conn)
+
+    def collect(self) -> LatencyStats:
+        """Drain the page (if it is still open) and return the stats so far."""
+        if self.page is not None and not self.page.is_closed():
+            drained = self.page.evaluate(
+                "() => window.__ws_intercept__ && window.__ws_intercept__.latency"
+                " ? window.__ws_intercept__.latency.drain() : { stamps: [], dropped: 0 }"
+            )
+            self.page_overflow += drained["dropped"]
+            self.record_delivery(drained["stamps"])
+        return self.stats
+
+
+# pytest integration, registered once by the root conftest.py (pytest_plugins)
+
+# Session-wide aggregate behind the end-of-session report
+SESSION = LatencyStats()
+
+
+@pytest.fixture
+def ws_latency(request, page, pooled_context) -> Iterator[LatencyProbe]:
+    """Opt-in per-frame latency stamps for this test.
+
+    The feed has to stamp its frames: load the page with ?stamp=1 (or any
+    load-generator query). In demos with a proxy (a `ws_behavior` fixture)
+    every segment is recorded, otherwise only end_to_end. Results go into the
+    end-of-session report.
+    """
+    try:
+        behavior = request.getfixturevalue("ws_behavior")
+    except pytest.FixtureLookupError:
+        behavior = None
+    probe = LatencyProbe(page)
+    # Next to the demo's scripts: context and page init scripts run in no set order
+    script = (pooled_context.context if pooled_context else page).add_init_script(LATENCY_JS)
+    if behavior is not None:
+        behavior.latency = probe
+    yield probe
+    SESSION.merge(probe.collect())
+    if behavior is not None:
+        behavior.latency = None
+    if pooled_context is not None:
+        script.dispose()
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    """Print SESSION, if anything was measured."""
+    if not SESSION:
+        return
+    terminalreporter.write_sep("=", "websocket frame latency")
+    for line in SESSION.format("mode"):
+        terminalreporter.write_line(line)
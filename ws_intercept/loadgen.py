@@ -0,0 +1,208 @@
+"""Synthetic high-rate feeds for the demo ws_endpoint.
+
+The demo apps switch to this generator when the socket URL carries load
+parameters, e.g.::
+
+    ws://localhost:8000/ws?rate=20000&burst=100&shape=ticks&symbols=50&batch=5&size=512
+
+Every message is encoded once, up front, into a ring of `frames` distinct
+strings, shared by every socket with the same profile, and the send loop only
+cycles through that ring. At 10k+ msgs/s the interceptor under test, not the
+generator, is what shows up in a profile.
+Sending is paced against an absolute schedule, so late wake-ups are made up
+instead of drifting.
+
+With ``stamp=1`` each message is prefixed with ``"seq"`` (running index) and
+``"sent"`` (time.time() at send) so the receiver can measure latency and gaps;
+that prefix is the only per-message formatting.
+"""
+
+from __future__ import annotations
+import asyncio
+import functools
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Mapping
+
+SHAPES = ("value", "ticks")
+
+# Real-looking names first, then SYM<n>
+_SYMBOLS = ["US100Cash", "GOLDm#", "AUDNZD#", "EURUSD#", "GBPUSD#", "USDJPY#", "BTCUSD", "US30Cash"]
+_EPOCH = datetime(2025, 8, 27, 12, 0, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """Shape and pace of a synthetic feed.
+
+    Args:
+        rate: messages per second; math.inf (``rate=max``) for no pacing.
+        burst: messages sent back-to-back per scheduling tick.
+        size: pad every message to at least this many bytes.
+        symbols: distinct symbols the feed cycles through.
+        shape: "value" for the demo's {"ts", "value"} objects, "ticks" for the
+            {"messages": [{"ts": {"tk": ...}}]} envelope (see pwa/tmp.py).
+        batch: ticks per envelope message (shape="ticks").
+        frames: distinct messages pre-encoded into the ring.
+        duration: stop after this many seconds; 0 streams until the client leaves.
+        stamp: prefix every message with "seq" and "sent" (epoch seconds).
+    """
+
+    rate: float = 0.5
+    burst: int = 1
+    size: int = 0
+    symbols: int = 1
+    shape: str = "value"
+    batch: int = 1
+    frames: int = 1024
+    duration: float = 0.0
+    stamp: bool = False
+
+    def __post_init__(self) -> None:
+        if not self.rate > 0:
+            raise ValueError("rate must be positive")
+        if self.shape not in SHAPES:
+            raise ValueError(f"shape must be one of {', '.join(SHAPES)}")
+        for name in ("burst", "symbols", "batch", "frames"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        if self.size < 0 or self.duration < 0:
+            raise ValueError("size and duration must not be negative")
+
+    @classmethod
+    def from_query(cls, params: Mapping[str, str]) -> LoadProfile | None:
+        """Build a profile from query parameters; None when there are none
+        (``stamp`` on its own only asks the demo feed for stamps).
+
+        Raises:
+            ValueError: a parameter is malformed or out of range.
+        """
+        known = {f.name for f in fields(cls)}
+        given = {k: v for k, v in params.items() if k in known}
+        if not given.keys() - {"stamp"}:
+            return None
+        kwargs: dict[str, Any] = {}
+        for name, raw in given.items():
+            try:
+                if name == "shape":
+                    kwargs[name] = raw
+                elif name == "stamp":
+                    kwargs[name] = flag(raw)
+                elif name in ("rate", "duration"):
+                    kwargs[name] = math.inf if raw == "max" else float(raw)
+                else:
+                    kwargs[name] = int(raw)
+            except ValueError:
+                raise ValueError(f"bad value for {name}: {raw!r}") from None
+        return cls(**kwargs)
+
+
+def flag(raw: str | None) -> bool:
+    """Truthiness of a query-string flag ("1", "true", "yes"...)."""
+    return raw is not None and raw.lower() not in ("", "0", "false", "no")
+
+
+def symbol_names(n: int) -> list[str]:
+    return _SYMBOLS[:n] + [f"SYM{i}" for i in range(len(_SYMBOLS), n)]
+
+
+def _iso(t: float) -> str:
+    return (_EPOCH + timedelta(seconds=t)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _tc(rng: random.Random, t: float) -> dict[str, Any]:
+    return {"id": {"msb": str(rng.getrandbits(63)), "lsb": str(rng.getrandbits(63))}, "tt": _iso(t)}
+
+
+def build_messages(profile: LoadProfile, seed: int = 0) -> list[dict[str, Any]]:
+    """The ring of messages as objects (before padding and encoding)."""
+    rng = random.Random(seed)
+    names = symbol_names(profile.symbols)
+    period = 1 / profile.rate if math.isfinite(profile.rate) else 1e-4
+    out = []
+    k = 0  # running tick index, so symbols rotate across envelopes too
+    for i in range(profile.frames):
+        t = i * period
+        if profile.shape == "value":
+            msg: dict[str, Any] = {"ts": _EPOCH.timestamp() + t, "value": math.sin(2 * math.pi * i / profile.frames)}
+            if profile.symbols > 1:
+                msg["sl"] = names[i % profile.symbols]
+        else:
+            ticks = []
+            for _ in range(profile.batch):
+                j = k % profile.symbols
+                mid = (100.0 + 10 * j) * (1 + 0.01 * math.sin(2 * math.pi * k / profile.frames))
+                tk = {"sl": names[j], "ba": [round(mid * 0.9999, 5), round(mid * 1.0001, 5)], "tt": _iso(t)}
+                ticks.append({"ts": {"tk": tk, "tc": _tc(rng, t), "sid": 50}})
+                k += 1
+            msg = {"messages": ticks, "tc": _tc(rng, t)}
+        out.append(msg)
+    return out
+
+
+def encode_frames(profile: LoadProfile, seed: int = 0) -> list[str]:
+    """Pre-encode the ring, padding each message to profile.size bytes."""
+    frames = []
+    for msg in build_messages(profile, seed):
+        text = json.dumps(msg, separators=(",", ":"))
+        if len(text) < profile.size:
+            msg["pad"] = "x" * max(profile.size - len(text) - len(',"pad":""'), 0)
+            text = json.dumps(msg, separators=(",", ":"))
+        frames.append(text)
+    return frames
+
+
+@functools.lru_cache(maxsize=16)
+def ring(profile: LoadProfile) -> tuple[str, ...]:
+    """encode_frames(profile), built once: sockets with the same profile share it."""
+    return tuple(encode_frames(profile))
+
+
+async def stream(send: Callable[[str], Awaitable[Any]], profile: LoadProfile) -> int:
+    """Send the pre-encoded ring through `send` at profile.rate; returns messages sent.
+
+    Args:
+        send: e.g. the endpoint's WebSocket.send_text.
+    """
+    frames = ring(profile)
+    n, i, sent = len(frames), 0, 0
+    loop = asyncio.get_running_loop()
+    interval = profile.burst / profile.rate
+    next_at = start = loop.time()
+    end = start + profile.duration if profile.duration else math.inf
+    while next_at < end:
+        for _ in range(profile.burst):
+            frame = frames[i]
+            if profile.stamp:
+                frame = '{"seq":%d,"sent":%.6f,%s' % (sent, time.time(), frame[1:])
+            await send(frame)
+            sent += 1
+            i = i + 1 if i + 1 < n else 0
+        next_at = next_at + interval if interval else loop.time()
+        delay = next_at - loop.time()
+        # Behind schedule: only yield, and catch up on the next ticks
+        await asyncio.sleep(delay if delay > 0 else 0)
+    return sent
+
+
+async def demo_feed(send: Callable[[str], Awaitable[Any]], stamp: bool = False) -> None:
+    """The demo apps' default feed: a sine value every 2 s, until the client leaves.
+
+    Frames are encoded like WebSocket.send_json; with stamp=True they carry
+    "seq" and "sent" first, as stream() does.
+    """
+    t0 = time.time()
+    seq = 0
+    while True:
+        t = time.time() - t0
+        value = 1.0 * math.sin(t * 2 * 3.1415 / 5)
+        frame = {"ts": time.time(), "value": value}
+        if stamp:
+            frame = {"seq": seq, "sent": time.time(), **frame}
+            seq += 1
+        await send(json.dumps(frame, separators=(",", ":"), ensure_ascii=False))
+        await asyncio.sleep(2)
@@ -0,0 +1,411 @@
+"""Declarative rules for page -> server frames, in the proxy and in the page.
+
+Outbound traffic used to be either forwarded as is or handed to an arbitrary
+outbound_hook. Rules cover the common cases as JSON, so the same list runs in
+the Python proxy (OutboundEngine) and in the in-page patches (OUTBOUND_JS):
+
+    drop       the frame is not sent
+    rewrite    overwrite what selectors match ("set"), then go on to the
+               next rules; fields missing from the frame are not added
+    delay      sent delay_ms later
+    dedupe     dropped when it repeats the last frame sent for its key
+               (within window_ms, or ever when window_ms is None)
+    coalesce   the first frame of a burst opens a window_ms window; later
+               frames with the same key replace it; the last one is sent when
+               the window closes
+    repeat     sent `times` times, interval_ms apart (simulates chatty clients)
+
+A rule applies to frames matching all of its conditions: "match" maps
+selectors (ws_intercept.jsonpath) to the value their first match must equal
+(JSON frames only), and "pattern" is a regex searched in text frames (keep it
+to syntax Python and JavaScript share). "key" lists the selectors whose values
+group frames for dedupe and coalesce; without it, all matching frames form
+one group. Rules are tried in order: the first matching one decides, except
+rewrite, which passes the rewritten frame on.
+
+Tab churn, for example: coalesce subscribe/unsubscribe per symbol so that
+only the final state of a burst reaches the backend::
+
+    make_outbound_rule("coalesce", pattern='"(un)?subscribe"', key=["symbol"], window_ms=200)
+"""
+
+from __future__ import annotations
+import functools
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Union
+
+from ws_intercept.jsonpath import compile_selector
+from ws_intercept.timers import TimerQueue
+
+Msg = Union[str, bytes]
+OutboundAction = Literal["drop", "rewrite", "delay", "dedupe", "coalesce", "repeat"]
+OUTBOUND_ACTIONS = ("drop", "rewrite", "delay", "dedupe", "coalesce", "repeat")
+
+# Encodes like JSON.stringify, so both engines send a rewritten frame byte for byte alike
+_compact = functools.partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
+
+def _ms(name: str, value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{name} must be a non-negative number of milliseconds, got {value!r}")
+    return value
+
+
+def make_outbound_rule(
+    action: OutboundAction,
+    *,
+    match: dict[str, Any] | None = None,
+    pattern: str | None = None,
+    set: dict[str, Any] | None = None,
+    delay_ms: float = 0,
+    key: list[str] | None = None,
+    window_ms: float | None = None,
+    times: int = 2,
+    interval_ms: float = 0,
+) -> dict[str, Any]:
+    """Validate one rule and return it as both engines read it (see the module docstring)."""
+    if action not in OUTBOUND_ACTIONS:
+        raise ValueError(f"bad outbound action {action!r}; expected one of {', '.join(OUTBOUND_ACTIONS)}")
+    rule: dict[str, Any] = {"action": action}
+    if match:
+        for expr in match:
+            compile_selector(expr)
+        rule["match"] = dict(match)
+    if pattern is not None:
+        re.compile(pattern)
+        rule["pattern"] = pattern
+    if action == "rewrite":
+        if not set:
+            raise ValueError("rewrite needs set={selector: value}")
+        for expr in set:
+            compile_selector(expr)
+        rule["set"] = dict(set)
+    elif action == "delay":
+        rule["delay_ms"] = _ms("delay_ms", delay_ms)
+    elif action in ("dedupe", "coalesce"):
+        for expr in key or ():
+            compile_selector(expr)
+        rule["key"] = list(key or ())
+        if action == "coalesce" and window_ms is None:
+            raise ValueError("coalesce needs window_ms")
+        rule["window_ms"] = None if window_ms is None else _ms("window_ms", window_ms)
+    elif action == "repeat":
+        if isinstance(times, bool) or not isinstance(times, int) or times < 1:
+            raise ValueError(f"times must be an integer >= 1, got {times!r}")
+        rule.update(times=times, interval_ms=_ms("interval_ms", interval_ms))
+    return rule
+
+
+@dataclass
+class OutboundStats:
+    received: int = 0    # frames the page sent
+    sent: int = 0        # frames that reached the server (repeats included)
+    dropped: int = 0
+    rewritten: int = 0
+    delayed: int = 0
+    deduped: int = 0
+    coalesced: int = 0   # frames replaced by a later one of their burst
+
+
+class _Frame:
+    """One outbound frame, decoded at most once."""
+
+    __slots__ = ("msg", "_obj", "_decoded", "loads")
+
+    def __init__(self, msg: Msg, loads: Callable[[Any], Any]) -> None:
+        self.msg = msg
+        self.loads = loads
+        self._obj = None
+        self._decoded = False
+
+    @property
+    def obj(self) -> Any:
+        if not self._decoded:
+            self._decoded = True
+            if isinstance(self.msg, str):
+                try:
+                    self._obj = self.loads(self.msg)
+                except ValueError:
+                    pass
+        return self._obj
+
+    def first(self, expr: str) -> list[Any]:
+        """[first match of expr] or []."""
+        obj = self.obj
+        return compile_selector(expr).values(obj)[:1] if obj is not None else []
+
+
+class OutboundEngine:
+    """Runs the outbound rules for one connection.
+
+    Args:
+        rules: returns the current rule list; read on every frame, so changes
+            apply to open sockets. A new list object resets dedupe/coalesce state.
+        send: forwards a frame to the server.
+        timers: queue for delayed, coalesced and repeated frames.
+        stats: counters to update (shared across connections if passed in).
+        loads, dumps: JSON codec for match, rewrite and key; dumps should be
+            compact, like the page's JSON.stringify.
+    """
+
+    def __init__(
+        self,
+        rules: Callable[[], list[dict[str, Any]]],
+        send: Callable[[Msg], None],
+        *,
+        timers: TimerQueue | None = None,
+        stats: OutboundStats | None = None,
+        loads: Callable[[Any], Any] = json.loads,
+        dumps: Callable[[Any], str] = _compact,
+    ) -> None:
+        self._rules = rules
+        self._send = send
+        self.timers = timers if timers is not None else TimerQueue()
+        self.stats = stats if stats is not None else OutboundStats()
+        self._loads = loads
+        self._dumps = dumps
+        self._for: list | None = None                      # rule list the state below belongs to
+        self._last: dict[tuple, tuple[Msg, float]] = {}    # dedupe: group -> (frame, time sent)
+        self._pending: dict[tuple, Msg] = {}               # coalesce: group -> latest frame
+        self.closed = False
+
+    def push(self, msg: Msg) -> None:
+        """Handle one frame from the page."""
+        self.stats.received += 1
+        rules = self._rules()
+        if not rules:
+            self._forward(msg)
+            return
+        if rules is not self._for:
+            # Bursts already held back are still sent when their window closes
+            self._for = rules
+            self._last = {}
+            self._pending = {}
+        frame = _Frame(msg, self._loads)
+        for i, rule in enumerate(rules):
+            if not self._matches(rule, frame):
+                continue
+            action = rule["action"]
+            if action == "rewrite":
+                obj = frame.obj
+                if obj is None:
+                    continue
+                changed = False
+
+                def put(old: Any, new: Any) -> Any:
+                    nonlocal changed
+                    changed = changed or type(old) is not type(new) or old != new
+                    return new
+
+                for expr, value in rule["set"].items():
+                    compile_selector(expr).apply(obj, functools.partial(put, new=value))
+                if changed:   # else the frame goes on byte for byte
+                    frame = _Frame(self._dumps(obj), self._loads)
+                    self.stats.rewritten += 1
+                continue
+            self._apply(i, rule, frame)
+            return
+        self._forward(frame.msg)
+
+    def _matches(self, rule: dict[str, Any], frame: _Frame) -> bool:
+        pattern = rule.get("pattern")
+        if pattern is not None and not (isinstance(frame.msg, str) and re.search(pattern, frame.msg)):
+            return False
+        for expr, want in (rule.get("match") or {}).items():
+            if frame.first(expr) != [want]:
+                return False
+        return True
+
+    def _apply(self, i: int, rule: dict[str, Any], frame: _Frame) -> None:
+        action, msg, stats = rule["action"], frame.msg, self.stats
+        if action == "drop":
+            stats.dropped += 1
+        elif action == "delay":
+            stats.delayed += 1
+            self.timers.call_later(rule["delay_ms"] / 1000, self._forward, msg)
+        elif action == "repeat":
+            for k in range(rule["times"]):
+                if k and rule["interval_ms"]:
+                    self.timers.call_later(k * rule["interval_ms"] / 1000, self._forward, msg)
+                else:
+                    self._forward(msg)
+        else:
+            group = (i, *(json.dumps(frame.first(expr)) for expr in rule["key"]))
+            window = rule["window_ms"]
+            if action == "dedupe":
+                now = self.timers.time()
+                last = self._last.get(group)
+                if last is not None and last[0] == msg and (window is None or now - last[1] < window / 1000):
+                    stats.deduped += 1
+                    return
+                self._last[group] = (msg, now)
+                self._forward(msg)
+            else:
+                if group in self._pending:
+                    stats.coalesced += 1
+                else:
+                    self.timers.call_later(window / 1000, self._flush, self._pending, group)
+                self._pending[group] = msg
+
+    def _flush(self, pending: dict[tuple, Msg], group: tuple) -> None:
+        msg = pending.pop(group, None)
+        if msg is not None:
+            self._forward(msg)
+
+    def _forward(self, msg: Msg) -> None:
+        if self.closed:
+            return
+        self.stats.sent += 1
+        self._send(msg)
+
+    def close(self) -> None:
+        """The socket is gone: frames still held back are dropped."""
+        self.closed = True
+
+
+# In-page twin of OutboundEngine: globalThis.__ws_outbound__.attach(send, rules)
+# returns a send(msg) for one socket; rules() is read on every frame. Needs
+# SELECTOR_JS. Counters (same names as OutboundStats) are in __ws_outbound__.stats.
+OUTBOUND_JS = r"""
+(() => {
+  if (globalThis.__ws_outbound__) return;
+  const stats = { received: 0, sent: 0, dropped: 0, rewritten: 0, delayed: 0, deduped: 0, coalesced: 0 };
+  const regexps = new Map();
+  const regexp = (p) => {
+    let re = regexps.get(p);
+    if (!re) { re = new RegExp(p); regexps.set(p, re); }
+    return re;
+  };
+  const now = () => (typeof performance !== 'undefined' ? performance.now() : Date.now());
+
+  // One frame, decoded at most once
+  const frame = (msg) => {
+    let obj, decoded = false;
+    const f = {
+      msg,
+      obj() {
+        if (!decoded) {
+          decoded = true;
+          if (typeof msg === 'string') { try { obj = JSON.parse(msg); } catch (_) { obj = undefined; } }
+        }
+        return obj;
+      },
+      first(expr) {
+        const o = f.obj();
+        if (o === undefined || o === null || typeof o !== 'object') return [];
+        let out = [];
+        globalThis.__ws_selector__.compile(expr).apply(o, (v) => { if (!out.length) out = [v]; return v; });
+        return out;
+      },
+    };
+    return f;
+  };
+  const matches = (rule, f) => {
+    if (rule.pattern != null && !(typeof f.msg === 'string' && regexp(rule.pattern).test(f.msg))) return false;
+    for (const [expr, want] of Object.entries(rule.match || {})) {
+      if (JSON.stringify(f.first(expr)) !== JSON.stringify([want])) return false;
+    }
+    return true;
+  };
+
+  const attach = (send, rules) => {
+    let owner = null;
+    let ownerKey = null;
+    let last = new Map();
+    let pending = new Map();
+    const forward = (msg) => {
+      stats.sent++;
+      try { send(msg); } catch (_) {}   // socket closed meanwhile
+    };
+    const apply = (i, rule, f) => {
+      const msg = f.msg;
+      switch (rule.action) {
+        case 'drop':
+          stats.dropped++;
+          return;
+        case 'delay':
+          stats.delayed++;
+          setTimeout(() => forward(msg), rule.delay_ms);
+          return;
+        case 'repeat':
+          for (let k = 0; k < rule.times; k++) {
+            if (k && rule.interval_ms) setTimeout(() => forward(msg), k * rule.interval_ms);
+            else forward(msg);
+          }
+          return;
+      }
+      const group = JSON.stringify([i, ...(rule.key || []).map((expr) => JSON.stringify(f.first(expr)))]);
+      const window = rule.window_ms;
+      if (rule.action === 'dedupe') {
+        const t = now();
+        const prev = last.get(group);
+        if (prev && prev[0] === msg && (window == null || t - prev[1] < window)) {
+          stats.deduped++;
+          return;
+        }
+        last.set(group, [msg, t]);
+        forward(msg);
+        return;
+      }
+      // coalesce
+      if (pending.has(group)) {
+        stats.coalesced++;
+      } else {
+        const gen = pending;
+        setTimeout(() => {
+          if (!gen.has(group)) return;
+          const m = gen.get(group);
+          gen.delete(group);
+          forward(m);
+        }, window);
+      }
+      pending.set(group, msg);
+    };
+    return (msg) => {
+      stats.received++;
+      const list = rules();
+      if (list !== owner) {
+        // Every config push brings a new array: only different rules reset
+        // the dedupe windows and pending coalesces
+        owner = list;
+        const key = JSON.stringify(list);
+        if (key !== ownerKey) {
+          ownerKey = key;
+          last = new Map();
+          pending = new Map();
+        }
+      }
+      if (!list || !list.length) { forward(msg); return; }
+      let f = frame(msg);
+      for (let i = 0; i < list.length; i++) {
+        const rule = list[i];
+        if (!matches(rule, f)) continue;
+        if (rule.action === 'rewrite') {
+          const o = f.obj();
+          if (o === undefined || o === null || typeof o !== 'object') continue;
+          let changed = false;
+          for (const [expr, value] of Object.entries(rule.set)) {
+            globalThis.__ws_selector__.compile(expr).apply(o, (old) => {
+              changed = changed || JSON.stringify(old) !== JSON.stringify(value);
+              return value;
+            });
+          }
+          if (changed) {
+            f = frame(JSON.stringify(o));
+            stats.rewritten++;
+          }
+          continue;
+        }
+        apply(i, rule, f);
+        return;
+      }
+      forward(f.msg);
+    };
+  };
+
+  globalThis.__ws_outbound__ = { attach, stats };
+})();
+"""
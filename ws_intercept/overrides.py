@@ -0,0 +1,132 @@
+"""Per-symbol bid/ask rules for the worker-side tick patch.
+
+The worker patch of ws_intercept.runtime (the pwa strategy) looks every tick's
+symbol up in one table, a single Map hit per tick node, so overriding 500
+symbols costs the same per tick as overriding one. Each symbol has its own
+rule and generator state:
+
+    untouched    listed but passed through
+    constant     ba = [bid, ask]
+    increasing   mid starts at `start` and moves by `step` per tick; the
+    decreasing   spread is `spread`, or the tick's own when None
+    spread       ba = mid -/+ spread / 2, around `mid` or the tick's own mid
+
+SymbolOverrides is the Python side, used like WSBehavior: change rules with
+set_mode() at any time and every listener (the pwa fixtures) gets the new
+table.
+"""
+
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Literal
+
+OverrideMode = Literal["untouched", "constant", "increasing", "decreasing", "spread"]
+OVERRIDE_MODES = ("untouched", "constant", "increasing", "decreasing", "spread")
+
+
+def _number(name: str, value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number, got {value!r}")
+    return value
+
+
+def make_rule(
+    mode: OverrideMode,
+    *,
+    ba: tuple[float, float] | list[float] | None = None,
+    start: float | None = None,
+    step: float = 1.0,
+    spread: float | None = None,
+    mid: float | None = None,
+    epoch: int = 0,
+) -> dict[str, Any]:
+    """Validate one symbol's rule and return it as the worker reads it."""
+    if mode not in OVERRIDE_MODES:
+        raise ValueError(f"bad override mode {mode!r}; expected one of {', '.join(OVERRIDE_MODES)}")
+    rule: dict[str, Any] = {"mode": mode, "epoch": epoch}
+    if mode == "constant":
+        if ba is None or len(ba) != 2:
+            raise ValueError("constant needs ba=[bid, ask]")
+        rule["ba"] = [_number("bid", ba[0]), _number("ask", ba[1])]
+    elif mode in ("increasing", "decreasing"):
+        if start is None:
+            raise ValueError(f"{mode} needs start")
+        rule.update(start=_number("start", start), step=_number("step", step),
+                    spread=None if spread is None else _number("spread", spread))
+    elif mode == "spread":
+        if spread is None:
+            raise ValueError("spread needs spread")
+        rule.update(spread=_number("spread", spread), mid=None if mid is None else _number("mid", mid))
+    return rule
+
+
+def normalize_worker(worker: dict[str, Any]) -> dict[str, Any]:
+    """{"symbols": {symbol: rule}} from either that or the single-symbol
+    {"symbol": ..., "forcedBa": [bid, ask]} form; rules are validated."""
+    if "symbols" in worker:
+        symbols = worker["symbols"]
+        if not isinstance(symbols, dict):
+            raise ValueError('worker "symbols" must map symbol -> rule')
+        return {"symbols": {str(sym): make_rule(**rule) for sym, rule in symbols.items()}}
+    symbol, forced = worker.get("symbol"), worker.get("forcedBa", ())
+    if not isinstance(symbol, str) or len(forced) != 2:
+        raise ValueError('worker needs {"symbols": {...}} or {"symbol": str, "forcedBa": [bid, ask]}')
+    return {"symbols": {symbol: make_rule("constant", ba=forced)}}
+
+
+@dataclass
+class SymbolOverrides:
+    """Mutable per-symbol rules for one test; see set_mode()."""
+
+    rules: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    # Called with config() whenever the table changes (wired up by the fixtures)
+    _listeners: list[Callable[[dict[str, Any]], None]] = field(default_factory=list, repr=False)
+
+    def set_mode(
+        self,
+        symbols: str | Iterable[str],
+        mode: OverrideMode,
+        *,
+        ba: tuple[float, float] | list[float] | None = None,
+        start: float | None = None,
+        step: float = 1.0,
+        spread: float | None = None,
+        mid: float | None = None,
+    ) -> None:
+        """Give one symbol (or many, in one update) a rule.
+
+        Args:
+            symbols: a symbol, e.g. "US100Cash", or an iterable of them.
+            mode: "untouched", "constant", "increasing", "decreasing" or "spread".
+            ba: [bid, ask] for constant.
+            start: first mid-price for increasing/decreasing; setting a rule
+                again re-seeds the series.
+            step: mid-price change per tick for increasing/decreasing.
+            spread: ask - bid; None keeps each tick's own spread (not for "spread").
+            mid: fixed mid-price for "spread"; None uses each tick's own mid.
+        """
+        names = [symbols] if isinstance(symbols, str) else list(symbols)
+        for name in names:
+            epoch = self.rules[name]["epoch"] + 1 if name in self.rules else 0
+            self.rules[name] = make_rule(mode, ba=ba, start=start, step=step, spread=spread, mid=mid, epoch=epoch)
+        self._publish()
+
+    def clear(self, symbols: str | Iterable[str] | None = None) -> None:
+        """Drop the rules of some symbols, or of all of them."""
+        if symbols is None:
+            self.rules.clear()
+        else:
+            for name in [symbols] if isinstance(symbols, str) else symbols:
+                self.rules.pop(name, None)
+        self._publish()
+
+    def config(self) -> dict[str, Any]:
+        """The table as the runtime's "worker" option."""
+        return {"symbols": {name: dict(rule) for name, rule in self.rules.items()}}
+
+    def _publish(self) -> None:
+        config = self.config()
+        for listener in self._listeners:
+            listener(config)
@@ -0,0 +1,157 @@
+"""Targeted patching of one top-level JSON number without parsing the frame.
+
+The proxy only ever rewrites a single field, so instead of json.loads/dumps on
+every frame we look for the key's literal text, check that it really is a
+top-level key, and splice the new number over the old one. Frames that do not
+contain the key come back as the very same string object. The frame is
+scanned once, up to the key, so the work done is proportional to how far into
+the frame the key sits, not to the frame size.
+
+Keys are matched on their literal encoding (json.dumps(key)); a frame that
+spells the key with escape sequences is treated as not containing it.
+"""
+
+from __future__ import annotations
+import json
+import re
+from typing import Any, Callable
+
+# One JSON string token, written as an unrolled loop so sre does not backtrack
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_COLON = re.compile(r"\s*:\s*")
+_NUMBER = re.compile(r"\s*:\s*(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)(?=\s*[,}])")
+
+
+def find_number(text: str, key: str) -> tuple[int, int] | None:
+    """Locate the number token of a top-level key.
+
+    Returns:
+        (start, end) of the number token, None if the key is not a top-level key
+        of this frame.
+
+    Raises:
+        ValueError: the key is there but its value is not a plain number, so it
+            cannot be spliced.
+    """
+    needle = json.dumps(key)
+    # One forward scan: the structure between occurrences of the key is walked
+    # once, carrying the nesting depth, so a key repeated at depth stays linear
+    pos = depth = 0
+    i = text.find(needle)
+    while i != -1:
+        if pos < i:
+            walked = _walk(text, pos, i)
+            if walked is None:
+                return None   # an unterminated string: not JSON
+            pos, d = walked
+            depth += d
+        if pos > i:
+            # Inside a string: look again after it
+            i = text.find(needle, pos)
+            continue
+        end = pos = i + len(needle)   # the needle is a whole string token
+        if depth == 1 and _before(text, i) in ("{", ","):
+            m = _NUMBER.match(text, end)
+            if m is not None:
+                return m.span(1)
+            if _COLON.match(text, end):
+                raise ValueError(f"{key!r} does not hold a number")
+        i = text.find(needle, end)
+    return None
+
+
+def _walk(text: str, start: int, stop: int) -> tuple[int, int] | None:
+    """Walk the structure from `start` (outside any string) to `stop`.
+
+    Returns:
+        (pos, depth change): pos is `stop`, or the end of the string `stop`
+        falls into; None if that string is unterminated.
+    """
+    segment = text[start:stop]
+    if "\\" not in segment:
+        # Without escapes every quote delimits a string, and str.split does it in C
+        parts = segment.split('"')
+        if len(parts) % 2:
+            return stop, _depth("".join(parts[::2]))
+        # Odd number of quotes: stop is inside the string the last one opens
+        q = stop - len(parts[-1]) - 1
+        m = _STRING.match(text, q)
+        return (m.end(), _depth("".join(parts[:-1:2]))) if m else None
+    depth = 0
+    while start < stop:
+        q = text.find('"', start, stop)
+        if q == -1:
+            return stop, depth + _depth(text[start:stop])
+        depth += _depth(text[start:q])
+        m = _STRING.match(text, q)
+        if m is None:
+            return None
+        start = m.end()
+    return start, depth
+
+
+def _depth(structure: str) -> int:
+    """Change in nesting depth over text with the strings taken out."""
+    return structure.count("{") + structure.count("[") - structure.count("}") - structure.count("]")
+
+
+def _before(text: str, i: int) -> str:
+    """The last non-whitespace character before index i ("" at the start)."""
+    i -= 1
+    while i >= 0 and text[i] in " \t\r\n":
+        i -= 1
+    return text[i] if i >= 0 else ""
+
+
+def splice_number(text: str, key: str, value: Any) -> str:
+    """Replace the number of a top-level key; text without the key is returned as is.
+
+    Raises:
+        ValueError: the key is there but does not hold a plain number.
+    """
+    span = find_number(text, key)
+    if span is None:
+        return text
+    return text[: span[0]] + json.dumps(value) + text[span[1]:]
+
+
+def patch_number(
+    text: str,
+    key: str,
+    value: Callable[[], Any],
+    *,
+    loads: Callable[[str], Any] = json.loads,
+    dumps: Callable[[Any], str] = json.dumps,
+) -> str:
+    """Set a top-level field, splicing when possible and falling back to strict JSON.
+
+    Args:
+        text: the raw frame.
+        key: top-level field to overwrite.
+        value: called once, only when the frame is actually patched, so stateful
+            series (increasing/decreasing) do not advance on frames without the key.
+        loads, dumps: codec for the fallback, used when the current value is not a
+            plain number (e.g. a string or null).
+
+    Returns:
+        The patched frame, or ``text`` itself when there was nothing to patch.
+        Frames that are not valid JSON are returned unchanged.
+    """
+    try:
+        span = find_number(text, key)
+    except ValueError:
+        return _patch_strict(text, key, value, loads, dumps)
+    if span is None:
+        return text
+    return text[: span[0]] + json.dumps(value()) + text[span[1]:]
+
+
+def _patch_strict(text, key, value, loads, dumps) -> str:
+    try:
+        obj = loads(text)
+    except ValueError:
+        return text
+    if not isinstance(obj, dict) or key not in obj:
+        return text
+    obj[key] = value()
+    return dumps(obj)
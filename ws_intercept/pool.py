@@ -0,0 +1,311 @@
+"""Pre-instrumented browser contexts, reused across tests.
+
+Every test normally gets a fresh context and page, and re-registers the
+interceptor on it. A ContextPool creates its contexts ahead of time, runs the
+interceptor setup once per context (context.route_web_socket /
+context.add_init_script, so it covers every page the context opens) and keeps a
+page open in each. Between tests a context is reset instead of rebuilt:
+
+- its pages are closed (page-level routes and init scripts go with them)
+- cookies and permissions are cleared
+- storage of every origin its pages visited is cleared (localStorage,
+  IndexedDB, caches, service workers; on Chromium through CDP, elsewhere only
+  web storage of the origins still open)
+- the `reset` callback runs, then a fresh page is opened for the next test
+
+Contexts that fail to reset are dropped and replaced; `max_uses` recycles them
+periodically as well. PoolStats keeps the cold start cost (context + setup +
+page) next to what a pooled test pays (acquire + reset), and the conftests print
+the saving per test at the end of the session.
+
+Enable it with `pytest --ws-pool N`. Pooled contexts are not created through
+pytest-playwright's new_context, so --tracing/--video/--screenshot do not apply
+to them. Without the pool, `context` is pytest-playwright's own new_context()
+and every one of those options works as usual.
+
+This module is also the pytest plugin that provides the option and the
+fixtures; the root conftest.py loads it once for every demo (see below).
+"""
+
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+from urllib.parse import urlsplit
+
+import pytest
+
+
+@dataclass
+class PooledContext:
+    """A leased context, its pre-opened page and whatever setup() returned."""
+
+    context: Any
+    page: Any = None
+    state: Any = None
+    uses: int = 0
+    origins: set[str] = field(default_factory=set)
+
+
+class PoolStats:
+    """Cold start vs pooled cost, in seconds per test."""
+
+    def __init__(self) -> None:
+        self.cold: list[float] = []      # new_context + setup + new_page
+        self.acquire: list[float] = []   # waiting for a context at test start
+        self.reset: list[float] = []     # resetting it after the test
+        self.recycled = 0
+
+    def merge(self, other: PoolStats) -> None:
+        self.cold += other.cold
+        self.acquire += other.acquire
+        self.reset += other.reset
+        self.recycled += other.recycled
+
+    @staticmethod
+    def _mean(values: list[float]) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+    @property
+    def tests(self) -> int:
+        return len(self.acquire)
+
+    def summary(self) -> dict[str, Any]:
+        cold, pooled = self._mean(self.cold), self._mean(self.acquire) + self._mean(self.reset)
+        return {
+            "contexts": len(self.cold),
+            "tests": self.tests,
+            "recycled": self.recycled,
+            "cold_ms": round(cold * 1e3, 1),
+            "pooled_ms": round(pooled * 1e3, 1),
+            "saved_per_test_ms": round((cold - pooled) * 1e3, 1),
+            # Every test would have paid the cold start; the pool paid it once per context
+            "saved_total_s": round(cold * self.tests - sum(self.cold) - sum(self.acquire) - sum(self.reset), 2)
+            if self.tests else 0.0,
+        }
+
+    def format(self) -> list[str]:
+        s = self.summary()
+        return [
+            f"{s['tests']} tests on {s['contexts']} contexts ({s['recycled']} recycled)",
+            f"cold start {s['cold_ms']} ms, pooled {s['pooled_ms']} ms per test: "
+            f"saved {s['saved_per_test_ms']} ms per test, {s['saved_total_s']} s in total",
+        ]
+
+    def __bool__(self) -> bool:
+        return bool(self.acquire)
+
+
+def _origin(url: str) -> str | None:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") else None
+
+
+class ContextPool:
+    """Contexts of one browser, set up once and reset between leases.
+
+    Args:
+        browser: a launched Playwright Browser.
+        size: contexts created up front.
+        context_args: keyword arguments for browser.new_context().
+        setup: registers the interceptor on a new context; its return value
+            is kept as PooledContext.state (e.g. the WSBehavior driving it).
+        reset: called with the PooledContext after its pages are closed, to
+            put per-test state back.
+        max_uses: replace a context after this many leases (None: never).
+        stats: where timings go (a fresh PoolStats by default).
+    """
+
+    def __init__(
+        self,
+        browser: Any,
+        size: int = 2,
+        *,
+        context_args: dict[str, Any] | None = None,
+        setup: Callable[[Any], Any] | None = None,
+        reset: Callable[[PooledContext], None] | None = None,
+        max_uses: int | None = None,
+        stats: PoolStats | None = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.browser = browser
+        self.size = size
+        self.context_args = dict(context_args or {})
+        self.setup = setup
+        self.reset_hook = reset
+        self.max_uses = max_uses
+        self.stats = stats if stats is not None else PoolStats()
+        self._idle: list[PooledContext] = []
+        self._leased: list[PooledContext] = []
+        for _ in range(size):
+            self._idle.append(self._create())
+
+    def _create(self) -> PooledContext:
+        t0 = time.perf_counter()
+        context = self.browser.new_context(**self.context_args)
+        lease = PooledContext(context)
+        context.on("page", lambda page: self._track(lease, page))
+        if self.setup is not None:
+            lease.state = self.setup(context)
+        lease.page = context.new_page()
+        self.stats.cold.append(time.perf_counter() - t0)
+        return lease
+
+    @staticmethod
+    def _track(lease: PooledContext, page: Any) -> None:
+        def navigated(frame: Any) -> None:
+            origin = _origin(frame.url)
+            if origin:
+                lease.origins.add(origin)
+
+        page.on("framenavigated", navigated)
+
+    def acquire(self) -> PooledContext:
+        """A set-up context with a fresh page; creates one if all are leased."""
+        if self._idle:
+            t0 = time.perf_counter()
+            lease = self._idle.pop()
+            self.stats.acquire.append(time.perf_counter() - t0)
+        else:
+            lease = self._create()  # counted as a cold start
+            self.stats.acquire.append(0.0)
+        lease.uses += 1
+        self._leased.append(lease)
+        return lease
+
+    def release(self, lease: PooledContext) -> None:
+        """Reset the context for the next test, or replace it if that fails."""
+        t0 = time.perf_counter()
+        self._leased.remove(lease)
+        recycle = self.max_uses is not None and lease.uses >= self.max_uses
+        if not recycle:
+            try:
+                self._reset(lease)
+            except Exception:
+                recycle = True
+        if not recycle:
+            self._idle.append(lease)
+            self.stats.reset.append(time.perf_counter() - t0)
+            return
+        self.stats.recycled += 1
+        try:
+            lease.context.close()
+        except Exception:
+            pass
+        self.stats.reset.append(time.perf_counter() - t0)
+        # Replacements are cold starts of their own; extra contexts made by
+        # acquire() when the pool ran dry are not replaced
+        if len(self._idle) + len(self._leased) < self.size:
+            self._idle.append(self._create())
+
+    def _reset(self, lease: PooledContext) -> None:
+        context = lease.context
+        self._clear_storage(lease)
+        for page in list(context.pages):
+            page.close()
+        context.clear_cookies()
+        context.clear_permissions()
+        if self.reset_hook is not None:
+            self.reset_hook(lease)
+        lease.origins.clear()
+        lease.page = context.new_page()
+
+    def _clear_storage(self, lease: PooledContext) -> None:
+        pages = lease.context.pages
+        if not lease.origins or not pages:
+            return
+        if self.browser.browser_type.name == "chromium":
+            cdp = lease.context.new_cdp_session(pages[0])
+            for origin in sorted(lease.origins):
+                cdp.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            cdp.detach()
+            return
+        for page in pages:
+            page.evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (_) {} }")
+
+    def close(self) -> None:
+        for lease in self._idle + self._leased:
+            lease.context.close()
+        self._idle.clear()
+        self._leased.clear()
+
+    def __enter__(self) -> ContextPool:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# pytest integration. The root conftest.py registers this module as a plugin
+# (pytest_plugins), so --ws-pool and the fixtures below exist once however many
+# demos a run collects. `context` and `page` replace pytest-playwright's and
+# fall back to its new_context() when the pool is off; each demo conftest
+# overrides `context_pool` with its own setup (open_pool).
+
+POOL_SESSION = PoolStats()
+
+
+def pytest_addoption(parser) -> None:
+    parser.addoption(
+        "--ws-pool",
+        type=int,
+        default=0,
+        metavar="N",
+        help="reuse N pre-instrumented browser contexts across tests (0: a fresh context per test)",
+    )
+
+
+def open_pool(request, setup: Callable[[Any], Any], reset: Callable[[PooledContext], None] | None = None) -> ContextPool | None:
+    """A ContextPool sized by --ws-pool, or None when pooling is off."""
+    size = request.config.getoption("--ws-pool", 0)
+    if not size:
+        return None
+    return ContextPool(
+        request.getfixturevalue("browser"),
+        size,
+        context_args=request.getfixturevalue("browser_context_args"),
+        setup=setup,
+        reset=reset,
+        stats=POOL_SESSION,
+    )
+
+
+@pytest.fixture(scope="session")
+def context_pool() -> ContextPool | None:
+    """No pool; demo conftests override this with open_pool() and their setup."""
+    return None
+
+
+@pytest.fixture
+def pooled_context(context_pool: ContextPool | None) -> Iterator[PooledContext | None]:
+    """This test's lease from the pool, or None when pooling is off."""
+    if context_pool is None:
+        yield None
+        return
+    lease = context_pool.acquire()
+    yield lease
+    context_pool.release(lease)
+
+
+@pytest.fixture
+def context(request, pooled_context: PooledContext | None):
+    """The pooled context, else a fresh one like pytest-playwright's."""
+    if pooled_context is None:
+        return request.getfixturevalue("new_context")()
+    return pooled_context.context
+
+
+@pytest.fixture
+def page(context, pooled_context: PooledContext | None):
+    """The pooled context's pre-opened page, else a new page."""
+    return pooled_context.page if pooled_context is not None else context.new_page()
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    """Print POOL_SESSION, if the pool was used."""
+    if not POOL_SESSION:
+        return
+    terminalreporter.write_sep("=", "browser context pool")
+    for line in POOL_SESSION.format():
+        terminalreporter.write_line(line)
@@ -0,0 +1,140 @@
+"""Bounded per-connection frame queues for the asyncio router.
+
+The sync router forwards every frame from inside Playwright's message
+callback, so a slow hook holds up the dispatcher and every other socket with
+it. A FramePump takes the frame off the callback instead (put() never
+blocks), and a task per socket and direction runs the transform and sends the
+result. Transforms may be coroutines: while one socket awaits its hook, the
+others keep flowing.
+
+Playwright cannot pause a WebSocket, so backpressure has to end somewhere.
+When a queue holds `maxsize` frames, `overflow` decides:
+
+    close         the pump stops and on_overflow runs (the router closes the
+                  socket with 1013 "try again later", as an overloaded server
+                  would)
+    drop_oldest   the oldest queued frame is discarded (conflation)
+    drop_newest   the incoming frame is discarded
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal, Union
+
+Msg = Union[str, bytes]
+Overflow = Literal["close", "drop_oldest", "drop_newest"]
+
+OVERFLOW_POLICIES = ("close", "drop_oldest", "drop_newest")
+
+
+@dataclass
+class PumpStats:
+    received: int = 0
+    sent: int = 0
+    dropped: int = 0        # discarded on overflow
+    overflows: int = 0      # times a queue was found full
+    errors: int = 0         # transforms or sends that raised; their frame is lost
+    peak_queued: int = 0
+
+
+class FramePump:
+    """Queue and forward one direction of one socket.
+
+    Args:
+        transform: applied to each frame; may return an awaitable.
+        send: forwards the transformed frame.
+        maxsize: frames queued before `overflow` applies.
+        overflow: "close", "drop_oldest" or "drop_newest" (see the module docstring).
+        on_overflow: called once when the "close" policy trips.
+        stats: counters to update (shared across pumps if passed in).
+    """
+
+    def __init__(
+        self,
+        transform: Callable[[Msg], Msg | Awaitable[Msg]],
+        send: Callable[[Msg], Any],
+        *,
+        maxsize: int = 1024,
+        overflow: Overflow = "close",
+        on_overflow: Callable[[], Any] | None = None,
+        stats: PumpStats | None = None,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize!r}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, got {overflow!r}")
+        self._transform = transform
+        self._send = send
+        self.overflow = overflow
+        self._on_overflow = on_overflow
+        self.stats = stats if stats is not None else PumpStats()
+        self.queue: asyncio.Queue[Msg] = asyncio.Queue(maxsize)
+        self.error: BaseException | None = None   # the last transform or send error
+        self.closed = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> FramePump:
+        """Start forwarding (on the running loop)."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def put(self, msg: Msg) -> None:
+        """Queue a frame; never blocks, so it is safe in Playwright callbacks."""
+        if self.closed:
+            return
+        stats = self.stats
+        stats.received += 1
+        q = self.queue
+        if q.full():
+            stats.overflows += 1
+            if self.overflow == "drop_newest":
+                stats.dropped += 1
+                return
+            if self.overflow == "drop_oldest":
+                q.get_nowait()
+                q.task_done()
+                stats.dropped += 1
+            else:
+                stats.dropped += q.qsize() + 1
+                self.close()
+                if self._on_overflow is not None:
+                    self._on_overflow()
+                return
+        q.put_nowait(msg)
+        stats.peak_queued = max(stats.peak_queued, q.qsize())
+
+    async def _run(self) -> None:
+        q, stats = self.queue, self.stats
+        while True:
+            msg = await q.get()
+            try:
+                out = self._transform(msg)
+                if inspect.isawaitable(out):
+                    out = await out
+                if self.closed:
+                    return
+                self._send(out)
+                stats.sent += 1
+            except Exception as exc:  # a broken hook or a gone socket loses its frame, not the pump
+                stats.errors += 1
+                self.error = exc
+            finally:
+                q.task_done()
+
+    async def drain(self) -> None:
+        """Wait until every queued frame has been forwarded (or the pump stopped)."""
+        if self._task is None or self._task.done():
+            return
+        join = asyncio.ensure_future(self.queue.join())
+        try:
+            await asyncio.wait([join, self._task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            join.cancel()
+
+    def close(self) -> None:
+        """Stop forwarding; queued frames are discarded."""
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
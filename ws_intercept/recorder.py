@@ -0,0 +1,246 @@
+"""Append-only binary log of intercepted WebSocket frames.
+
+Layout: an 8-byte file header followed by records, each a fixed 20-byte header
+and a length-prefixed body::
+
+    header  b"WSREC" version:u8 reserved:u16
+    record  length:u32 kind:u8 flags:u8 reserved:u16 conn:u32 t_ns:i64 body[length]
+
+kind is OPEN (body = URL), INBOUND (server -> page), OUTBOUND (page -> server) or
+CLOSE. t_ns comes from time.monotonic_ns(). flags bit 0 marks a binary payload,
+bits 1-2 the compression.
+
+Compression is a delta against the previous payload of the same connection and
+direction: that payload is used as the zlib (or zstd) dictionary, so a feed that
+repeats the same JSON shape with new numbers shrinks to a few bytes per frame. A
+frame is stored raw whenever compressing would not make it smaller.
+
+FrameLog reads a log through mmap, one record at a time, so multi-gigabyte
+captures are never loaded whole.
+"""
+
+from __future__ import annotations
+import mmap
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, Literal, Union
+
+try:
+    import zstandard
+except ImportError:  # optional backend
+    zstandard = None
+
+Msg = Union[str, bytes]
+Compression = Literal["none", "zlib", "zstd"]
+
+MAGIC = b"WSREC"
+VERSION = 1
+_FILE_HEADER = struct.Struct("<5sBH")
+_RECORD = struct.Struct("<IBBHIq")
+
+OPEN, INBOUND, OUTBOUND, CLOSE = 0, 1, 2, 3
+
+_BINARY = 0x01
+_CODEC_SHIFT = 1
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+@dataclass(frozen=True)
+class Frame:
+    kind: int          # OPEN / INBOUND / OUTBOUND / CLOSE
+    conn: int          # connection id, unique within the log
+    t_ns: int          # time.monotonic_ns() when recorded
+    url: str           # URL of the connection
+    payload: Msg       # str for text frames, bytes for binary ones ("" for OPEN/CLOSE)
+
+    @property
+    def direction(self) -> str:
+        return {INBOUND: "inbound", OUTBOUND: "outbound"}.get(self.kind, "")
+
+
+def _compress(codec: int, data: bytes, prev: bytes | None, level: int) -> bytes:
+    if codec == 1:
+        c = zlib.compressobj(level, zdict=prev) if prev else zlib.compressobj(level)
+        return c.compress(data) + c.flush()
+    d = zstandard.ZstdCompressionDict(prev, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if prev else None
+    return zstandard.ZstdCompressor(level=level, dict_data=d).compress(data)
+
+
+def _decompress(codec: int, data: bytes, prev: bytes | None) -> bytes:
+    if codec == 1:
+        d = zlib.decompressobj(zdict=prev) if prev else zlib.decompressobj()
+        return d.decompress(data) + d.flush()
+    if zstandard is None:
+        raise RuntimeError("this log uses zstd compression; install the zstandard package to read it")
+    d = zstandard.ZstdCompressionDict(prev, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if prev else None
+    return zstandard.ZstdDecompressor(dict_data=d).decompress(data)
+
+
+class FrameRecorder:
+    """Appends frames to a log file.
+
+    Args:
+        path: log file; created if missing, appended to otherwise.
+        compression: "none", "zlib" or "zstd" (needs the zstandard package).
+        level: compression level passed to the backend.
+    """
+
+    def __init__(self, path: str | os.PathLike, compression: Compression = "zlib", level: int = 6) -> None:
+        if compression not in _CODECS:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package")
+        self.path = os.fspath(path)
+        self.compression = compression
+        self.level = level
+        self.frames = 0
+        self.bytes_in = 0       # payload bytes handed to record()
+        self.bytes_out = 0      # bytes written, headers included
+        self._codec = _CODECS[compression]
+        self._prev: dict[tuple[int, int], bytes] = {}
+
+        self._next_conn = 1
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with FrameLog(self.path) as log:
+                self._next_conn = max(log.urls, default=0) + 1
+            self._f = open(self.path, "ab")
+        else:
+            self._f = open(self.path, "ab")
+            self._f.write(_FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+    def _write(self, kind: int, conn: int, body: bytes, flags: int = 0, t_ns: int | None = None) -> None:
+        if t_ns is None:
+            t_ns = time.monotonic_ns()
+        self._f.write(_RECORD.pack(len(body), kind, flags, 0, conn, t_ns))
+        self._f.write(body)
+        self.bytes_out += _RECORD.size + len(body)
+
+    def open_connection(self, url: str, *, t_ns: int | None = None) -> int:
+        """Start a connection and return its id."""
+        conn = self._next_conn
+        self._next_conn += 1
+        self._write(OPEN, conn, url.encode(), t_ns=t_ns)
+        return conn
+
+    def record(
+        self,
+        conn: int,
+        direction: Literal["inbound", "outbound"],
+        payload: Msg,
+        *,
+        t_ns: int | None = None,
+    ) -> None:
+        """Append one frame exactly as it crossed the wire.
+
+        t_ns defaults to now; pass it to write synthetic or imported sessions.
+        """
+        kind = INBOUND if direction == "inbound" else OUTBOUND
+        flags = 0
+        if isinstance(payload, str):
+            data = payload.encode()
+        else:
+            data = bytes(payload)
+            flags |= _BINARY
+        self.frames += 1
+        self.bytes_in += len(data)
+
+        body = data
+        if self._codec:
+            key = (conn, kind)
+            packed = _compress(self._codec, data, self._prev.get(key), self.level)
+            self._prev[key] = data
+            if len(packed) < len(data):
+                body = packed
+                flags |= self._codec << _CODEC_SHIFT
+        self._write(kind, conn, body, flags, t_ns)
+
+    def close_connection(self, conn: int, *, t_ns: int | None = None) -> None:
+        self._write(CLOSE, conn, b"", t_ns=t_ns)
+        self._prev.pop((conn, INBOUND), None)
+        self._prev.pop((conn, OUTBOUND), None)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self) -> FrameRecorder:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FrameLog:
+    """Reads a log written by FrameRecorder through mmap.
+
+    Iterating yields Frame objects in recording order. Only the record being
+    decoded (and the previous payload per stream, for deltas) is held in memory.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = os.fspath(path)
+        self._f = open(self.path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = _FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a frame log")
+        if version != VERSION:
+            raise ValueError(f"{self.path}: unsupported frame log version {version}")
+        self._urls: dict[int, str] | None = None
+
+    @property
+    def urls(self) -> dict[int, str]:
+        """Connection id -> URL; only headers and OPEN bodies are touched."""
+        if self._urls is None:
+            urls = {}
+            for kind, _, conn, _, start, end in self._records():
+                if kind == OPEN:
+                    urls[conn] = self._mm[start:end].decode()
+            self._urls = urls
+        return self._urls
+
+    def _records(self) -> Iterator[tuple[int, int, int, int, int, int]]:
+        mm, pos, size = self._mm, _FILE_HEADER.size, len(self._mm)
+        while pos + _RECORD.size <= size:
+            length, kind, flags, _, conn, t_ns = _RECORD.unpack_from(mm, pos)
+            start = pos + _RECORD.size
+            end = start + length
+            if end > size:
+                break  # torn tail of a log that is still being written
+            yield kind, flags, conn, t_ns, start, end
+            pos = end
+
+    def __iter__(self) -> Iterator[Frame]:
+        urls: dict[int, str] = {}
+        prev: dict[tuple[int, int], bytes] = {}
+        for kind, flags, conn, t_ns, start, end in self._records():
+            body = self._mm[start:end]
+            if kind == OPEN:
+                urls[conn] = body.decode()
+                yield Frame(kind, conn, t_ns, urls[conn], "")
+                continue
+            if kind == CLOSE:
+                yield Frame(kind, conn, t_ns, urls.get(conn, ""), "")
+                continue
+            codec = flags >> _CODEC_SHIFT
+            key = (conn, kind)
+            data = _decompress(codec, body, prev.get(key)) if codec else body
+            prev[key] = data
+            payload = data if flags & _BINARY else data.decode()
+            yield Frame(kind, conn, t_ns, urls.get(conn, ""), payload)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self) -> FrameLog:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,198 @@
+"""Serve a recorded session straight from a WebSocketRoute, without a backend.
+
+A Replay is attached as (or from) a route_web_socket handler and never calls
+connect_to_server(): the inbound frames of one recorded connection are sent to
+the page on the original schedule divided by `speed`. speed=math.inf sends them
+as fast as the page takes them, yielding to the event loop every `burst` frames.
+
+With triggers=True the recorded client messages become gates: playback stops at
+each one until the page sends something, then continues with the timing
+relative to that point. This keeps request/response style feeds in order
+however long the page takes to get there.
+
+Frames are streamed from the log (see ws_intercept.recorder), so a session of
+any length replays in constant memory.
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+import math
+import os
+from typing import Any, Callable, Iterator, Union
+
+from ws_intercept.recorder import CLOSE, INBOUND, OUTBOUND, Frame, FrameLog
+from ws_intercept.timers import TimerQueue
+
+Msg = Union[str, bytes]
+
+
+def close_route(ws_route, **kwargs: Any) -> None:
+    """Close a page-side route from a loop callback, without waiting for it.
+
+    The sync API's WebSocketRoute.close() blocks on the dispatcher, which is the
+    very loop message and timer callbacks run on. Its wrapped implementation,
+    `_impl_obj` (the only private Playwright attribute this package touches), has
+    a close() coroutine, which is scheduled instead. Async-API routes have no
+    wrapper and are closed as they are.
+
+    Args:
+        kwargs: code= and reason= for close().
+    """
+    impl = getattr(ws_route, "_impl_obj", ws_route)
+    result = impl.close(**kwargs)
+    if inspect.isawaitable(result):
+        asyncio.ensure_future(result)
+
+
+class Replay:
+    """A recorded connection, ready to be played into routed sockets.
+
+    Args:
+        path: frame log written by FrameRecorder.
+        speed: time compression factor; math.inf for no pacing at all.
+        conn: connection id to play; defaults to the first one whose URL
+            contains `url` (or simply the first one).
+        url: substring used to pick the connection when `conn` is not given.
+        triggers: wait for a page message at every recorded client message.
+        close_at_end: close the page socket once the recording is exhausted.
+        burst: frames sent per loop iteration at speed=math.inf.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        speed: float = 1.0,
+        conn: int | None = None,
+        url: str | None = None,
+        triggers: bool = False,
+        close_at_end: bool = False,
+        burst: int = 1000,
+    ) -> None:
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.path = os.fspath(path)
+        self.speed = speed
+        self.triggers = triggers
+        self.close_at_end = close_at_end
+        self.burst = burst
+        with FrameLog(self.path) as log:
+            urls = log.urls
+        if conn is None:
+            conn = next((c for c, u in urls.items() if url is None or url in u), None)
+        if conn not in urls:
+            raise ValueError(f"{self.path} has no connection matching {conn if url is None else url!r}")
+        self.conn = conn
+        self.url = urls[conn]
+        self.timers = TimerQueue()
+        self.players: list[_Player] = []
+
+    def frames(self) -> Iterator[Frame]:
+        """Frames of the selected connection, streamed from the log."""
+        with FrameLog(self.path) as log:
+            for f in log:
+                if f.conn == self.conn:
+                    yield f
+
+    def play(self, ws_route, transform: Callable[[Msg], Msg] | None = None) -> _Player:
+        """Start playing into a routed socket (call from the route handler).
+
+        Args:
+            ws_route: the page-side WebSocketRoute; connect_to_server() must not
+                have been called.
+            transform: applied to each frame before it is sent (e.g. mode patching).
+        """
+        player = _Player(self, ws_route, transform)
+        self.players.append(player)
+        ws_route.on_message(player.on_client)
+        ws_route.on_close(player.on_close)
+        player.start()
+        return player
+
+    def __call__(self, ws_route) -> None:
+        """Use the Replay itself as a route_web_socket handler."""
+        self.play(ws_route)
+
+
+class _Player:
+    """Plays one Replay into one routed socket."""
+
+    def __init__(self, replay: Replay, ws_route, transform: Callable[[Msg], Msg] | None) -> None:
+        self.replay = replay
+        self.ws_route = ws_route
+        self.transform = transform
+        self.sent = 0
+        self.client_messages = 0
+        self.done = False
+        self._frames = replay.frames()
+        self._timers = replay.timers
+        self._base = 0.0           # loop time that corresponds to _t0
+        self._t0: int | None = None
+        self._waiting = False      # parked on a recorded client message
+
+    def start(self) -> None:
+        self._base = self._timers.time()
+        self._pump()
+
+    def _send(self, payload: Msg) -> None:
+        self.ws_route.send(self.transform(payload) if self.transform else payload)
+        self.sent += 1
+
+    def _pump(self) -> None:
+        replay = self.replay
+        burst = 0
+        for f in self._frames:
+            if self.done:
+                return
+            if self._t0 is None:
+                self._t0 = f.t_ns
+            if f.kind == OUTBOUND:
+                if replay.triggers:
+                    self._t0 = f.t_ns
+                    self._waiting = True
+                    return
+                continue
+            if f.kind == CLOSE:
+                break
+            if f.kind != INBOUND:
+                continue
+            if math.isinf(replay.speed):
+                self._send(f.payload)
+                burst += 1
+                if burst >= replay.burst:
+                    self._timers.call_later(0, self._pump)
+                    return
+                continue
+            due = self._base + (f.t_ns - self._t0) / 1e9 / replay.speed
+            if due > self._timers.time():
+                self._timers.call_at(due, self._fire, f.payload)
+                return
+            self._send(f.payload)
+        self._finish()
+
+    def _fire(self, payload: Msg) -> None:
+        if self.done:
+            return
+        self._send(payload)
+        self._pump()
+
+    def _finish(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        self._frames.close()
+        if self.replay.close_at_end:
+            close_route(self.ws_route)
+
+    def on_client(self, message: Msg) -> None:
+        """Page -> server messages go nowhere; with triggers they resume playback."""
+        self.client_messages += 1
+        if self._waiting:
+            self._waiting = False
+            self._base = self._timers.time()
+            self._pump()
+
+    def on_close(self, code: Any = None, reason: Any = None) -> None:
+        self.done = True
+        self._frames.close()
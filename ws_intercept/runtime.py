@@ -0,0 +1,649 @@
+"""The in-page interception runtime, bundled once and configured with JSON.
+
+One engine for the init-script demos (shared_worker, its standalone
+test_wss.py and pwa). It can:
+
+- wrap message delivery of page WebSockets and SharedWorker ports, rewriting
+  a selector (ws_intercept.jsonpath) by mode: untouched, constant, increasing,
+  decreasing ("page" feature)
+- bootstrap SharedWorkers with a MessagePort.postMessage patch that rewrites
+  bid/ask of the symbols in an override table inside the worker ("worker"
+  feature, the pwa approach; see ws_intercept.overrides)
+- record traffic into a bounded in-page ring buffer, every frame or every
+  Nth ("sample", "frame_buffer"), drained in batches by ws_intercept.framelog
+- log traffic to the console ("log")
+
+Binary frames (ArrayBuffers) are patched in place when "binary" describes
+their layout (ws_intercept.binarycodec). Page sends and port posts go through
+the "outbound" rules (ws_intercept.outbound).
+
+The code is built once per process into a minified bundle (SELECTOR_JS +
+BINARY_JS + OUTBOUND_JS + RUNTIME_JS + WAITERS_JS), and render() prepends the
+per-test config as one JSON assignment instead of re-templating the code.
+Rendered scripts are cached by config, so every page with the same settings is
+handed the same string.
+
+Tests keep steering the runtime through ``window.__ws_intercept__`` (mode,
+constant, start/step/current, selector, worker).
+"""
+
+from __future__ import annotations
+import json
+import re
+from functools import lru_cache
+from typing import Any
+
+from ws_intercept.binarycodec import BINARY_JS, BinaryCodec
+from ws_intercept.jsonpath import SELECTOR_JS, compile_selector
+from ws_intercept.outbound import OUTBOUND_JS, make_outbound_rule
+from ws_intercept.overrides import normalize_worker
+from ws_intercept.waiters import WAITERS_JS
+
+MODES = ("untouched", "constant", "increasing", "decreasing")
+
+DEFAULTS: dict[str, Any] = {
+    "mode": "untouched",
+    "constant": 0.4,
+    "start": 0.0,
+    "step": 0.1,
+    "selector": "value|payload.value",
+    "page": True,        # wrap page WebSocket / SharedWorker port delivery
+    "binary": None,      # spec() of a ws_intercept.binarycodec codec: patch binary frames too
+    "outbound": [],      # rules for page sends and port posts (ws_intercept.outbound)
+    "worker": None,      # per-symbol bid/ask rules applied inside SharedWorkers (ws_intercept.overrides)
+    "sample": 0,         # record every Nth frame for ws_intercept.framelog (0: off, 1: all)
+    "frame_buffer": 4096,  # frames kept until drained; the oldest are overwritten
+    "log": False,        # console.log sends, posts and (patched) receives
+}
+
+RUNTIME_JS = r"""
+(() => {
+  try {
+    const boot = globalThis.__ws_intercept_config__ || {};
+    const cfg = window.__ws_intercept__ = window.__ws_intercept__ || {};
+    for (const [k, v] of Object.entries(boot)) if (!(k in cfg)) cfg[k] = v;
+    if (cfg.current === undefined) cfg.current = cfg.start;
+    if (cfg.version === undefined) cfg.version = 0;
+    const log = (...args) => { if (cfg.log) try { console.log(...args); } catch (_) {} };
+
+    // Frame records for ws_intercept.framelog: a ring of the latest
+    // frame_buffer sampled frames, drained in batches. seen counts every
+    // frame, recorded the sampled ones, dropped those overwritten undrained.
+    const ring = { buf: [], head: 0, size: 0, seen: 0, recorded: 0, dropped: 0 };
+    const record = (dir, url, data) => {
+      const n = ++ring.seen;
+      const every = cfg.sample | 0;
+      if (every <= 0 || n % every) return;
+      // A new frame_buffer takes effect once the ring is empty
+      if (!ring.size) ring.buf.length = Math.max(1, cfg.frame_buffer | 0);
+      const cap = ring.buf.length;
+      if (ring.size === cap) {
+        ring.head = (ring.head + 1) % cap;
+        ring.size--;
+        ring.dropped++;
+      }
+      ring.buf[(ring.head + ring.size) % cap] = { seq: n, t: performance.now(), dir, url, data };
+      ring.size++;
+      ring.recorded++;
+    };
+    // Oldest first, at most max records (all when max <= 0)
+    cfg.drainFrames = (max) => {
+      const take = max > 0 ? Math.min(max, ring.size) : ring.size;
+      const cap = ring.buf.length;
+      const frames = new Array(take);
+      for (let i = 0; i < take; i++) {
+        const j = (ring.head + i) % cap;
+        frames[i] = ring.buf[j];
+        ring.buf[j] = undefined;
+      }
+      ring.head = take === ring.size ? 0 : (ring.head + take) % cap;
+      ring.size -= take;
+      return { frames, pending: ring.size, seen: ring.seen, recorded: ring.recorded, dropped: ring.dropped };
+    };
+    const trace = (dir, tag, url, data) => {
+      record(dir, url, data);
+      log(tag, data);
+    };
+
+    // Versioned config updates (ws_intercept.channel). An update sets all of
+    // its fields in one step, so every frame sees either the old or the new
+    // config, and older versions are ignored.
+    cfg.applyConfig = (u) => {
+      if (!u || !(u.version > cfg.version)) return false;
+      const c = u.config || {};
+      Object.assign(cfg, c);
+      if ('start' in c && !('current' in c)) cfg.current = c.start;
+      cfg.version = u.version;
+      return true;
+    };
+    if (window.__ws_intercept_pending__) cfg.applyConfig(window.__ws_intercept_pending__);
+
+    // Pages and their bootstrapped SharedWorkers share a BroadcastChannel:
+    // updates go out on it, workers say hello and acknowledge each version.
+    const realm = Math.random().toString(36).slice(2);
+    const bus = typeof BroadcastChannel === 'function' ? new BroadcastChannel('__ws_intercept__') : null;
+    const workers = new Map();   // this page's workers -> version they run
+    const ackWaiters = new Set();
+    if (bus) {
+      bus.onmessage = (ev) => {
+        const m = ev.data;
+        if (!m) return;
+        if (m.type === 'config') {
+          cfg.applyConfig(m);
+          return;
+        }
+        if (m.owner !== realm) return;
+        workers.set(m.realm, Math.max(workers.get(m.realm) || 0, m.version));
+        if (m.type === 'hello' && m.version < cfg.version) {
+          // Started from a config that has been replaced since
+          bus.postMessage({ type: 'config', version: cfg.version, config: { worker: cfg.worker } });
+        }
+        for (const w of [...ackWaiters]) w.check();
+      };
+    }
+    // Apply an update here, broadcast it, and resolve with the number of this
+    // page's workers once they all run it (timeout <= 0: do not wait).
+    cfg.publish = (u, timeout) => {
+      cfg.applyConfig(u);
+      if (!bus) return Promise.resolve(0);
+      bus.postMessage({ type: 'config', version: u.version, config: u.config });
+      const behind = () => [...workers.values()].filter((v) => v < u.version).length;
+      if (!(timeout > 0) || !behind()) return Promise.resolve(workers.size);
+      return new Promise((resolve, reject) => {
+        const w = {
+          check() {
+            if (behind()) return;
+            ackWaiters.delete(w);
+            clearTimeout(w.timer);
+            resolve(workers.size);
+          },
+        };
+        w.timer = setTimeout(() => {
+          ackWaiters.delete(w);
+          reject(new Error('__ws_timeout__ ' + behind() + ' worker(s) to apply config version ' + u.version + ' (' + timeout + ' ms)'));
+        }, timeout);
+        ackWaiters.add(w);
+      });
+    };
+
+    const nextValue = () => {
+      switch (cfg.mode) {
+        case 'constant':
+          return Number(cfg.constant);
+        case 'increasing': {
+          const v = Number(cfg.current);
+          cfg.current = v + Number(cfg.step);
+          return v;
+        }
+        case 'decreasing': {
+          const v = Number(cfg.current);
+          cfg.current = v - Number(cfg.step);
+          return v;
+        }
+        default:
+          return null;
+      }
+    };
+
+    // cfg.selector is any ws_intercept.jsonpath selector; compiled once per value.
+    const mutate = (data) => {
+      if (!cfg.mode || cfg.mode === 'untouched') return data;
+      const sel = globalThis.__ws_selector__.compile(cfg.selector);
+      if (cfg.binary && (data instanceof ArrayBuffer || ArrayBuffer.isView(data))) {
+        // Fixed-width numbers are overwritten in place (ws_intercept.binarycodec)
+        globalThis.__ws_binary__.patch(cfg.binary, data, sel, nextValue);
+        return data;
+      }
+      if (data && typeof data === 'object') {
+        sel.apply(data, nextValue);
+        return data;
+      }
+      if (typeof data === 'string' && sel.mayMatch(data)) {
+        try {
+          const obj = JSON.parse(data);
+          if (obj && typeof obj === 'object' && sel.apply(obj, nextValue)) return JSON.stringify(obj);
+        } catch (_) {}
+      }
+      return data;
+    };
+
+    // Route 'message' delivery of a WebSocket or MessagePort through mutate().
+    // Each event is patched (and counted for ws_intercept.waiters) once, however
+    // many listeners the page attached.
+    const wrapMessages = (target, dir, tag, url) => {
+      const origAdd = target.addEventListener.bind(target);
+      const origRemove = target.removeEventListener.bind(target);
+      const patched = new WeakMap();
+      const deliver = (ev) => {
+        if (!ev || typeof ev !== 'object') return ev;
+        let out = patched.get(ev);
+        if (!out) {
+          const data = mutate(ev.data);
+          out = data === ev.data ? ev : new MessageEvent('message', { data, origin: ev.origin, lastEventId: ev.lastEventId });
+          patched.set(ev, out);
+          trace(dir, tag, url, data);
+          if (cfg.notifyDelivered) cfg.notifyDelivered(data);
+        }
+        return out;
+      };
+      const wrappers = new WeakMap();
+      target.addEventListener = function(type, listener, options) {
+        if (type === 'message' && typeof listener === 'function') {
+          let wrapped = wrappers.get(listener);
+          if (!wrapped) {
+            wrapped = function(ev) { return listener.call(this, deliver(ev)); };
+            wrappers.set(listener, wrapped);
+          }
+          return origAdd(type, wrapped, options);
+        }
+        return origAdd(type, listener, options);
+      };
+      target.removeEventListener = function(type, listener, options) {
+        return origRemove(type, (type === 'message' && wrappers.get(listener)) || listener, options);
+      };
+      let handler = null;
+      let handlerWrapped = null;
+      Object.defineProperty(target, 'onmessage', {
+        configurable: true,
+        enumerable: true,
+        get() { return handler; },
+        set(fn) {
+          if (handlerWrapped) origRemove('message', handlerWrapped);
+          handler = typeof fn === 'function' ? fn : null;
+          handlerWrapped = handler && ((ev) => handler.call(target, deliver(ev)));
+          if (handlerWrapped) origAdd('message', handlerWrapped);
+        },
+      });
+    };
+
+    // Sends and posts go through the outbound rules first (ws_intercept.outbound);
+    // calls with a transfer list pass as they are.
+    const ruleCalls = (target, method) => {
+      if (typeof target[method] !== 'function') return;
+      const orig = target[method].bind(target);
+      const send = globalThis.__ws_outbound__.attach(orig, () => cfg.outbound);
+      target[method] = function(data, ...rest) { return rest.length ? orig(data, ...rest) : send(data); };
+    };
+
+    const traceCalls = (target, method, dir, tag, url) => {
+      const orig = target[method];
+      target[method] = function(...args) {
+        trace(dir, tag, url, args[0]);
+        return orig.apply(this, args);
+      };
+    };
+
+    // Runs INSIDE the SharedWorker: patch MessagePort.prototype.postMessage
+    // before importing the real worker script, so even its first posts go
+    // through the patch. String payloads are only parsed when they may hold
+    // a tick of an overridden symbol.
+    const workerBootstrap = (origUrl, w) => `(function(){
+  var CFG = ${JSON.stringify(w)}, OWNER = ${JSON.stringify(realm)}, VERSION = ${cfg.version};
+/*TICK_MATCHER_JS*/
+  // Live table updates from the page's config channel
+  var BUS = typeof BroadcastChannel === "function" ? new BroadcastChannel("__ws_intercept__") : null;
+  if (BUS){
+    var ME = Math.random().toString(36).slice(2);
+    BUS.onmessage = function(ev){
+      var m = ev.data;
+      if (!m || m.type !== "config" || !(m.version > VERSION)) return;
+      if (m.config && "worker" in m.config) loadTable(m.config.worker ? m.config.worker.symbols : {});
+      VERSION = m.version;
+      BUS.postMessage({ type: "ack", realm: ME, owner: OWNER, version: VERSION });
+    };
+    BUS.postMessage({ type: "hello", realm: ME, owner: OWNER, version: VERSION });
+  }
+  var MP = self.MessagePort && self.MessagePort.prototype;
+  if (MP && !MP.__us100_mutated__){
+    var origPost = MP.postMessage;
+    MP.postMessage = function(data, transfer){
+      try {
+        if (data && typeof data === "object"){
+          mutateTicks(data);
+        } else if (typeof data === "string" && TABLE.size && mayMatch(data)){
+          try {
+            var obj = JSON.parse(data);
+            if (mutateTicks(obj)) data = JSON.stringify(obj);
+          } catch(_){}
+        }
+      } catch(_){}
+      return arguments.length > 1 ? origPost.call(this, data, transfer) : origPost.call(this, data);
+    };
+    MP.__us100_mutated__ = true;
+  }
+  try { importScripts(${JSON.stringify(origUrl)}); }
+  catch (e) { try { console.log("[ws-runtime][worker] importScripts error:", String(e && e.message || e)); } catch(_){} }
+})();`;
+
+    // One blob per (worker script, config)
+    const bootstrapUrls = new Map();
+    const bootstrapUrl = (url) => {
+      const abs = new URL(url, location.href).toString();
+      const key = abs + '\n' + cfg.version + '\n' + JSON.stringify(cfg.worker);
+      let blobUrl = bootstrapUrls.get(key);
+      if (!blobUrl) {
+        const code = workerBootstrap(abs, cfg.worker);
+        blobUrl = URL.createObjectURL(new Blob([code], { type: 'application/javascript' }));
+        bootstrapUrls.set(key, blobUrl);
+      }
+      return blobUrl;
+    };
+
+    const OrigWS = window.WebSocket;
+    if (cfg.page && OrigWS && !OrigWS.__patched_by_tests__) {
+      const PatchedWS = function(url, protocols) {
+        const ws = protocols === undefined ? new OrigWS(url) : new OrigWS(url, protocols);
+        const wsUrl = String(url);
+        wrapMessages(ws, 'ws-recv', '[WS recv]', wsUrl);
+        ruleCalls(ws, 'send');
+        traceCalls(ws, 'send', 'ws-send', '[WS send]', wsUrl);
+        return ws;
+      };
+      PatchedWS.prototype = OrigWS.prototype;
+      for (const k of ['CONNECTING', 'OPEN', 'CLOSING', 'CLOSED']) PatchedWS[k] = OrigWS[k];
+      PatchedWS.__patched_by_tests__ = true;
+      Object.defineProperty(window, 'WebSocket', { value: PatchedWS });
+    }
+
+    const OrigSW = window.SharedWorker;
+    if ((cfg.page || cfg.worker) && OrigSW && !OrigSW.__patched_by_tests__) {
+      const PatchedSW = function(url, options) {
+        let worker = null;
+        if (cfg.worker) {
+          try {
+            worker = new OrigSW(bootstrapUrl(url), options);
+          } catch (e) {
+            log('[ws-runtime] worker bootstrap failed, using the original script:', String(e));
+          }
+        }
+        if (!worker) worker = new OrigSW(url, options);
+        const port = worker.port;
+        if (cfg.page && port) {
+          const swUrl = String(url);
+          wrapMessages(port, 'sw-recv', '[SW <- recv]', swUrl);
+          ruleCalls(port, 'postMessage');
+          traceCalls(port, 'postMessage', 'sw-post', '[SW post ->]', swUrl);
+          if (typeof port.start === 'function') {
+            try { port.start(); } catch (_) {}
+          }
+        }
+        return worker;
+      };
+      PatchedSW.prototype = OrigSW.prototype;
+      PatchedSW.__patched_by_tests__ = true;
+      Object.defineProperty(window, 'SharedWorker', { value: PatchedSW });
+    }
+
+    log('[ws-runtime] installed; mode=' + cfg.mode + ', constant=' + cfg.constant + ', start=' + cfg.start
+      + ', step=' + cfg.step + ', worker=' + JSON.stringify(cfg.worker));
+  } catch (e) {
+    console.log('[init ERROR]', String(e && e.stack || e));
+  }
+})();
+"""
+
+
+# Worker-side bid/ask rewrite. It is spliced into a template literal, so no
+# backticks or "${". Expects CFG = {"symbols": {symbol: rule}} (see
+# ws_intercept.overrides) and keeps per-symbol generator state in TABLE.
+#
+# mutateTicks() knows the feed's envelope (see pwa/tmp.py):
+#     {"messages": [{"ts": {"tk": {"sl": ..., "ba": [bid, ask], ...}, ...}}, ...], ...}
+# and goes straight to each messages[i].ts.tk. Anything else, including an
+# envelope with an entry of another shape, falls back to mutateUS100Deep(), the
+# original walk over every node.
+TICK_MATCHER_JS = r"""
+  var TABLE = new Map(), NEEDLES = null;
+  function loadTable(symbols){
+    var next = new Map();
+    for (var sym in symbols){
+      if (!Object.prototype.hasOwnProperty.call(symbols, sym)) continue;
+      var rule = symbols[sym], prev = TABLE.get(sym);
+      // Generators keep their position unless the rule was set again
+      var cur = prev && prev.epoch === rule.epoch && prev.mode === rule.mode ? prev.cur : rule.start;
+      next.set(sym, Object.assign({}, rule, { cur: cur }));
+    }
+    TABLE = next;
+    // A few symbols: look for them before parsing strings; many: for any tick
+    NEEDLES = next.size <= 8 ? Array.from(next.keys(), function(k){ return JSON.stringify(k); }) : ['"sl"'];
+  }
+  loadTable(CFG.symbols);
+  function mayMatch(text){
+    for (var i = 0; i < NEEDLES.length; i++) if (text.indexOf(NEEDLES[i]) !== -1) return true;
+    return false;
+  }
+  function patchTick(tk){
+    var r = TABLE.get(tk.sl), ba = tk.ba, half, mid;
+    if (r === undefined || !Array.isArray(ba) || ba.length < 2) return false;
+    switch (r.mode){
+      case "constant":
+        ba[0] = r.ba[0];
+        ba[1] = r.ba[1];
+        return true;
+      case "increasing":
+      case "decreasing":
+        half = (r.spread === null ? ba[1] - ba[0] : r.spread) / 2;
+        ba[0] = r.cur - half;
+        ba[1] = r.cur + half;
+        r.cur += r.mode === "increasing" ? r.step : -r.step;
+        return true;
+      case "spread":
+        mid = r.mid === null ? (ba[0] + ba[1]) / 2 : r.mid;
+        ba[0] = mid - r.spread / 2;
+        ba[1] = mid + r.spread / 2;
+        return true;
+      default:
+        return false;
+    }
+  }
+  // true/false when root has the known shape, null when it does not
+  function matchTicks(root){
+    var msgs = root.messages;
+    if (!Array.isArray(msgs)) return null;
+    var changed = false;
+    for (var i = 0; i < msgs.length; i++){
+      var m = msgs[i], ts = m && m.ts, tk = ts && ts.tk;
+      if (!tk || typeof tk.sl !== "string") return null;
+      if (patchTick(tk)) changed = true;
+    }
+    return changed;
+  }
+  function mutateUS100Deep(root){
+    var changed = false, stack = [root], seen = typeof WeakSet!=="undefined" ? new WeakSet() : { has(){return false;}, add(){} };
+    while (stack.length){
+      var node = stack.pop();
+      if (!node || typeof node !== "object") continue;
+      try { if (seen.has(node)) continue; seen.add(node); } catch(e) {}
+      if (typeof node.sl === "string" && Array.isArray(node.ba) && node.ba.length >= 2){
+        if (patchTick(node)) changed = true;
+      }
+      if (Array.isArray(node)){
+        for (var i=0;i<node.length;i++) stack.push(node[i]);
+      } else {
+        for (var k in node) if (Object.prototype.hasOwnProperty.call(node,k)) stack.push(node[k]);
+      }
+    }
+    return changed;
+  }
+  function mutateTicks(root){
+    if (!root || typeof root !== "object" || !TABLE.size) return false;
+    var matched = matchTicks(root);
+    return matched === null ? mutateUS100Deep(root) : matched;
+  }
+"""
+
+RUNTIME_JS = RUNTIME_JS.replace("/*TICK_MATCHER_JS*/", TICK_MATCHER_JS.strip("\n"))
+
+# Characters after which a "/" starts a regex literal rather than a division
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = re.compile(r"(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|new|delete|void|throw)$")
+# Spaces and newlines next to these can go
+_TIGHT = set("{}()[];,:=?&|!<>")
+_NEWLINE_AFTER = set("{;,([:")
+_NEWLINE_BEFORE = set("})]")
+
+
+def _skip_string(src: str, i: int) -> int:
+    quote, i = src[i], i + 1
+    while src[i] != quote:
+        i += 2 if src[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_template(src: str, i: int) -> tuple[int, bool]:
+    """Scan template text from i; (end, True) after "${", (end, False) after the closing backtick."""
+    while True:
+        c = src[i]
+        if c == "\\":
+            i += 2
+        elif c == "`":
+            return i + 1, False
+        elif c == "$" and src[i + 1] == "{":
+            return i + 2, True
+        else:
+            i += 1
+
+
+def _skip_regex(src: str, i: int) -> int:
+    i += 1
+    in_class = False
+    while True:
+        c = src[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(src) and (src[i].isalnum() or src[i] == "$"):
+        i += 1  # flags
+    return i
+
+
+def minify_js(src: str) -> str:
+    """Drop comments, indentation, blank lines and most optional whitespace.
+
+    A small tokenizer keeps string, template and regex literals intact. Line
+    breaks are kept where automatic semicolon insertion could depend on them.
+    """
+    out: list[str] = []
+    depths: list[int] = []   # brace depth of each open ${...} in a template
+    depth = 0
+    i, n = 0, len(src)
+
+    def starts_regex() -> bool:
+        prev = next((t for t in reversed(out) if t not in (" ", "\n")), "")
+        return not prev or prev[-1] in _REGEX_AFTER or bool(_REGEX_KEYWORDS.search(prev))
+
+    while i < n:
+        c = src[i]
+        if c in "'\"":
+            j = _skip_string(src, i)
+            out.append(src[i:j])
+            i = j
+        elif c == "`" or (c == "}" and depth == 0 and depths):
+            if c == "}":
+                depth = depths.pop()
+            j, opened = _skip_template(src, i + 1)
+            out.append(src[i:j])
+            i = j
+            if opened:
+                depths.append(depth)
+                depth = 0
+        elif c == "/" and src[i + 1 : i + 2] == "/":
+            while i < n and src[i] != "\n":
+                i += 1
+        elif c == "/" and src[i + 1 : i + 2] == "*":
+            end = src.index("*/", i + 2)
+            out.append("\n" if "\n" in src[i:end] else " ")
+            i = end + 2
+        elif c == "/" and starts_regex():
+            j = _skip_regex(src, i)
+            out.append(src[i:j])
+            i = j
+        elif c in " \t\r\n":
+            j = i
+            while j < n and src[j] in " \t\r\n":
+                j += 1
+            out.append("\n" if "\n" in src[i:j] else " ")
+            i = j
+        else:
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            j = i + 1
+            while j < n and src[j] not in "'\"`/{} \t\r\n":
+                j += 1
+            out.append(src[i:j])
+            i = j
+
+    # Drop whitespace tokens that separate nothing
+    kept: list[str] = []
+    for k, tok in enumerate(out):
+        if tok in (" ", "\n"):
+            prev = kept[-1][-1] if kept and kept[-1] else ""
+            nxt = next((t[0] for t in out[k + 1 :] if t and t not in (" ", "\n")), "")
+            if not prev or not nxt or prev in (" ", "\n"):
+                continue
+            if tok == " " and (prev in _TIGHT or nxt in _TIGHT):
+                continue
+            if tok == "\n" and (prev in _NEWLINE_AFTER or nxt in _NEWLINE_BEFORE):
+                continue
+        kept.append(tok)
+    return "".join(kept)
+
+
+@lru_cache(maxsize=None)
+def bundle(minified: bool = True) -> str:
+    """SELECTOR_JS + BINARY_JS + OUTBOUND_JS + RUNTIME_JS + WAITERS_JS, built once per process."""
+    src = "\n".join((SELECTOR_JS, BINARY_JS, OUTBOUND_JS, RUNTIME_JS, WAITERS_JS))
+    return minify_js(src) if minified else src
+
+
+def config_update(**fields: Any) -> dict[str, Any]:
+    """Validated runtime options (any subset of DEFAULTS, plus "current")."""
+    unknown = set(fields) - set(DEFAULTS) - {"current"}
+    if unknown:
+        raise ValueError(f"unknown runtime options: {', '.join(sorted(unknown))}")
+    if "mode" in fields and fields["mode"] not in MODES:
+        raise ValueError(f"bad mode {fields['mode']!r}; expected one of {', '.join(MODES)}")
+    if "selector" in fields:
+        compile_selector(fields["selector"])
+    for name, least in (("sample", 0), ("frame_buffer", 1)):
+        value = fields.get(name, least)
+        if isinstance(value, bool) or not isinstance(value, int) or value < least:
+            raise ValueError(f"{name} must be an integer >= {least}, got {value!r}")
+    if isinstance(fields.get("binary"), BinaryCodec):
+        fields["binary"] = fields["binary"].spec()
+    if fields.get("binary") is not None and (
+        not isinstance(fields["binary"], dict) or fields["binary"].get("codec") not in ("msgpack", "struct")
+    ):
+        raise ValueError("binary must be a built-in binary codec or its spec()")
+    if "outbound" in fields:
+        fields["outbound"] = [make_outbound_rule(**rule) for rule in fields["outbound"]]
+    if fields.get("worker") is not None:
+        fields["worker"] = normalize_worker(fields["worker"])
+    return fields
+
+
+def runtime_config(**overrides: Any) -> dict[str, Any]:
+    """DEFAULTS with overrides applied and validated."""
+    return {**DEFAULTS, **config_update(**overrides)}
+
+
+@lru_cache(maxsize=256)
+def _render(config_json: str, minified: bool) -> str:
+    # The config is the only per-test part: one JSON assignment the bundle reads
+    return f"globalThis.__ws_intercept_config__={config_json};\n{bundle(minified)}"
+
+
+def render(*, minified: bool = True, **overrides: Any) -> str:
+    """Init script for the given options (see DEFAULTS): config line + bundle, cached by config."""
+    config = runtime_config(**overrides)
+    return _render(json.dumps(config, separators=(",", ":"), sort_keys=True), minified)
@@ -0,0 +1,187 @@
+"""Network-condition shaping for proxied sockets.
+
+A Shaper sits between the proxy and one side of a connection and holds each
+frame back the way a slow network would:
+
+    latency_ms     fixed one-way delay
+    jitter_ms      plus a uniform random 0..jitter_ms
+    bandwidth      bytes per second through a token bucket of `burst` bytes;
+                   frames queue behind each other like on a saturated link
+    loss           probability that a frame is dropped
+    duplicate      probability that a frame is delivered twice
+    reorder_ms     frames may overtake each other by up to this much; without
+                   it, delivery order is kept (as TCP would) and jitter only
+                   bunches frames up
+
+Delays are scheduled on a TimerQueue (one heap, one loop timer), never slept
+on, so the Playwright dispatcher keeps running and thousands of frames can
+be in flight. Seed the profile to make a run reproducible.
+"""
+
+from __future__ import annotations
+import math
+import random
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Union
+
+from ws_intercept.timers import TimerQueue
+
+Msg = Union[str, bytes]
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    """Conditions for one direction of a connection (see the module docstring)."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    bandwidth: float | None = None   # bytes/s; None for unlimited
+    burst: int = 16_384              # token bucket size, bytes
+    loss: float = 0.0
+    duplicate: float = 0.0
+    reorder_ms: float = 0.0
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        for name in ("latency_ms", "jitter_ms", "reorder_ms"):
+            value = getattr(self, name)
+            if not math.isfinite(value) or value < 0:
+                raise ValueError(f"{name} must be a non-negative number, got {value!r}")
+        for name in ("loss", "duplicate"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name} must be a probability between 0 and 1, got {getattr(self, name)!r}")
+        if self.bandwidth is not None and not self.bandwidth > 0:
+            raise ValueError(f"bandwidth must be positive bytes/s, got {self.bandwidth!r}")
+        if self.burst < 1:
+            raise ValueError(f"burst must be at least 1 byte, got {self.burst!r}")
+
+    @cached_property
+    def is_noop(self) -> bool:
+        return self == NetworkProfile(seed=self.seed, burst=self.burst)
+
+
+@dataclass
+class ShapingStats:
+    received: int = 0
+    delivered: int = 0      # duplicates included
+    dropped: int = 0
+    duplicated: int = 0
+    reordered: int = 0      # frames delivered before one that arrived earlier
+    in_flight: int = 0      # frames held back right now
+    peak_in_flight: int = 0
+    delay_ms_total: float = 0.0
+
+    @property
+    def mean_delay_ms(self) -> float:
+        return self.delay_ms_total / self.delivered if self.delivered else 0.0
+
+
+_UNSHAPED = NetworkProfile()
+
+
+def _size(msg: Msg) -> int:
+    return len(msg.encode()) if isinstance(msg, str) else len(msg)
+
+
+class Shaper:
+    """Shapes one direction of one connection.
+
+    Args:
+        profile: the conditions, or a callable returning the current ones
+            (read per frame, so changes apply to open sockets).
+        deliver: sends a frame on to its destination.
+        timers: queue to schedule on; share one across connections.
+        stats: counters to update (shared across connections if passed in).
+    """
+
+    def __init__(
+        self,
+        profile: NetworkProfile | Callable[[], NetworkProfile | None],
+        deliver: Callable[[Msg], Any],
+        *,
+        timers: TimerQueue | None = None,
+        stats: ShapingStats | None = None,
+    ) -> None:
+        self._profile = profile if callable(profile) else (lambda: profile)
+        self._deliver = deliver
+        self.timers = timers if timers is not None else TimerQueue()
+        self.stats = stats if stats is not None else ShapingStats()
+        self._rng = random.Random()
+        self._seeded: NetworkProfile | None = None
+        self._last_due = 0.0       # latest scheduled delivery (order keeping)
+        self._tb_time = 0.0        # token bucket: time of the last update ...
+        self._tokens = 0.0         # ... and the tokens left then
+        self._seq = 0              # arrival order, to count reordering
+        self._delivered_seq = -1
+        self._held = 0             # this shaper's frames in flight
+        self.closed = False
+
+    def push(self, msg: Msg) -> None:
+        """Take one frame; it is delivered now, later, twice or never."""
+        stats = self.stats
+        stats.received += 1
+        p = self._profile() or _UNSHAPED
+        self._seq += 1
+        if p.is_noop and not self._held:
+            # Nothing queued ahead of it: straight through, no clock needed
+            self._send(msg, self._seq, 0.0)
+            return
+        now = self.timers.time()
+        if p is not self._seeded:
+            # A new profile: its own random stream, a full bucket
+            self._seeded = p
+            self._rng.seed(p.seed)
+            self._tokens = p.burst
+            self._tb_time = now
+        rng = self._rng
+        if p.loss and rng.random() < p.loss:
+            stats.dropped += 1
+            return
+        copies = 2 if p.duplicate and rng.random() < p.duplicate else 1
+        stats.duplicated += copies - 1
+        depart = self._depart(p, _size(msg), now) if p.bandwidth else now
+        for _ in range(copies):
+            due = depart + (p.latency_ms + (rng.uniform(0, p.jitter_ms) if p.jitter_ms else 0.0)) / 1000
+            if p.reorder_ms:
+                due += rng.uniform(0, p.reorder_ms) / 1000
+            else:
+                due = max(due, self._last_due)
+            self._last_due = max(self._last_due, due)
+            if due <= now:
+                self._send(msg, self._seq, 0.0)
+                continue
+            self._held += 1
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            self.timers.call_at(due, self._fire, msg, self._seq, now)
+
+    def _depart(self, p: NetworkProfile, size: int, now: float) -> float:
+        """When the link has sent the frame (token bucket)."""
+        t = max(now, self._tb_time)
+        tokens = min(p.burst, self._tokens + (t - self._tb_time) * p.bandwidth)
+        if tokens >= size:
+            self._tokens, self._tb_time = tokens - size, t
+            return t
+        t += (size - tokens) / p.bandwidth
+        self._tokens, self._tb_time = 0.0, t
+        return t
+
+    def _fire(self, msg: Msg, seq: int, t_in: float) -> None:
+        self._held -= 1
+        self.stats.in_flight -= 1
+        if not self.closed:
+            self._send(msg, seq, (self.timers.time() - t_in) * 1000)
+
+    def _send(self, msg: Msg, seq: int, delay_ms: float) -> None:
+        stats = self.stats
+        if seq < self._delivered_seq:
+            stats.reordered += 1
+        self._delivered_seq = max(self._delivered_seq, seq)
+        stats.delivered += 1
+        stats.delay_ms_total += delay_ms
+        self._deliver(msg)
+
+    def close(self) -> None:
+        """The socket is gone: frames still in flight are dropped."""
+        self.closed = True
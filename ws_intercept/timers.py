@@ -0,0 +1,80 @@
+"""Heap-based timer queue on top of an asyncio loop.
+
+With the sync Playwright API, route and message handlers run on the dispatcher's
+event loop, and that loop only spins while the test is inside a Playwright call
+(wait_for_timeout, expect, ...). Sleeping in a handler would stall every socket,
+so delayed work is put on this queue instead: one heap of deadlines and a single
+loop timer armed for the earliest one, however many callbacks are pending.
+
+A callback that raises loses only its own run: the error is counted in
+`errors` (the last one kept in `error`) and the callbacks due after it still run.
+"""
+
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+from typing import Any, Callable
+
+
+class TimerQueue:
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        self._loop = loop
+        self._heap: list[tuple[float, int, Callable[..., Any], tuple]] = []
+        self._seq = itertools.count()  # FIFO among equal deadlines
+        self._handle: asyncio.TimerHandle | None = None
+        self._armed_for: float | None = None
+        self.errors = 0
+        self.error: BaseException | None = None   # the last callback error
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            # Bound lazily: handlers run on the dispatcher loop, tests may not
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def time(self) -> float:
+        return self.loop.time()
+
+    def call_at(self, when: float, fn: Callable[..., Any], *args: Any) -> None:
+        """Run fn(*args) at loop time `when` (or as soon as possible if it passed)."""
+        heapq.heappush(self._heap, (when, next(self._seq), fn, args))
+        if self._armed_for is None or when < self._armed_for:
+            self._arm()
+
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> None:
+        self.call_at(self.time() + delay, fn, *args)
+
+    def _arm(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        if not self._heap:
+            self._handle = self._armed_for = None
+            return
+        self._armed_for = self._heap[0][0]
+        self._handle = self.loop.call_at(self._armed_for, self._run)
+
+    def _run(self) -> None:
+        self._handle = self._armed_for = None
+        now = self.loop.time()
+        heap = self._heap
+        try:
+            while heap and heap[0][0] <= now:
+                _, _, fn, args = heapq.heappop(heap)
+                try:
+                    fn(*args)
+                except Exception as exc:
+                    self.errors += 1
+                    self.error = exc
+        finally:
+            if heap and self._handle is None:
+                self._arm()
+
+    def clear(self) -> None:
+        """Drop everything still pending."""
+        self._heap.clear()
+        self._arm()
+
+    def __len__(self) -> int:
+        return len(self._heap)
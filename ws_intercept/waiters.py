@@ -0,0 +1,129 @@
+"""Event-driven waits on delivered frames and rendered values.
+
+WAITERS_JS extends ``window.__ws_intercept__`` with promise-returning waiters
+that are settled from the frame-delivery path (runtimes call
+``__ws_intercept__.notifyDelivered(data)`` once per delivered frame) or from a
+MutationObserver. PageWaiters awaits them through a single page.evaluate, so a
+wait returns as soon as its condition holds instead of after a fixed sleep, and
+the Playwright dispatcher keeps proxying frames while it waits.
+"""
+
+from __future__ import annotations
+from typing import Any
+
+from playwright.sync_api import Error, Page, TimeoutError
+
+DEFAULT_TIMEOUT = 30_000  # ms, like Playwright's own default
+
+# Has to run after the interception runtime so that it augments its controller.
+WAITERS_JS = r"""
+(() => {
+  const ctl = window.__ws_intercept__ = window.__ws_intercept__ || {};
+  if (ctl.waitForFrames) return;
+  ctl.delivered = 0;
+  const waiters = new Set();
+
+  const settle = (w, ok, value) => {
+    waiters.delete(w);
+    clearTimeout(w.timer);
+    if (w.observer) w.observer.disconnect();
+    ok ? w.resolve(value) : w.reject(value);
+  };
+  // check(frame) returns undefined while the condition does not hold, else the result
+  const wait = (check, timeout, what) => new Promise((resolve, reject) => {
+    const w = { check, resolve, reject };
+    waiters.add(w);
+    if (timeout > 0) {
+      w.timer = setTimeout(() => settle(w, false, new Error('__ws_timeout__ ' + what + ' (' + timeout + ' ms)')), timeout);
+    }
+  });
+
+  ctl.notifyDelivered = (data) => {
+    ctl.delivered++;
+    if (!waiters.size) return;
+    let decoded, done = false;
+    const frame = () => {
+      if (!done) {
+        done = true;
+        decoded = data;
+        if (typeof data === 'string') { try { decoded = JSON.parse(data); } catch (_) {} }
+      }
+      return decoded;
+    };
+    for (const w of [...waiters]) {
+      if (!w.check) continue;
+      let r;
+      try { r = w.check(frame); } catch (e) { settle(w, false, e); continue; }
+      if (r !== undefined) settle(w, true, r);
+    }
+  };
+
+  ctl.waitForFrames = (n, timeout) => {
+    const target = ctl.delivered + n;
+    if (ctl.delivered >= target) return Promise.resolve(ctl.delivered);
+    return wait(() => (ctl.delivered >= target ? ctl.delivered : undefined), timeout, n + ' more frame(s)');
+  };
+
+  ctl.waitForFrame = (predicate, timeout) =>
+    wait((frame) => (predicate(frame()) ? frame() : undefined), timeout, 'a frame matching ' + predicate);
+
+  ctl.waitForText = (selector, text, timeout) => {
+    const current = () => {
+      const el = document.querySelector(selector);
+      return el && el.textContent.trim() === text ? text : undefined;
+    };
+    if (current() !== undefined) return Promise.resolve(text);
+    const p = wait(null, timeout, selector + ' to read ' + JSON.stringify(text));
+    const w = [...waiters].pop();
+    w.observer = new MutationObserver(() => { if (current() !== undefined) settle(w, true, text); });
+    w.observer.observe(document, { subtree: true, childList: true, characterData: true });
+    return p;
+  };
+})();
+"""
+
+
+class PageWaiters:
+    """Python side of WAITERS_JS for one page. Timeouts are in milliseconds."""
+
+    def __init__(self, page: Page, default_timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.page = page
+        self.default_timeout = default_timeout
+
+    def _await(self, expression: str, arg: Any) -> Any:
+        try:
+            return self.page.evaluate(expression, arg)
+        except Error as e:
+            if "__ws_timeout__" in e.message:
+                raise TimeoutError("Timed out waiting for " + e.message.split("__ws_timeout__ ", 1)[1]) from e
+            raise
+
+    def frames_delivered(self) -> int:
+        """Frames the page has received since it loaded."""
+        return self.page.evaluate("() => window.__ws_intercept__.delivered")
+
+    def wait_for_frames(self, n: int = 1, *, timeout: float | None = None) -> int:
+        """Wait until `n` more frames have been delivered; returns the running total."""
+        return self._await(
+            "([n, t]) => window.__ws_intercept__.waitForFrames(n, t)",
+            [n, self.default_timeout if timeout is None else timeout],
+        )
+
+    def wait_for_frame(self, predicate: str, *, timeout: float | None = None) -> Any:
+        """Wait for a delivered frame matching a JS predicate; returns that frame.
+
+        Args:
+            predicate: JS function source, called with the frame (JSON-decoded
+                when possible), e.g. "f => f.value > 5".
+        """
+        return self._await(
+            f"t => window.__ws_intercept__.waitForFrame({predicate}, t)",
+            self.default_timeout if timeout is None else timeout,
+        )
+
+    def wait_for_text(self, selector: str, text: str, *, timeout: float | None = None) -> None:
+        """Wait until the element matching a CSS selector renders exactly `text`."""
+        self._await(
+            "([s, text, t]) => window.__ws_intercept__.waitForText(s, text, t)",
+            [selector, text, self.default_timeout if timeout is None else timeout],
+        )